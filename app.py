@@ -1,6 +1,10 @@
-from flask import Flask, redirect, url_for, send_from_directory
+from flask import Flask, redirect, url_for, send_from_directory, flash, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from services.tenancy import parse_regions, init_tenancy, BIND_PREFIX
+from services.templating import init_templates
+from services.compression import init_compression
+from services.assets import init_assets
 import os
 
 # -------------------------------
@@ -8,10 +12,55 @@ import os
 # -------------------------------
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///adoption_system.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///adoption_system.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'  # changing this rehashes on next login
+app.config['PASSWORD_HASH_WORKERS'] = os.cpu_count() or 1  # 0 hashes inline on the request worker
+app.config['PASSWORD_HASH_MAX_PENDING'] = 64  # queued hashes before new requests wait
+app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = 5  # seconds to wait for a queue slot
+app.config['RATELIMIT_STORAGE'] = os.environ.get('RATELIMIT_STORAGE', 'memory')  # or sqlite:///ratelimit.db for multiple workers
+app.config['LOGIN_RATE_LIMIT_IP'] = (30, 300)  # login attempts per IP per 5 minutes
+app.config['LOGIN_LOCKOUT'] = (5, 900)  # failed logins per account before a 15 minute lockout
+app.config['RESET_RATE_LIMIT_IP'] = (10, 3600)  # password resets per IP per hour
+app.config['RESET_RATE_LIMIT_ID'] = (3, 3600)  # password resets per account per hour
+app.config['VISIT_DAILY_CAPACITY'] = 4  # max auto-scheduled visits per staff per day
+app.config['VISIT_SPREAD_DAYS'] = 14  # window after the due date used to balance visits
+app.config['AUDIT_BATCH_SIZE'] = 200  # buffered audit events that trigger a write
+app.config['AUDIT_FLUSH_INTERVAL'] = 2.0  # seconds between background audit writes
+app.config['AUDIT_ARCHIVE_DIR'] = 'audit_archive'  # where archive-audit puts old months
+app.config['ARCHIVE_FOLDER'] = 'archive'  # zip bundles of archived upload / visit files
+app.config['ARCHIVE_AFTER_DAYS'] = 365  # verified uploads / completed visits older than this go to cold storage
+app.config['DELETED_RETENTION_DAYS'] = 30  # deleted staff, parents and guidance are purged (with files) after this
+app.config['EVENTS_BUS'] = os.environ.get('EVENTS_BUS', 'memory')  # or sqlite:///events.db shared with sse_server.py
+app.config['EVENTS_SSE_URL'] = os.environ.get('EVENTS_SSE_URL')  # e.g. http://localhost:8001/stream
+app.config['EVENTS_IN_APP_STREAM'] = os.environ.get('EVENTS_IN_APP_STREAM') == '1'  # without EVENTS_SSE_URL: stream from this app (dev server)
+app.config['EVENTS_STREAM_MAX_SECONDS'] = 300  # in-app streams end after this; the browser reconnects where it left off
+app.config['EVENTS_TOKEN_MAX_AGE'] = 12 * 3600  # seconds a live-events subscription token stays valid
+app.config['OUTBOX_TRANSPORTS'] = {'email': 'file', 'sms': 'file'}  # 'file', 'smtp' or 'package.module:Class'
+app.config['OUTBOX_FILE_DIR'] = 'outbox'  # where the file transport writes <channel>.jsonl
+app.config['OUTBOX_SMTP_HOST'] = os.environ.get('OUTBOX_SMTP_HOST', 'localhost')
+app.config['OUTBOX_SMTP_PORT'] = int(os.environ.get('OUTBOX_SMTP_PORT', 25))
+app.config['OUTBOX_SENDER'] = 'noreply@adoption.local'
+app.config['OUTBOX_RATE_LIMITS'] = {'email': (100, 60), 'sms': (20, 60)}  # sends per channel per period (seconds)
+app.config['OUTBOX_MAX_ATTEMPTS'] = 5  # failed sends are retried with backoff, then marked failed
+app.config['OUTBOX_REMINDER_DAYS'] = 3  # remind parents this many days before a report is due
+app.config['UPLOAD_SLA_HOURS'] = 72  # target time from upload to staff review
+app.config['WORKLOAD_CACHE_SECONDS'] = 300  # how long the current quarter's workload figures are reused
+app.config['REGIONS'] = parse_regions(os.environ.get('REGIONS'))  # e.g. north=sqlite:///north.db,south=sqlite:///south.db
+app.config['DEFAULT_REGION'] = os.environ.get('REGION')  # region for CLI commands (default: the first)
+app.config['REGIONS_PARALLEL'] = None  # query regions in threads; None: only when some region is not SQLite
+app.config['SQLALCHEMY_BINDS'] = {BIND_PREFIX + name: url for name, url in app.config['REGIONS'].items()}
+app.config['JINJA_CACHE_DIR'] = os.environ.get('JINJA_CACHE_DIR', 'jinja_cache')  # compiled templates shared by all workers
+app.config['TEMPLATES_PREWARM'] = os.environ.get('TEMPLATES_PREWARM') == '1'  # compile every template at startup
+app.config['COMPRESS_RESPONSES'] = True  # gzip (or brotli, if installed) for text responses
+app.config['COMPRESS_MIN_SIZE'] = 500  # bytes; smaller bodies aren't worth compressing
+app.config['COMPRESS_LEVEL'] = 6  # gzip level
+app.config['COMPRESS_BROTLI_QUALITY'] = 4  # brotli quality (0-11)
+app.config['ASSET_DIST_DIR'] = 'dist'  # under static/; flask build-assets writes fingerprinted files and manifest.json here
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600  # seconds browsers may cache fingerprinted files
+app.config['SYNC_OVERLAP_SECONDS'] = 5  # /parent/api/sync watermarks trail the clock by this, so late commits aren't missed
 
 # -------------------------------
 # Ensure Upload Folders Exist
@@ -27,6 +76,8 @@ os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'visits'), exist_ok=True)
 from models import db, User, Staff, Child, Upload, Visit, Guidance
 
 db.init_app(app)
+init_tenancy(app)
+init_compression(app)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -44,11 +95,53 @@ from routes.auth import auth_bp
 from routes.admin import admin_bp
 from routes.staff import staff_bp
 from routes.parent import parent_bp
+from routes.events import events_bp
 
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(admin_bp, url_prefix='/admin')
 app.register_blueprint(staff_bp, url_prefix='/staff')
 app.register_blueprint(parent_bp, url_prefix='/parent')
+app.register_blueprint(events_bp, url_prefix='/events')
+
+# -------------------------------
+# Register CLI Commands
+# -------------------------------
+from commands import register_commands
+
+register_commands(app)
+
+# -------------------------------
+# Template Cache (after blueprints, so pre-warm sees every template)
+# -------------------------------
+init_templates(app)
+
+# -------------------------------
+# Fingerprinted Static Assets
+# -------------------------------
+init_assets(app)
+
+# -------------------------------
+# Password Hashing Back-pressure
+# -------------------------------
+from services.passwords import PasswordHasherBusy
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    flash('The server is busy right now. Please try again in a moment.', 'warning')
+    return redirect(request.path)
+
+# -------------------------------
+# Concurrent Edits (services/concurrency.py)
+# -------------------------------
+from services.concurrency import ConflictError, CONFLICT_MESSAGE
+from sqlalchemy.orm.exc import StaleDataError
+
+@app.errorhandler(ConflictError)
+@app.errorhandler(StaleDataError)
+def edit_conflict(error):
+    db.session.rollback()
+    flash(CONFLICT_MESSAGE, 'warning')
+    return redirect(request.referrer or url_for('index'))
 
 # -------------------------------
 # Route to Serve Uploaded Files
@@ -73,21 +166,26 @@ def index():
 # -------------------------------
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
-
-        # Create default admin if not exists
-        admin = User.query.filter_by(email='admin@adoption.com', role='admin').first()
-        if not admin:
-            from werkzeug.security import generate_password_hash
-            admin = User(
-                email='admin@adoption.com',
-                password=generate_password_hash('admin123'),
-                name='System Admin',
-                role='admin',
-                status='approved'
-            )
-            db.session.add(admin)
-            db.session.commit()
+        from services.schema import upgrade_schema
+        from services.tenancy import regions, use_region
+        upgrade_schema()
+
+        # Create default admin if not exists (in every region)
+        for region in regions() or [None]:
+            with use_region(region):
+                admin = User.query.filter_by(email='admin@adoption.com', role='admin').first()
+                if not admin:
+                    from werkzeug.security import generate_password_hash
+                    admin = User(
+                        email='admin@adoption.com',
+                        password=generate_password_hash('admin123'),
+                        name='System Admin',
+                        role='admin',
+                        status='approved'
+                    )
+                    db.session.add(admin)
+                    db.session.commit()
+                db.session.remove()
 
     # Run Flask app
     app.run(debug=True)
@@ -0,0 +1,140 @@
+"""
+Benchmark for cold-storage archival.
+
+Seeds several years of monthly uploads and quarterly visits for every
+parent, times the staff upload list and parent detail pages, archives
+everything older than --after-days and times the same pages again. Then
+checks that a record created after archiving gets a fresh id and can be
+archived too (ids of archived rows are never handed out again).
+
+    python benchmarks/bench_archive.py [--parents 500] [--years 4] [--after-days 365]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--parents', type=int, default=500)
+    parser.add_argument('--staff', type=int, default=50)
+    parser.add_argument('--years', type=int, default=4)
+    parser.add_argument('--after-days', type=int, default=365)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import app
+    from models import db, User, Staff, Child, Upload, Visit, ArchivedUpload, ArchivedVisit
+    from services.schema import upgrade_schema
+    from services.archive import archive_records, table_sizes
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import insert
+    from datetime import datetime, timedelta
+
+    random.seed(11)
+    app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    app.config['ARCHIVE_FOLDER'] = os.path.join(workdir, 'archive')
+    app.config['RATELIMIT_ENABLED'] = False
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'documents'))
+    password = generate_password_hash('secret', method='pbkdf2:sha256:1000')
+    today = datetime.now().date()
+
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(insert(Staff), [
+            {'staff_id': f'STF{i:04d}', 'name': f'Staff {i}', 'email': f'staff{i}@bench',
+             'password': password, 'max_parents': args.parents}
+            for i in range(args.staff)
+        ])
+        db.session.execute(insert(User), [
+            {'email': f'staff{i}@bench', 'password': password, 'name': f'Staff {i}', 'role': 'staff',
+             'status': 'approved'} for i in range(args.staff)
+        ] + [
+            {'email': f'parent{i}@bench', 'password': password, 'name': f'Parent {i}', 'role': 'parent',
+             'status': 'approved', 'parent_id': f'PAR{i:06d}', 'staff_id': i % args.staff + 1}
+            for i in range(args.parents)
+        ])
+        parent_ids = [pk for pk, in db.session.query(User.id).filter(User.role == 'parent')]
+        db.session.execute(insert(Child), [
+            {'parent_id': pk, 'name': f'Child {pk}', 'adoption_date': today - timedelta(days=365 * args.years)}
+            for pk in parent_ids
+        ])
+        child_of = dict(db.session.query(Child.parent_id, Child.id))
+        uploads = []
+        visits = []
+        for pk in parent_ids:
+            staff_pk = (pk - args.staff - 1) % args.staff + 1
+            for month in range(12 * args.years):
+                day = today - timedelta(days=30 * month + random.randrange(30))
+                path = f'documents/{pk}_{month}.pdf'
+                if month % 6 == 0:
+                    # A sample of real files so bundle sizes mean something.
+                    with open(os.path.join(app.config['UPLOAD_FOLDER'], path), 'wb') as handle:
+                        handle.write(b'%PDF-1.4\n' + os.urandom(256) + b'\n' * 2048)
+                uploads.append({
+                    'parent_id': pk, 'child_id': child_of[pk],
+                    'upload_type': random.choice(['health_report', 'education_report', 'monthly_photo']),
+                    'file_path': path, 'upload_date': datetime.combine(day, datetime.min.time()),
+                    'status': 'verified' if month else 'pending', 'verified_by': staff_pk,
+                })
+                if month % 3 == 0:
+                    visits.append({'parent_id': pk, 'staff_id': staff_pk, 'visit_date': day,
+                                   'status': 'completed' if month else 'scheduled'})
+        db.session.execute(insert(Upload), uploads)
+        db.session.execute(insert(Visit), visits)
+        db.session.commit()
+
+    def time_pages(label):
+        client = app.test_client()
+        client.post('/auth/login', data={'role': 'staff', 'staff_id': 'STF0000', 'password': 'secret'})
+        parent_pk = args.staff + 1
+        timings = {}
+        for name, url in (('staff uploads (all)', '/staff/uploads?status=all'),
+                          ('staff visits', '/staff/visits'),
+                          ('parent detail', f'/staff/parents/{parent_pk}')):
+            start = time.perf_counter()
+            for _ in range(5):
+                response = client.get(url)
+                assert response.status_code == 200, (url, response.status_code)
+            timings[name] = (time.perf_counter() - start) / 5 * 1000
+        print(label + '  ' + '  '.join(f'{name} {ms:7.1f} ms' for name, ms in timings.items()))
+
+    with app.app_context():
+        print('before:', table_sizes())
+    time_pages('hot + history')
+    with app.app_context():
+        start = time.perf_counter()
+        summary = archive_records(after_days=args.after_days)
+        elapsed = time.perf_counter() - start
+        print(f"archived {summary['uploads']} uploads, {summary['visits']} visits, {summary['files']} files "
+              f"({summary['bytes']} -> {summary['packed_bytes']} bytes) in {elapsed:.2f}s")
+        print('after: ', table_sizes())
+    time_pages('hot only     ')
+
+    with app.app_context():
+        parent_pk = args.staff + 1
+        old = today - timedelta(days=2 * args.after_days)
+        upload = Upload(parent_id=parent_pk, child_id=child_of[parent_pk], upload_type='health_report',
+                        file_path='documents/late.pdf', status='verified',
+                        upload_date=datetime.combine(old, datetime.min.time()))
+        visit = Visit(parent_id=parent_pk, staff_id=1, visit_date=old, status='completed')
+        db.session.add_all([upload, visit])
+        db.session.commit()
+        upload_id, visit_id = upload.id, visit.id
+        fresh = upload_id not in {pk for pk, in db.session.query(ArchivedUpload.id)} \
+            and visit_id not in {pk for pk, in db.session.query(ArchivedVisit.id)}
+        summary = archive_records(after_days=args.after_days)
+        moved = summary['uploads'] == 1 and summary['visits'] == 1
+        print(f"archive -> insert -> archive: new ids {upload_id}/{visit_id}, "
+              f"{'OK' if fresh and moved else 'FAILED'}")
+
+
+if __name__ == '__main__':
+    main()
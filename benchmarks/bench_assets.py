@@ -0,0 +1,122 @@
+"""
+Benchmark for the fingerprinted static asset pipeline.
+
+Simulates a browser visiting the login page and the staff dashboard, then
+coming back: with plain static URLs every cached file is revalidated
+(a conditional request answered 304 each time); after `build-assets` the
+hashed URLs carry `immutable`, so the repeat visit requests nothing but
+the pages. Also reports the background image bytes a phone (375px, 2x) and
+a desktop (1440px) download once image variants are built (needs Pillow).
+
+    python benchmarks/bench_assets.py [--visits 20]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STATIC_URL = re.compile(r'(?:href|src)="(/static/[^"]+)"|url\("(/static/[^"]+)"\)')
+
+
+class Browser:
+    """Just enough of an HTTP cache: max-age/immutable and ETag revalidation."""
+
+    def __init__(self, client):
+        self.client = client
+        self.cache = {}
+        self.requests = self.bytes = 0
+
+    def get(self, url):
+        cached = self.cache.get(url)
+        if cached and cached['fresh_until'] > time.time():
+            return None
+        headers = {'If-None-Match': cached['etag']} if cached and cached['etag'] else {}
+        response = self.client.get(url, headers=headers)
+        self.requests += 1
+        self.bytes += len(response.data) + sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+        if response.status_code == 200:
+            max_age = response.cache_control.max_age or 0
+            self.cache[url] = {'etag': response.headers.get('ETag'), 'fresh_until': time.time() + max_age}
+        return response
+
+    def visit(self, page):
+        html = self.get(page).get_data(as_text=True)
+        for match in STATIC_URL.finditer(html):
+            # background_image() emits var(--bg, url(...)); the fallback URL is the one fetched here.
+            self.get(match.group(1) or match.group(2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--visits', type=int, default=20, help='Repeat visits to average.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from app import app
+    from models import db, Staff
+    from services.schema import upgrade_schema
+    from services.assets import build_assets, clean_assets, Image
+    from werkzeug.security import generate_password_hash
+
+    app.config['ASSET_DIST_DIR'] = 'dist-bench'  # removed again at the end
+    with app.app_context():
+        upgrade_schema()
+        db.session.add(Staff(name='Staff', email='staff@bench', password=generate_password_hash('pw'),
+                             staff_id='STF1', max_parents=10))
+        db.session.commit()
+
+    def measure(label):
+        browser = Browser(app.test_client())
+
+        def session():
+            browser.visit('/auth/login')
+            browser.client.post('/auth/login', data={'role': 'staff', 'staff_id': 'STF1', 'password': 'pw'})
+            browser.visit('/staff/dashboard')
+            browser.client.get('/auth/logout')
+
+        session()
+        first = (browser.requests, browser.bytes)
+        browser.requests = browser.bytes = 0
+        for _ in range(args.visits):
+            session()
+        print(f'  {label:<22} first visit {first[0]:3} requests {first[1]:>9,} bytes; '
+              f'repeat visit {browser.requests / args.visits:5.1f} requests {browser.bytes / args.visits:>9,.0f} bytes')
+
+    print(f'login page + staff dashboard ({args.visits} repeat visits)')
+    measure('plain static URLs')
+    try:
+        start = time.perf_counter()
+        with app.app_context():
+            summary = build_assets(app)
+        print(f"  build-assets: {summary['files']} files, {summary['variants']} variants "
+              f'in {(time.perf_counter() - start) * 1000:.0f} ms')
+        measure('fingerprinted')
+        if Image is None:
+            print('  (Pillow not installed; pip install Pillow to build and compare image variants)')
+        else:
+            image_sizes(app)
+    finally:
+        with app.app_context():
+            clean_assets(app)
+
+def image_sizes(app):
+    print('background image bytes')
+    static = app.static_folder
+    for filename, sizes in sorted(app.extensions['assets']['variants'].items()):
+        original = os.path.getsize(os.path.join(static, filename))
+        row = []
+        for label, needed in (('phone 375px@2x', 750), ('desktop 1440px', 1440)):
+            width, path = next((size for size in sizes if size[0] >= needed), sizes[-1])
+            row.append(f'{label} {os.path.getsize(os.path.join(static, path)):>8,} ({width}w)')
+        print(f'  {filename:<28} original {original:>8,}  ' + '  '.join(row))
+
+
+if __name__ == '__main__':
+    main()
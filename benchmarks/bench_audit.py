@@ -0,0 +1,84 @@
+"""
+Benchmark for the audit log.
+
+Compares the cost a request pays per event when it commits its own audit
+row against queueing the event for the batched background writer, then
+times actor / subject lookups over several monthly partitions.
+
+    python benchmarks/bench_audit.py [--events 20000] [--months 12]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--months', type=int, default=12)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    from app import app
+    from models import db
+    from services import audit
+    from services.schema import upgrade_schema
+    from datetime import datetime, timedelta
+
+    random.seed(3)
+    with app.app_context():
+        upgrade_schema()
+
+        # Baseline: one INSERT + COMMIT per event on the request path.
+        table = audit._partition(audit._month_of(datetime.utcnow()))
+        table.create(db.engine, checkfirst=True)
+        sample = min(args.events, 2000)
+        start = time.perf_counter()
+        for i in range(sample):
+            with db.engine.begin() as conn:
+                conn.execute(table.insert(), {'occurred_at': datetime.utcnow(), 'actor_role': 'staff',
+                                              'actor_id': i % 50, 'action': 'upload.verified',
+                                              'subject_type': 'upload', 'subject_id': i})
+        sync = (time.perf_counter() - start) / sample
+        print(f'commit per event   {sync * 1e6:9.1f} us/event')
+
+        latencies = []
+        start = time.perf_counter()
+        for i in range(args.events):
+            t = time.perf_counter()
+            audit.record('upload.verified', 'upload', i, actor=('staff', i % 50), feedback='ok')
+            latencies.append(time.perf_counter() - t)
+        audit.flush()
+        elapsed = time.perf_counter() - start
+        print(f'buffered record()  {statistics.mean(latencies) * 1e6:9.1f} us/event  '
+              f'(p99 {sorted(latencies)[int(len(latencies) * 0.99)] * 1e6:.1f} us, '
+              f'{args.events / elapsed:.0f} events/s incl. final flush)')
+
+        # Spread events over past months to exercise partition pruning.
+        now = datetime.utcnow()
+        for month in range(1, args.months):
+            for i in range(args.events // args.months):
+                audit.record('parent.approved', 'user', random.randrange(5000), actor=('admin', random.randrange(5)))
+                audit._buffers[db.engine][-1]['occurred_at'] = now - timedelta(days=30 * month, minutes=i)
+        audit.flush()
+
+        for label, kwargs in (
+            ('by actor, 30 days', {'actor_id': 3, 'start': now - timedelta(days=30)}),
+            ('by actor, all time', {'actor_id': 3}),
+            ('by subject', {'subject_type': 'user', 'subject_id': 42}),
+        ):
+            start = time.perf_counter()
+            for _ in range(20):
+                found = audit.query_events(**kwargs)
+            print(f'{label:<19} {(time.perf_counter() - start) / 20 * 1000:8.2f} ms  ({len(found)} events)')
+
+
+if __name__ == '__main__':
+    main()
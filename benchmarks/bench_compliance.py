@@ -0,0 +1,113 @@
+"""
+Benchmark for the overdue-compliance index.
+
+Seeds a throwaway SQLite database with a year of monthly reports per child
+and compares the naive approach (load every upload, work out what is
+missing in Python) with a query against compliance_status.
+
+    python benchmarks/bench_compliance.py [--children 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--children', type=int, default=10000)
+    parser.add_argument('--months', type=int, default=12)
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+    from app import app
+    from models import db, User, Staff, Child, Upload
+    from services.schema import upgrade_schema
+    from services.compliance import rebuild_compliance, overdue_items, next_due, REPORT_CATEGORIES
+    from sqlalchemy import insert, select
+
+    random.seed(7)
+    now = datetime.utcnow()
+    today = now.date()
+    staff_count = max(1, args.children // 10)
+
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(insert(Staff), [
+            {'name': f'Staff {i}', 'email': f'staff{i}@bench', 'password': 'x', 'staff_id': f'STF{i:06d}'}
+            for i in range(staff_count)
+        ])
+        staff_ids = db.session.execute(select(Staff.id)).scalars().all()
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': 'x', 'name': f'Parent {i}', 'role': 'parent',
+             'status': 'approved', 'parent_id': f'PAR{i:07d}', 'staff_id': staff_ids[i % staff_count]}
+            for i in range(args.children)
+        ])
+        parent_ids = db.session.execute(select(User.id)).scalars().all()
+        adopted = today - timedelta(days=30 * args.months)
+        db.session.execute(insert(Child), [
+            {'parent_id': parent_id, 'name': f'Child {parent_id}', 'adoption_date': adopted}
+            for parent_id in parent_ids
+        ])
+        children = db.session.execute(select(Child.id, Child.parent_id)).all()
+
+        uploads = []
+        for child_id, parent_id in children:
+            for month in range(args.months):
+                for category in REPORT_CATEGORIES:
+                    if random.random() < 0.9:
+                        uploads.append({
+                            'parent_id': parent_id, 'child_id': child_id, 'upload_type': category,
+                            'file_path': 'documents/x.pdf',
+                            'upload_date': now - timedelta(days=30 * month + random.randint(0, 20)),
+                            'status': 'verified' if random.random() < 0.85 else 'pending'
+                        })
+        for start in range(0, len(uploads), 10000):
+            db.session.execute(insert(Upload), uploads[start:start + 10000])
+        db.session.commit()
+        print(f'{len(children)} children, {len(uploads)} uploads, {staff_count} staff')
+
+        def timed(label, fn):
+            start = time.perf_counter()
+            result = fn()
+            print(f'{label:<34} {(time.perf_counter() - start) * 1000:9.1f} ms  ({result})')
+
+        def naive(staff_id=None):
+            query = Upload.query.join(User, User.id == Upload.parent_id)
+            if staff_id is not None:
+                query = query.filter(User.staff_id == staff_id)
+            last = {}
+            for upload in query.all():
+                if upload.status == 'verified':
+                    key = (upload.child_id, upload.upload_type)
+                    last[key] = max(last.get(key, upload.upload_date), upload.upload_date)
+            child_query = Child.query.join(User, User.id == Child.parent_id)
+            if staff_id is not None:
+                child_query = child_query.filter(User.staff_id == staff_id)
+            overdue = 0
+            for child in child_query.all():
+                for category in REPORT_CATEGORIES:
+                    verified = last.get((child.id, category))
+                    if next_due(category, verified.date() if verified else None, child.adoption_date) <= today:
+                        overdue += 1
+            db.session.expunge_all()
+            return overdue
+
+        timed('naive scan (admin)', naive)
+        timed('naive scan (one mentor)', lambda: naive(staff_ids[0]))
+        timed('full rebuild', rebuild_compliance)
+        timed('index query (admin, reports)',
+              lambda: sum(len(overdue_items(category=c)) for c in REPORT_CATEGORIES))
+        timed('index query (one mentor, reports)',
+              lambda: sum(len(overdue_items(staff_id=staff_ids[0], category=c)) for c in REPORT_CATEGORIES))
+
+
+if __name__ == '__main__':
+    main()
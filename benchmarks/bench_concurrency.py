@@ -0,0 +1,123 @@
+"""
+Concurrency harness for optimistic version checks.
+
+--threads workers play mentors saving the same few uploads (--hot rows)
+at once. Each save reads the upload, spends --work-ms on the rest of the
+request (validation, notifications) and writes back a read-modify-write
+change (size_bytes + 1), the shape of verify_upload / complete_visit.
+
+Modes:
+  last-writer-wins  plain UPDATE, no check (the old behaviour)
+  optimistic        Upload.version compare-and-swap; a conflict fails fast
+  pessimistic       lock before reading and hold it for the request
+                    (SELECT ... FOR UPDATE; SQLite only has a database-wide
+                    lock, taken with BEGIN IMMEDIATE)
+
+Lost updates = committed saves whose increment is missing from the final
+totals. Every mode should show 0 except last-writer-wins.
+
+    python benchmarks/bench_concurrency.py [--threads 8] [--saves 100] [--hot 4] [--work-ms 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--saves', type=int, default=100, help='Saves per thread.')
+    parser.add_argument('--hot', type=int, default=4, help='Uploads everyone is editing.')
+    parser.add_argument('--work-ms', type=float, default=5.0, help='Request time between read and write.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import app
+    from models import db, User, Child, Upload
+    from services.schema import upgrade_schema
+    from services.concurrency import CONFLICTS
+    from sqlalchemy import insert, update, select, func
+
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(insert(User), [{'email': 'parent@bench', 'password': 'x', 'name': 'Parent',
+                                           'role': 'parent', 'status': 'approved'}])
+        db.session.execute(insert(Child), [{'parent_id': 1, 'name': 'Child'}])
+        db.session.execute(insert(Upload), [
+            {'parent_id': 1, 'child_id': 1, 'upload_type': 'health_report', 'file_path': f'documents/{i}.pdf',
+             'size_bytes': 0} for i in range(args.hot)
+        ])
+        db.session.commit()
+        sqlite = db.engine.dialect.name == 'sqlite'
+
+    def save(mode, upload_id):
+        """One request; returns True if committed, False on a conflict."""
+        if mode == 'pessimistic' and sqlite:
+            connection = db.session.connection()
+            connection.exec_driver_sql('PRAGMA busy_timeout = 60000')  # waiters queue; don't time out
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+        query = select(Upload).where(Upload.id == upload_id)
+        if mode == 'pessimistic' and not sqlite:
+            query = query.with_for_update()
+        upload = db.session.execute(query).scalar_one()
+        seen = upload.size_bytes
+        time.sleep(args.work_ms / 1000)
+        try:
+            if mode == 'last-writer-wins':
+                db.session.execute(update(Upload.__table__).where(Upload.__table__.c.id == upload_id)
+                                   .values(size_bytes=seen + 1))
+            else:
+                upload.size_bytes = seen + 1
+            db.session.commit()
+            return True
+        except CONFLICTS:
+            db.session.rollback()
+            return False
+
+    def run(mode):
+        with app.app_context():
+            db.session.execute(update(Upload.__table__).values(size_bytes=0))
+            db.session.commit()
+        results = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            with app.app_context():
+                for _ in range(args.saves):
+                    start = time.perf_counter()
+                    committed = save(mode, rng.randint(1, args.hot))
+                    results.append((committed, (time.perf_counter() - start) * 1000))
+                    db.session.remove()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            applied = db.session.execute(select(func.sum(Upload.size_bytes))).scalar()
+        committed = sum(1 for ok, _ in results if ok)
+        latencies = sorted(ms for _, ms in results)
+        print(f'{mode:<18} {len(results) / elapsed:8.0f} req/s  {committed / elapsed:8.0f} saves/s  '
+              f'committed {committed:5}  conflicts {len(results) - committed:5}  lost {committed - applied:5}  '
+              f'p50 {statistics.median(latencies):6.1f} ms  p95 {latencies[int(len(latencies) * 0.95)]:6.1f} ms')
+
+    print(f'{args.threads} threads x {args.saves} saves on {args.hot} uploads, {args.work_ms} ms per request')
+    for mode in ('last-writer-wins', 'optimistic', 'pessimistic'):
+        run(mode)
+
+
+if __name__ == '__main__':
+    main()
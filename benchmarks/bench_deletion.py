@@ -0,0 +1,126 @@
+"""
+Benchmark for soft deletion and background compaction.
+
+Seeds --staff staff members with --parents-per-staff parents each, one child,
+--uploads-per-parent uploads (with files on disk) and a few visits per
+parent. Times:
+  - the admin "delete staff" action: soft delete + bulk reassignment of the
+    parents and their scheduled visits
+  - the admin "delete parent" action
+  - the equivalent synchronous hard delete of a parent (rows and files
+    removed inside the request, as delete_guidance used to)
+  - `compact-deleted` purging the deleted parents in batches
+  - listing approved parents with deleted rows filtered out
+
+    python benchmarks/bench_deletion.py [--staff 200] [--parents-per-staff 20] [--uploads-per-parent 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--staff', type=int, default=200)
+    parser.add_argument('--parents-per-staff', type=int, default=20)
+    parser.add_argument('--uploads-per-parent', type=int, default=10)
+    parser.add_argument('--deletions', type=int, default=20, help='Staff / parents deleted per timing.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from app import app
+    from models import db, User, Staff, Child, Upload, Visit
+    from services.schema import upgrade_schema
+    from services import deletion
+    from services.archive import _still_referenced
+    from sqlalchemy import insert, select, delete
+
+    def timed(label, fn, items):
+        times = []
+        for item in items:
+            start = time.perf_counter()
+            fn(item)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f'{label:<52} median {statistics.median(times):7.1f} ms  max {max(times):7.1f} ms')
+
+    with app.app_context():
+        upgrade_schema()
+        capacity = args.parents_per_staff * 2  # room for everyone's parents to move
+        db.session.execute(insert(Staff), [
+            {'name': f'Staff {i}', 'email': f'staff{i}@bench', 'password': 'x', 'staff_id': f'STF{i}',
+             'max_parents': capacity, 'assigned_parent_count': args.parents_per_staff}
+            for i in range(args.staff)
+        ])
+        parents = args.staff * args.parents_per_staff
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': 'x', 'name': f'Parent {i}', 'role': 'parent',
+             'status': 'approved', 'parent_id': f'PAR{i:06d}', 'staff_id': i // args.parents_per_staff + 1}
+            for i in range(parents)
+        ])
+        db.session.execute(insert(Child), [{'parent_id': i, 'name': f'Child {i}'} for i in range(1, parents + 1)])
+        os.makedirs(os.path.join('uploads', 'documents'), exist_ok=True)
+        uploads = []
+        for parent_id in range(1, parents + 1):
+            for n in range(args.uploads_per_parent):
+                path = f'documents/{parent_id}-{n}.pdf'
+                with open(os.path.join('uploads', path), 'wb') as out:
+                    out.write(b'%PDF-1.4 bench')
+                uploads.append({'parent_id': parent_id, 'child_id': parent_id, 'upload_type': 'health_report',
+                                'file_path': path, 'status': 'pending'})
+        db.session.execute(insert(Upload), uploads)
+        today = date.today()
+        db.session.execute(insert(Visit), [
+            {'parent_id': i, 'staff_id': (i - 1) // args.parents_per_staff + 1, 'status': status,
+             'visit_date': today + timedelta(days=offset)}
+            for i in range(1, parents + 1) for status, offset in (('completed', -90), ('scheduled', 7))
+        ])
+        db.session.commit()
+        print(f'{args.staff} staff, {parents} parents, {len(uploads)} uploads with files')
+
+        def delete_staff(staff_id):
+            deletion.delete_staff(db.session.get(Staff, staff_id))
+            db.session.commit()
+
+        def delete_parent(parent_id):
+            deletion.delete_parent(db.session.get(User, parent_id))
+            db.session.commit()
+
+        def hard_delete_parent(parent_id):
+            paths = set(db.session.execute(select(Upload.file_path).where(Upload.parent_id == parent_id)).scalars())
+            for model in (Upload, Visit, Child):
+                db.session.execute(delete(model).where(model.parent_id == parent_id))
+            db.session.execute(delete(User).where(User.id == parent_id))
+            db.session.commit()
+            for path in paths - _still_referenced(paths):
+                os.remove(os.path.join('uploads', path))
+
+        timed(f'delete staff ({args.parents_per_staff} parents reassigned)', delete_staff,
+              range(1, args.deletions + 1))
+        timed('delete parent (soft)', delete_parent, range(1, args.deletions + 1))
+        timed(f'delete parent (hard, {args.uploads_per_parent} files in the request)', hard_delete_parent,
+              range(parents - args.deletions + 1, parents + 1))
+
+        start = time.perf_counter()
+        stats = deletion.compact_deleted(after_days=0, batch_size=500)
+        print(f"compact-deleted: {stats['parents']} parents, {stats['files']} files, {stats['staff']} staff "
+              f'in {(time.perf_counter() - start) * 1000:.0f} ms (background)')
+
+        times = []
+        for _ in range(20):
+            start = time.perf_counter()
+            User.query.filter_by(role='parent', status='approved').count()
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{'count approved parents (deleted filtered out)':<52} median {statistics.median(times):7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
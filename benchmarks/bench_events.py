@@ -0,0 +1,121 @@
+"""
+Benchmark for the live-events fan-out server.
+
+Starts sse_server.py on a throwaway SQLite bus, opens --connections idle
+EventSource-style connections (one channel each), then publishes events to
+random users from this process and measures delivery latency, plus the
+server's memory before and after the connections arrive.
+
+    python benchmarks/bench_events.py [--connections 5000] [--events 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def rss_kb(pid):
+    with open(f'/proc/{pid}/status') as handle:
+        for line in handle:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+async def run(args, server, port):
+    from app import app
+    from services.events import SQLiteBus, _serializer
+
+    bus = SQLiteBus(args.bus_path)
+    serializer = _serializer(app.config['SECRET_KEY'])
+    latencies = []
+    received = asyncio.Event()
+    expected = args.events
+
+    async def client(i):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=2 ** 20)
+        token = serializer.dumps([f'user:{i}'])
+        writer.write(f'GET /stream?token={token} HTTP/1.1\r\nHost: bench\r\n\r\n'.encode())
+        await writer.drain()
+        await reader.readuntil(b'\r\n\r\n')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                if line.startswith(b'data: '):
+                    sent = json.loads(line[6:])['sent']
+                    latencies.append(time.time() - sent)
+                    if len(latencies) >= expected:
+                        received.set()
+        finally:
+            writer.close()
+
+    baseline = rss_kb(server.pid)
+    start = time.perf_counter()
+    tasks = []
+    for i in range(args.connections):
+        tasks.append(asyncio.create_task(client(i)))
+        if i % 500 == 499:
+            await asyncio.sleep(0.05)
+    await asyncio.sleep(1)
+    connected = time.perf_counter() - start
+    loaded = rss_kb(server.pid)
+    print(f'{args.connections} idle connections in {connected:.1f}s; server RSS '
+          f'{baseline / 1024:.1f} -> {loaded / 1024:.1f} MB '
+          f'({(loaded - baseline) / max(args.connections, 1):.1f} KB/connection)')
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    for _ in range(args.events):
+        await loop.run_in_executor(None, bus.publish, f'user:{random.randrange(args.connections)}',
+                                   'upload.status', {'sent': time.time()})
+        await asyncio.sleep(1 / args.rate)
+    try:
+        await asyncio.wait_for(received.wait(), 30)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f'{len(latencies)}/{args.events} events delivered at {args.rate}/s over {elapsed:.1f}s; '
+          f'latency p50 {statistics.median(latencies) * 1000:.1f} ms, '
+          f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms')
+    for task in tasks:
+        task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--rate', type=int, default=500, help='Events published per second.')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    args.bus_path = os.path.join(workdir, 'events.db')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+               EVENTS_BUS=f'sqlite:///{args.bus_path}')
+    os.environ.update(env)
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'sse_server.py'), '--port', str(args.port)],
+                              env=env, cwd=workdir, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(2)
+        asyncio.run(run(args, server, args.port))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
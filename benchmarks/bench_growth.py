@@ -0,0 +1,112 @@
+"""
+Benchmark for the growth analytics engine.
+
+Seeds a throwaway SQLite database with children aged 0-18 and a few
+measurements each, then times the vectorised cohort summary against a
+per-row Python loop computing the same z-scores.
+
+    python benchmarks/bench_growth.py [--children 30000]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--children', type=int, default=30000)
+    parser.add_argument('--per-child', type=int, default=4)
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+    from app import app
+    from models import db, User, Child, GrowthMeasurement
+    from services.schema import upgrade_schema
+    from services.growth import cohort_summary, latest_measurements, score_latest, load_reference, \
+        MEASURES, SEXES, DAYS_PER_MONTH
+    from sqlalchemy import insert, select
+    import numpy as np
+
+    random.seed(7)
+    today = datetime.now().date()
+
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': 'x', 'name': f'Parent {i}', 'role': 'parent',
+             'status': 'approved'}
+            for i in range(args.children)
+        ])
+        parent_ids = db.session.execute(select(User.id)).scalars().all()
+        db.session.execute(insert(Child), [
+            {'parent_id': parent_id, 'name': f'Child {parent_id}',
+             'gender': random.choice(['Male', 'Female']),
+             'dob': today - timedelta(days=random.randint(30, 17 * 365))}
+            for parent_id in parent_ids
+        ])
+        children = db.session.execute(select(Child.id, Child.dob, Child.gender)).all()
+        reference = load_reference()
+        rows = []
+        for child_id, dob, gender in children:
+            for n in range(args.per_child):
+                measured = today - timedelta(days=30 * n)
+                if measured <= dob:
+                    continue
+                age = (measured - dob).days / DAYS_PER_MONTH
+                sex = SEXES[gender.lower()]
+                row = {'child_id': child_id, 'measured_on': measured}
+                for measure, column in MEASURES.items():
+                    ages, _, M, S = reference[(measure, sex)]
+                    if age <= ages[-1]:
+                        median = float(np.interp(age, ages, M))
+                        spread = float(np.interp(age, ages, S))
+                        row[column] = median * (1 + spread * random.gauss(0, 1.1))
+                    else:
+                        row[column] = None
+                rows.append(row)
+        for start in range(0, len(rows), 10000):
+            db.session.execute(insert(GrowthMeasurement), rows[start:start + 10000])
+        db.session.commit()
+        print(f'{len(children)} children, {len(rows)} measurements')
+
+        def timed(label, fn):
+            start = time.perf_counter()
+            result = fn()
+            print(f'{label:<30} {(time.perf_counter() - start) * 1000:9.1f} ms')
+            return result
+
+        def per_row_loop():
+            # The same maths one child and one measure at a time.
+            reference = load_reference()
+            data = latest_measurements()
+            scores = []
+            for i in range(len(data['child_id'])):
+                for measure in MEASURES:
+                    table = reference.get((measure, int(data['sex'][i])))
+                    value, age = data[measure][i], data['age_months'][i]
+                    if table is None or math.isnan(value) or not table[0][0] <= age <= table[0][-1]:
+                        continue
+                    L, M, S = (float(np.interp(age, table[0], col)) for col in table[1:])
+                    scores.append(((value / M) ** L - 1) / (L * S) if abs(L) > 1e-6 else math.log(value / M) / S)
+            return scores
+
+        timed('load latest measurements', latest_measurements)
+        timed('per-row python loop', per_row_loop)
+        timed('vectorised z-scores only', score_latest)
+        summary = timed('vectorised cohort summary', cohort_summary)
+        timed('vectorised (warm)', cohort_summary)
+        for row in summary[:3]:
+            print(' ', row['sex'], row['age_band'], row['children'], row['height'])
+
+
+if __name__ == '__main__':
+    main()
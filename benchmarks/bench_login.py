@@ -0,0 +1,115 @@
+"""
+Benchmark for login throughput under concurrency.
+
+Seeds parents whose passwords were hashed under a legacy policy, then fires
+concurrent logins through the Flask test client (one client per thread)
+with hashing inline on the request thread and through the process pool.
+The first pass also upgrades every legacy hash to the current policy.
+While each burst runs, a probe thread times a cheap page to show how
+request workers are affected.
+
+    python benchmarks/bench_login.py [--users 200] [--threads 16]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--method', default='scrypt:16384:8:1')
+    parser.add_argument('--legacy-method', default='pbkdf2:sha256:100000')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    from app import app
+    from models import db, User
+    from services import passwords
+    from services.schema import upgrade_schema
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import insert, select, func
+
+    app.config['PASSWORD_HASH_METHOD'] = args.method
+    app.config['RATELIMIT_ENABLED'] = False  # every login comes from one address; this measures hashing
+    legacy = generate_password_hash('secret', method=args.legacy_method)
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': legacy, 'name': f'Parent {i}',
+             'role': 'parent', 'status': 'approved', 'parent_id': f'PAR{i:06d}'}
+            for i in range(args.users)
+        ])
+        db.session.commit()
+
+    def burst(label, workers):
+        passwords.shutdown()
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        queue = list(range(args.users))
+        lock = threading.Lock()
+        latencies = []
+        probe = []
+        done = threading.Event()
+
+        def login_worker():
+            client = app.test_client()
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    i = queue.pop()
+                start = time.perf_counter()
+                response = client.post('/auth/login', data={
+                    'role': 'parent', 'parent_id': f'PAR{i:06d}', 'password': 'secret'})
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 302, response.status_code
+                client.get('/auth/logout')
+
+        def probe_worker():
+            client = app.test_client()
+            while not done.is_set():
+                start = time.perf_counter()
+                client.get('/auth/register')
+                probe.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+        prober = threading.Thread(target=probe_worker)
+        prober.start()
+        threads = [threading.Thread(target=login_worker) for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        prober.join()
+        latencies.sort()
+        probe.sort()
+        print(f'{label:<26} {args.users / elapsed:7.1f} logins/s  '
+              f'p50 {statistics.median(latencies) * 1000:7.1f} ms  '
+              f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms  '
+              f'page p95 {probe[int(len(probe) * 0.95)] * 1000:7.1f} ms')
+
+    print(f'{args.users} users, {args.threads} threads, {os.cpu_count()} CPUs')
+    burst('pool (+ legacy rehash)', os.cpu_count() or 1)
+    with app.app_context():
+        upgraded = db.session.execute(
+            select(func.count()).select_from(User).where(User.password.like(f'{args.method}$%'))
+        ).scalar()
+    print(f'{upgraded}/{args.users} hashes upgraded to {args.method}')
+    burst('inline', 0)
+    burst('pool', os.cpu_count() or 1)
+    passwords.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+Benchmark for the offline-capable parent portal.
+
+Seeds --parents parents (two children, --uploads uploads and a few visits
+each) and replays --sessions portal sessions per parent (dashboard, uploads,
+visits). Between sessions staff review one of the parent's uploads with
+probability --change-rate. Two clients are compared:
+
+  plain           every page is a full render
+  service worker  a Python stand-in for static/js/parent-sw.js: one
+                  /parent/api/sync pull per session, cached pages shown
+                  unless the pull names them (then refetched as conditional
+                  GETs, 304 when the page itself didn't change)
+
+Reported per session: requests, SQL statements, server time and bytes.
+
+Then one parent goes offline for --offline-sessions sessions: pages come
+from the worker's cache, uploads are queued and replayed on reconnect (the
+first replay "loses" its response and is sent again), and the result is
+checked: every queued upload stored exactly once, none lost.
+
+    python benchmarks/bench_offline.py [--parents 50] [--sessions 20] [--uploads 30] [--change-rate 0.2]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAGES = ('/parent/dashboard', '/parent/uploads', '/parent/visits')
+
+
+class Meter:
+    """Counts requests, SQL statements, server time and response bytes."""
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = self.statements = self.bytes = 0
+        self.seconds = 0.0
+
+    def call(self, method, url, **kwargs):
+        start = time.perf_counter()
+        response = getattr(self.client, method)(url, **kwargs)
+        self.seconds += time.perf_counter() - start
+        self.requests += 1
+        self.bytes += len(response.data)
+        return response
+
+
+class ServiceWorker:
+    """What parent-sw.js does, driven from Python."""
+
+    def __init__(self, meter):
+        self.meter = meter
+        self.pages = {}  # url: body, as in the worker's page cache
+        self.etags = {}  # url: ETag, as in the browser's HTTP cache
+        self.records = {}
+        self.meta = {}
+        self.queue = []
+        self.online = True
+
+    def fetch(self, url):
+        headers = {'If-None-Match': self.etags[url][0]} if url in self.etags else {}
+        response = self.meter.call('get', url, headers=headers)
+        if response.status_code == 200 and response.headers.get('ETag'):
+            self.etags[url] = (response.headers['ETag'], response.data)
+        if url in self.etags:
+            self.pages[url] = self.etags[url][1]
+        return self.pages.get(url, response.data)
+
+    def open(self, url):
+        """A navigation from another portal page."""
+        if url in self.pages or not self.online:
+            return self.pages.get(url)
+        return self.fetch(url)
+
+    def pull(self):
+        watermark = self.meta.get('watermark')
+        delta = self.meter.call('get', '/parent/api/sync' + (f'?since={watermark}' if watermark else '')).get_json()
+        if any(delta[key] != self.meta.get(key) for key in ('parent', 'version', 'today')):
+            self.pages.clear()
+        if delta['full']:
+            self.records.clear()
+        for kind in ('children', 'uploads', 'visits', 'guidance'):
+            for row in delta[kind]:
+                self.records[kind, row['id']] = row
+            for row_id in delta['removed'].get(kind, ()):
+                self.records.pop((kind, row_id), None)
+        self.meta = {key: delta[key] for key in ('watermark', 'parent', 'version', 'today')}
+        for url in delta['refresh']:
+            if self.pages.pop(url, None) is not None:
+                self.fetch(url)
+
+    def post_upload(self, fields):
+        if not self.online:
+            self.queue.append(fields)
+            return
+        self.pages.clear()  # after a post the next page comes from the server
+        self.meter.call('post', '/parent/uploads', data=dict(fields, file=(io.BytesIO(fields['file']), 'report.pdf')),
+                        content_type='multipart/form-data')
+
+    def replay(self, lose_first_response=False):
+        while self.queue:
+            fields = self.queue[0]
+            self.post_upload(fields)
+            if lose_first_response:
+                lose_first_response = False
+                continue  # the server got it, the worker didn't hear back: sent again
+            self.queue.pop(0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--parents', type=int, default=50)
+    parser.add_argument('--sessions', type=int, default=20, help='Portal sessions per parent.')
+    parser.add_argument('--uploads', type=int, default=30, help='Uploads per parent.')
+    parser.add_argument('--change-rate', type=float, default=0.2, help='Chance staff change something between sessions.')
+    parser.add_argument('--offline-sessions', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from app import app
+    from models import db, User, Staff, Child, Upload, Visit, Guidance
+    from services.schema import upgrade_schema
+    from sqlalchemy import insert, event, func, select
+    from werkzeug.security import generate_password_hash
+
+    app.config['SYNC_OVERLAP_SECONDS'] = 0  # sessions here are milliseconds apart, not minutes
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    app.config['LOGIN_RATE_LIMIT_IP'] = (10 ** 6, 300)  # every simulated parent signs in from one address
+    password = generate_password_hash('pw', method=app.config['PASSWORD_HASH_METHOD'])
+    today = date.today()
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(insert(Staff), [{'name': 'Staff', 'email': 'staff@bench', 'password': 'x',
+                                            'staff_id': 'STF1', 'max_parents': args.parents}])
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': password, 'name': f'Parent {i}', 'role': 'parent',
+             'status': 'approved', 'parent_id': f'PAR{i}', 'staff_id': 1} for i in range(1, args.parents + 1)
+        ])
+        db.session.execute(insert(Child), [{'parent_id': i // 2 + 1, 'name': f'Child {i}'}
+                                           for i in range(args.parents * 2)])
+        db.session.execute(insert(Upload), [
+            {'parent_id': i, 'child_id': 2 * i - 1, 'upload_type': 'health_report',
+             'file_path': f'documents/{i}-{n}.pdf', 'status': 'pending', 'sha256': f'{i}-{n}',
+             'upload_date': datetime.utcnow() - timedelta(days=n)}
+            for i in range(1, args.parents + 1) for n in range(args.uploads)
+        ])
+        db.session.execute(insert(Visit), [
+            {'parent_id': i, 'staff_id': 1, 'visit_date': today + timedelta(days=offset), 'status': status}
+            for i in range(1, args.parents + 1)
+            for offset, status in ((-180, 'completed'), (-90, 'completed'), (7, 'scheduled'), (97, 'scheduled'))
+        ])
+        db.session.execute(insert(Guidance), [{'title': f'Guide {n}', 'category': 'faq'} for n in range(20)])
+        db.session.commit()
+        engine = db.engine
+
+    statements = [0]
+    event.listen(engine, 'before_cursor_execute', lambda *_: statements.__setitem__(0, statements[0] + 1))
+
+    def sign_in(parent):
+        client = app.test_client()
+        client.post('/auth/login', data={'role': 'parent', 'parent_id': f'PAR{parent}', 'password': 'pw'})
+        client.get('/parent/dashboard')  # shows the login flash
+        return client
+
+    def staff_change(parent, rng):
+        with app.app_context():
+            upload = db.session.execute(select(Upload).where(Upload.parent_id == parent, Upload.status == 'pending')
+                                        .limit(1)).scalar()
+            if upload:
+                upload.status = rng.choice(('verified', 'rejected'))
+                upload.verified_by, upload.verified_at = 1, datetime.utcnow()
+                db.session.commit()
+            db.session.remove()
+
+    def run(label, make_session):
+        rng = random.Random(1)
+        totals = Meter(None)
+        for parent in range(1, args.parents + 1):
+            meter = Meter(sign_in(parent))
+            session = make_session(meter)
+            before = statements[0]
+            for _ in range(args.sessions):
+                session()
+                if rng.random() < args.change_rate:
+                    staff_change(parent, rng)
+            totals.statements += statements[0] - before
+            totals.requests += meter.requests
+            totals.seconds += meter.seconds
+            totals.bytes += meter.bytes
+        count = args.parents * args.sessions
+        print(f'  {label:<16} {totals.requests / count:5.1f} requests  {totals.statements / count:6.1f} SQL  '
+              f'{totals.seconds * 1000 / count:7.1f} ms  {totals.bytes / count:>9,.0f} bytes per session')
+
+    def plain(meter):
+        def session():
+            for url in PAGES:
+                meter.call('get', url)
+        return session
+
+    def with_worker(meter):
+        worker = ServiceWorker(meter)
+
+        def session():
+            worker.pull()
+            for url in PAGES:
+                worker.open(url)
+        return session
+
+    print(f'{args.parents} parents x {args.sessions} sessions ({", ".join(PAGES)}), '
+          f'{args.uploads} uploads each, change rate {args.change_rate}')
+    run('plain', plain)
+    # Staff changes above made many uploads non-pending; reset so both runs see the same data.
+    with app.app_context():
+        db.session.execute(Upload.__table__.update().values(status='pending', verified_by=None, verified_at=None))
+        db.session.commit()
+    run('service worker', with_worker)
+
+    # Offline: pages from the cache, uploads queued, replayed on reconnect.
+    parent = 1
+    worker = ServiceWorker(Meter(sign_in(parent)))
+    worker.pull()
+    for url in PAGES:
+        worker.open(url)
+    with app.app_context():
+        before = db.session.execute(select(func.count()).where(Upload.parent_id == parent)).scalar()
+    served = worker.meter.requests
+    worker.online = False
+    shown = 0
+    for n in range(args.offline_sessions):
+        shown += sum(1 for url in PAGES if worker.open(url))
+        worker.post_upload({'child_id': '1', 'upload_type': 'health_report',
+                            'file': b'%PDF-1.4\n1 0 obj<</Type /Page>>endobj\n%% offline report ' + str(n).encode()
+                            + b'\n%%EOF'})
+    print(f'offline: {shown}/{args.offline_sessions * len(PAGES)} page views served from the cache, '
+          f'{worker.meter.requests - served} requests, {len(worker.queue)} uploads queued')
+    worker.online = True
+    worker.replay(lose_first_response=True)
+    worker.pull()
+    with app.app_context():
+        after = db.session.execute(select(func.count()).where(Upload.parent_id == parent)).scalar()
+    synced = sum(1 for kind, _ in worker.records if kind == 'uploads')
+    status = 'OK' if after - before == args.offline_sessions and synced == after else 'MISMATCH'
+    print(f'reconnect: {args.offline_sessions + 1} posts replayed (one repeated), {after - before} uploads stored, '
+          f'{synced} uploads in the synced copy: {status}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Load test for login rate limiting.
+
+A legitimate user logs in repeatedly while attacker threads replay wrong
+passwords for random Parent IDs from a handful of IPs at a fixed rate
+(credential stuffing). Legitimate login latency is reported with no
+attack, under attack without limiting, and under attack with limiting
+(memory and shared SQLite backends).
+
+With limiting on, each attacker IP still gets its first attempts through,
+and each of those costs a password hash. Logins during that warm-up are
+reported separately. The steady-state figures are measured for --seconds
+once every attacker IP is being answered 429; a rejected attempt does no
+lookup and no hashing, so they should match the no-attack run.
+
+    python benchmarks/bench_ratelimit.py [--attackers 8] [--rate 10] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--attackers', type=int, default=8)
+    parser.add_argument('--attacker-ips', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=10, help='Attempts per second per attacker thread.')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--max-warmup', type=float, default=60,
+                        help='Give up waiting for every attacker IP to be throttled after this many seconds.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import app
+    from models import db, User
+    from services import passwords
+    from services.schema import upgrade_schema
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import insert
+
+    # A short window so the attack hits the limit within the run.
+    app.config['LOGIN_RATE_LIMIT_IP'] = (10, 60)
+    hashed = generate_password_hash('secret', method=app.config['PASSWORD_HASH_METHOD'])
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': hashed, 'name': f'Parent {i}',
+             'role': 'parent', 'status': 'approved', 'parent_id': f'PAR{i:06d}'}
+            for i in range(args.users)
+        ])
+        db.session.commit()
+
+    def scenario(label, attack, enabled=True, storage='memory'):
+        app.config['RATELIMIT_ENABLED'] = enabled
+        app.config['RATELIMIT_STORAGE'] = storage
+        app.extensions.pop('ratelimit', None)
+        stop = threading.Event()
+        attempts = []
+        rejected = []
+        throttled = set()  # attacker IPs answered 429 at least once
+
+        def attacker(n):
+            client = app.test_client()
+            ip = f'10.0.0.{n % args.attacker_ips + 1}'
+            while not stop.is_set():
+                sent = time.perf_counter()
+                response = client.post('/auth/login', environ_base={'REMOTE_ADDR': ip}, data={
+                    'role': 'parent', 'parent_id': f'PAR{random.randrange(args.users):06d}',
+                    'password': 'guess'})
+                attempts.append(1)
+                if response.status_code == 429:
+                    rejected.append(1)
+                    throttled.add(ip)
+                # Fixed offered load, as a remote attacker would generate.
+                stop.wait(max(0, 1 / args.rate - (time.perf_counter() - sent)))
+
+        threads = [threading.Thread(target=attacker, args=(n,)) for n in range(args.attackers if attack else 0)]
+        for thread in threads:
+            thread.start()
+
+        client = app.test_client()
+        warmup, steady = [], []
+        # Without limiting the attack never lets up, so the whole run is steady state.
+        warming = attack and enabled
+        started = time.perf_counter()
+        deadline = None if warming else started + args.seconds
+        while deadline is None or time.perf_counter() < deadline:
+            if warming and (len(throttled) == min(args.attackers, args.attacker_ips)
+                            or time.perf_counter() - started > args.max_warmup):
+                warming = False
+                deadline = time.perf_counter() + args.seconds
+            # A different device per login keeps the legitimate side under the per-IP limit.
+            n = len(warmup) + len(steady)
+            ip = f'192.168.{n // 250}.{n % 250 + 1}'
+            start = time.perf_counter()
+            response = client.post('/auth/login', environ_base={'REMOTE_ADDR': ip}, data={
+                'role': 'parent', 'parent_id': 'PAR000000', 'password': 'secret'})
+            (warmup if warming else steady).append(time.perf_counter() - start)
+            assert response.status_code == 302, response.status_code
+            client.get('/auth/logout')
+        stop.set()
+        for thread in threads:
+            thread.join()
+        steady.sort()
+        print(f'{label:<34} legit p50 {statistics.median(steady) * 1000:7.1f} ms  '
+              f'p95 {steady[int(len(steady) * 0.95)] * 1000:7.1f} ms  '
+              f'attack attempts {len(attempts):6d} (429: {len(rejected)})')
+        if warmup:
+            print(f'  {"before throttling (" + str(len(warmup)) + " logins)":<32} legit p50 '
+                  f'{statistics.median(warmup) * 1000:7.1f} ms')
+
+    print(f'{args.attackers} attacker threads at {args.rate}/s from {args.attacker_ips} IPs, {os.cpu_count()} CPUs, '
+          f'limit {app.config["LOGIN_RATE_LIMIT_IP"][0]} logins/IP/{app.config["LOGIN_RATE_LIMIT_IP"][1]}s')
+    scenario('no attack', attack=False)
+    scenario('attack, limiting off', attack=True, enabled=False)
+    scenario('attack, memory limiter', attack=True)
+    scenario('attack, sqlite limiter', attack=True, storage=f"sqlite:///{os.path.join(workdir, 'ratelimit.db')}")
+    passwords.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark for regional databases.
+
+Seeds --regions regional SQLite files with the same volume of parents and
+uploads each, plus one combined database holding all of them (today's
+single adoption_system.db). Compares:
+  - a typical per-office query (an office's pending uploads, newest first)
+    against its own database vs the combined one
+  - the admin cross-region report (services.tenancy.for_each_region) run
+    region by region vs in parallel threads, on the local files and again
+    with --latency-ms added to every statement, as a database server
+    elsewhere on the network would
+
+Local SQLite work is CPU-bound, so threads don't help there and only
+the second pair shows what the parallel mode is for.
+
+    python benchmarks/bench_regions.py [--regions 4] [--parents 5000] [--uploads-per-parent 25] [--latency-ms 2]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--regions', type=int, default=4)
+    parser.add_argument('--parents', type=int, default=5000, help='Parents per region.')
+    parser.add_argument('--uploads-per-parent', type=int, default=25)
+    parser.add_argument('--latency-ms', type=float, default=2, help='Simulated round trip per statement.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    names = [f'region{i}' for i in range(args.regions)] + ['combined']
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'main.db')}"
+    os.environ['REGIONS'] = ','.join(f"{name}=sqlite:///{os.path.join(workdir, name + '.db')}" for name in names)
+
+    from app import app
+    from models import db, User, Staff, Child, Upload
+    from services.schema import upgrade_schema
+    from services.tenancy import use_region, for_each_region, BIND_PREFIX
+    from services.regions import region_summary
+    from sqlalchemy import insert, select, event
+
+    random.seed(11)
+    now = datetime.utcnow()
+
+    def seed(offices):
+        # One staff member per 25 parents; parent ids are unique per office.
+        staff = [{'name': f'Staff {o}-{i}', 'email': f'staff{i}@{o}', 'password': 'x', 'staff_id': f'{o}-{i}',
+                  'max_parents': 30} for o in offices for i in range(args.parents // 25)]
+        db.session.execute(insert(Staff), staff)
+        staff_ids = db.session.execute(select(Staff.id)).scalars().all()
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@{o}', 'password': 'x', 'name': f'Parent {i}', 'role': 'parent',
+             'status': 'approved', 'parent_id': f'{o}-{i}', 'staff_id': staff_ids[(n * args.parents + i) // 25]}
+            for n, o in enumerate(offices) for i in range(args.parents)
+        ])
+        parents = db.session.execute(select(User.id, User.staff_id)).all()
+        db.session.execute(insert(Child), [{'parent_id': p, 'name': f'Child {p}'} for p, _ in parents])
+        batch = []
+        for parent_id, staff_id in parents:
+            for _ in range(args.uploads_per_parent):
+                uploaded = now - timedelta(days=random.randint(0, 700))
+                pending = random.random() < 0.03
+                batch.append({'parent_id': parent_id, 'child_id': parent_id, 'upload_type': 'health_report',
+                              'file_path': 'documents/x.pdf', 'upload_date': uploaded,
+                              'status': 'pending' if pending else 'verified',
+                              'verified_by': None if pending else staff_id,
+                              'verified_at': None if pending else uploaded + timedelta(hours=random.randint(1, 200))})
+            if len(batch) >= 20000:
+                db.session.execute(insert(Upload), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Upload), batch)
+        db.session.commit()
+        db.session.remove()
+
+    with app.app_context():
+        upgrade_schema()
+        start = time.perf_counter()
+        offices = names[:-1]
+        for office in offices:
+            with use_region(office):
+                seed([office])
+        with use_region('combined'):
+            seed(offices)
+        print(f'{args.regions} regions x {args.parents} parents x {args.uploads_per_parent} uploads '
+              f'seeded in {time.perf_counter() - start:.0f}s')
+
+        def timed(label, fn, repeat=20):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                times.append((time.perf_counter() - start) * 1000)
+            print(f'{label:<56} {statistics.median(times):8.1f} ms')
+
+        def office_pending(office, region):
+            with use_region(region):
+                rows = db.session.execute(
+                    select(Upload.id, User.name, Upload.upload_date)
+                    .join(User, User.id == Upload.parent_id)
+                    .where(Upload.status == 'pending', User.parent_id.like(f'{office}-%'))
+                    .order_by(Upload.upload_date.desc())
+                ).all()
+                db.session.remove()
+                return rows
+
+        timed('office pending uploads, combined database', lambda: office_pending(offices[0], 'combined'))
+        timed('office pending uploads, regional database', lambda: office_pending(offices[0], offices[0]))
+
+        app.config['REGIONS'] = {name: url for name, url in app.config['REGIONS'].items() if name != 'combined'}
+        for_each_region(region_summary, parallel=False)  # warm the per-quarter workload caches
+        for latency in (0, args.latency_ms):
+            label = f'{latency:g} ms per statement'
+            timed(f'cross-region report, one by one, {label}',
+                  lambda: for_each_region(region_summary, parallel=False), repeat=5)
+            timed(f'cross-region report, in parallel, {label}',
+                  lambda: for_each_region(region_summary, parallel=True), repeat=5)
+            if not latency:
+                # From here on every statement waits as if the database were remote.
+                for office in offices:
+                    event.listen(db.engines[BIND_PREFIX + office], 'before_cursor_execute',
+                                 lambda *_: time.sleep(args.latency_ms / 1000))
+
+
+if __name__ == '__main__':
+    main()
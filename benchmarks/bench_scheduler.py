@@ -0,0 +1,97 @@
+"""
+Benchmark for the quarterly visit scheduler.
+
+Seeds a throwaway SQLite database with 20k approved parents spread over
+2k mentors, then times a full scheduling run, an incremental no-op run and
+an incremental run after a small batch of visits are completed.
+
+    python benchmarks/bench_scheduler.py [--parents 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--parents', type=int, default=20000)
+    parser.add_argument('--per-staff', type=int, default=10)
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+    from app import app
+    from models import db, User, Staff, Visit
+    from services.schema import upgrade_schema
+    from services.scheduler import schedule_quarterly_visits
+    from sqlalchemy import insert, update, select
+
+    random.seed(7)
+    today = datetime.now().date()
+    staff_count = max(1, args.parents // args.per_staff)
+
+    with app.app_context():
+        upgrade_schema()
+        db.session.execute(insert(Staff), [
+            {'name': f'Staff {i}', 'email': f'staff{i}@bench', 'password': 'x',
+             'staff_id': f'STF{i:06d}', 'max_parents': args.per_staff,
+             'assigned_parent_count': args.per_staff}
+            for i in range(staff_count)
+        ])
+        staff_ids = [row[0] for row in db.session.execute(select(Staff.id))]
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': 'x', 'name': f'Parent {i}',
+             'role': 'parent', 'status': 'approved', 'parent_id': f'PAR{i:07d}',
+             'staff_id': staff_ids[i % staff_count]}
+            for i in range(args.parents)
+        ])
+        parent_rows = db.session.execute(select(User.id, User.staff_id)).all()
+        # Roughly half the parents have visit history, a tenth an overdue visit.
+        history = []
+        for parent_id, staff_id in parent_rows:
+            if random.random() < 0.5:
+                history.append({'parent_id': parent_id, 'staff_id': staff_id, 'status': 'completed',
+                                'visit_date': today - timedelta(days=random.randint(1, 120))})
+            if random.random() < 0.1:
+                history.append({'parent_id': parent_id, 'staff_id': staff_id, 'status': 'scheduled',
+                                'visit_date': today - timedelta(days=random.randint(1, 30))})
+        db.session.execute(insert(Visit), history)
+        db.session.commit()
+
+        def timed(label, **kwargs):
+            start = time.perf_counter()
+            summary = schedule_quarterly_visits(**kwargs)
+            elapsed = time.perf_counter() - start
+            print(f'{label:<28} {elapsed * 1000:9.1f} ms  {summary}')
+
+        print(f'{args.parents} parents, {staff_count} staff')
+        timed('full run')
+        timed('incremental (no changes)')
+
+        completed = db.session.execute(
+            select(Visit.id).where(Visit.status == 'scheduled').limit(args.parents // 100)
+        ).scalars().all()
+        db.session.execute(update(Visit).where(Visit.id.in_(completed))
+                           .values(status='completed', version=Visit.version + 1))
+        db.session.commit()
+        timed(f'incremental ({len(completed)} changed)')
+
+        max_per_day = db.session.execute(
+            select(Visit.staff_id, Visit.visit_date, db.func.count())
+            .where(Visit.status == 'scheduled')
+            .group_by(Visit.staff_id, Visit.visit_date)
+            .order_by(db.func.count().desc())
+            .limit(1)
+        ).first()
+        print(f'busiest staff-day: {max_per_day[2]} visits (capacity {app.config["VISIT_DAILY_CAPACITY"]})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark for template compilation caching and response compression.
+
+Cold start: each scenario runs in a fresh interpreter (a new worker) and
+times compiling every template, then the first and second request to the
+staff dashboard. Scenarios: no bytecode cache, an empty cache (the first
+worker after a deploy) and a populated cache (every later worker/restart).
+
+Bytes sent: the unpaginated staff uploads list (--uploads rows) and the
+parent detail page, uncompressed vs gzip vs brotli (if installed), with
+the time compression adds.
+
+    python benchmarks/bench_templates.py [--uploads 5000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PAGES = ('/staff/uploads?status=all', '/staff/parents/1')
+
+
+def login(client):
+    client.post('/auth/login', data={'role': 'staff', 'staff_id': 'STF1', 'password': 'pw'})
+
+
+def worker():
+    """One cold worker: print timings as JSON."""
+    started = time.perf_counter()
+    from app import app
+    from services.templating import warm_templates
+    imported = time.perf_counter() - started
+    client = app.test_client()
+    login(client)
+    timings = {'import_ms': imported * 1000}
+    for label in ('first', 'second'):
+        start = time.perf_counter()
+        client.get('/staff/dashboard')
+        timings[f'{label}_request_ms'] = (time.perf_counter() - start) * 1000
+    app.jinja_env.cache.clear()
+    count, seconds = warm_templates(app)
+    timings['compile_all_ms'] = seconds * 1000
+    timings['templates'] = count
+    print(json.dumps(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uploads', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=3, help='Cold workers per scenario.')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from app import app
+    from models import db, User, Staff, Child, Upload
+    from services.schema import upgrade_schema
+    from services import compression
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import insert
+    from datetime import datetime, timedelta
+
+    with app.app_context():
+        upgrade_schema()
+        db.session.add(Staff(name='Staff', email='staff@bench', password=generate_password_hash('pw'),
+                             staff_id='STF1', max_parents=500))
+        db.session.commit()
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': 'x', 'name': f'Parent {i}', 'role': 'parent',
+             'status': 'approved', 'parent_id': f'PAR{i:05d}', 'staff_id': 1}
+            for i in range(1, 201)
+        ])
+        db.session.execute(insert(Child), [{'parent_id': i, 'name': f'Child {i}'} for i in range(1, 201)])
+        now = datetime.utcnow()
+        db.session.execute(insert(Upload), [
+            {'parent_id': i % 200 + 1, 'child_id': i % 200 + 1, 'upload_type': 'health_report',
+             'file_path': f'documents/report-{i}.pdf', 'upload_date': now - timedelta(hours=i),
+             'status': 'pending' if i % 3 else 'verified', 'size_bytes': 200000 + i,
+             'mime_type': 'application/pdf', 'page_count': 1 + i % 9}
+            for i in range(args.uploads)
+        ])
+        db.session.commit()
+
+    print('cold start (median of workers)')
+    cache_dir = os.path.join(workdir, 'jinja_cache')
+    for label, directory, reset in (('no bytecode cache', '', False), ('empty bytecode cache', cache_dir, True),
+                                    ('populated bytecode cache', cache_dir, False)):
+        runs = []
+        for _ in range(args.workers):
+            if reset:
+                subprocess.run(['rm', '-rf', cache_dir])
+            env = dict(os.environ, JINJA_CACHE_DIR=directory)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker'], env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        first = statistics.median(run['first_request_ms'] for run in runs)
+        second = statistics.median(run['second_request_ms'] for run in runs)
+        compile_all = statistics.median(run['compile_all_ms'] for run in runs)
+        print(f'  {label:<26} compile all {runs[0]["templates"]} templates {compile_all:7.1f} ms, '
+              f'first request {first:7.1f} ms, second {second:6.1f} ms')
+
+    print(f'bytes sent ({args.uploads} uploads)')
+    client = app.test_client()
+    login(client)
+    encodings = ['identity', 'gzip'] + (['br'] if compression.brotli is not None else [])
+    for page in PAGES:
+        for encoding in encodings:
+            times = []
+            for _ in range(5):
+                start = time.perf_counter()
+                response = client.get(page, headers={'Accept-Encoding': encoding})
+                times.append((time.perf_counter() - start) * 1000)
+            print(f'  {page:<28} {encoding:<9} {len(response.data):>10,} bytes  {statistics.median(times):7.1f} ms')
+    if compression.brotli is None:
+        print('  (brotli not installed; pip install brotli to compare)')
+
+
+if __name__ == '__main__':
+    main()
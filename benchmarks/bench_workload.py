@@ -0,0 +1,137 @@
+"""
+Benchmark for the staff workload report.
+
+Seeds a throwaway SQLite database with --uploads uploads (reviewed over the
+last two years, a few still pending) and a quarterly visit per parent, then
+compares the naive approach (load every reviewed upload and visit, aggregate
+in Python) with services.workload: first computation, cached request and
+the current quarter after its cache expires.
+
+Only the cached rows are expected to stay under 200 ms. The "first" and
+"cache expired" rows compute the quarter from scratch. That takes about
+400 ms for a full quarter of reviews, which is why closed quarters are
+computed once (or ahead of time by `flask workload-report`).
+
+    python benchmarks/bench_workload.py [--uploads 1000000] [--staff 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uploads', type=int, default=1000000)
+    parser.add_argument('--staff', type=int, default=200)
+    parser.add_argument('--parents', type=int, default=8000)
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+    from app import app
+    from models import db, User, Staff, Child, Upload, Visit
+    from services.schema import upgrade_schema
+    from services.workload import workload_report, quarter_of, quarter_bounds
+    from sqlalchemy import insert, select
+
+    random.seed(7)
+    now = datetime.utcnow()
+    today = now.date()  # workload quarters are UTC
+
+    with app.app_context():
+        upgrade_schema()
+        start = time.perf_counter()
+        db.session.execute(insert(Staff), [
+            {'name': f'Staff {i}', 'email': f'staff{i}@bench', 'password': 'x', 'staff_id': f'STF{i:06d}',
+             'max_parents': 50}
+            for i in range(args.staff)
+        ])
+        staff_ids = db.session.execute(select(Staff.id)).scalars().all()
+        db.session.execute(insert(User), [
+            {'email': f'parent{i}@bench', 'password': 'x', 'name': f'Parent {i}', 'role': 'parent',
+             'status': 'approved', 'parent_id': f'PAR{i:07d}', 'staff_id': staff_ids[i % args.staff]}
+            for i in range(args.parents)
+        ])
+        parents = db.session.execute(select(User.id, User.staff_id)).all()
+        db.session.execute(insert(Child), [
+            {'parent_id': parent_id, 'name': f'Child {parent_id}'} for parent_id, _ in parents
+        ])
+        children = dict(db.session.execute(select(Child.parent_id, Child.id)).all())
+
+        batch = []
+        for i in range(args.uploads):
+            parent_id, staff_id = parents[i % len(parents)]
+            uploaded = now - timedelta(minutes=random.randint(0, 730 * 24 * 60))
+            row = {'parent_id': parent_id, 'child_id': children[parent_id], 'upload_type': 'health_report',
+                   'file_path': 'documents/x.pdf', 'upload_date': uploaded, 'status': 'pending'}
+            if random.random() < 0.99:
+                reviewed = min(now, uploaded + timedelta(hours=random.expovariate(1 / 40)))
+                row.update(status='verified', verified_by=staff_id, verified_at=reviewed)
+            batch.append(row)
+            if len(batch) == 20000:
+                db.session.execute(insert(Upload), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Upload), batch)
+        db.session.execute(insert(Visit), [
+            {'parent_id': parent_id, 'staff_id': staff_id, 'visit_date': today - timedelta(days=91 * q + random.randint(0, 60)),
+             'status': 'completed'}
+            for parent_id, staff_id in parents for q in range(8)
+        ])
+        db.session.commit()
+        print(f'{args.uploads} uploads, {len(parents) * 8} visits, {args.staff} staff '
+              f'seeded in {time.perf_counter() - start:.0f}s')
+
+        def timed(label, fn, repeat=1):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                times.append((time.perf_counter() - start) * 1000)
+            print(f'{label:<40} {statistics.median(times):9.1f} ms')
+
+        previous = quarter_of(quarter_bounds(quarter_of(today))[0] - timedelta(days=1))
+
+        def naive():
+            start_day, end_day = quarter_bounds(previous)
+            hours = {}
+            for upload in Upload.query.filter(Upload.verified_by.isnot(None)).all():
+                if start_day <= upload.verified_at.date() < end_day:
+                    hours.setdefault(upload.verified_by, []).append(
+                        (upload.verified_at - upload.upload_date).total_seconds() / 3600)
+            stats = {staff_id: (len(values), statistics.median(values)) for staff_id, values in hours.items()}
+            visits = {}
+            for visit in Visit.query.filter_by(status='completed').all():
+                visits[(visit.staff_id, quarter_of(visit.visit_date))] = visits.get(
+                    (visit.staff_id, quarter_of(visit.visit_date)), 0) + 1
+            db.session.expunge_all()
+            return stats, visits
+
+        timed('naive (ORM rows, Python aggregation)', naive)
+        timed(f'workload_report({previous}) first', lambda: workload_report(previous))
+        timed(f'workload_report({previous}) cached', lambda: workload_report(previous), repeat=20)
+        timed('current quarter, cache expired', lambda: workload_report(refresh=True), repeat=5)
+        print(f'  (current quarter is {(today - quarter_bounds(quarter_of(today))[0]).days} days old; '
+              f'a full one costs about as much as "first")')
+        timed('current quarter, cached', lambda: workload_report(), repeat=20)
+
+        with app.test_request_context():
+            from flask_login import login_user
+            admin = User(email='admin@bench', password='x', name='Admin', role='admin', status='approved')
+            db.session.add(admin)
+            db.session.commit()
+            login_user(admin)
+            view = app.view_functions['admin.workload']
+            timed('GET /admin/workload (cached, rendered)', view, repeat=20)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import click
+from services.schema import upgrade_schema
+from services.scheduler import schedule_quarterly_visits
+from services.compliance import rebuild_compliance
+from services.importer import import_csv, KINDS
+from services.attachments import migrate_visit_photos, migrate_upload_files
+from services.audit import archive_partitions
+from services.archive import archive_records, table_sizes
+from services.deletion import compact_deleted
+from services.outbox import run_dispatcher, queue_report_reminders
+from services.workload import period_report, recent_quarters
+from services.templating import warm_templates
+from services.assets import build_assets, clean_assets, Image
+
+# -------------------------------
+# CLI Commands (flask --app app <command>)
+# -------------------------------
+def register_commands(app):
+
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Create missing tables, columns and indexes."""
+        upgrade_schema()
+        click.echo('Database schema is up to date.')
+
+    @app.cli.command('schedule-visits')
+    @click.option('--full', is_flag=True, help='Re-check every parent, not just changed ones.')
+    def schedule_visits_command(full):
+        """Generate and rebalance quarterly home visits."""
+        summary = schedule_quarterly_visits(full=full)
+        click.echo(
+            f"Checked {summary['checked']} parents: {summary['created']} visits created, "
+            f"{summary['rescheduled']} rescheduled, {summary['unchanged']} unchanged."
+        )
+        if summary['conflicts']:
+            click.echo(f"{summary['conflicts']} visits changed while scheduling; they are retried next run.")
+
+    @app.cli.command('rebuild-compliance')
+    def rebuild_compliance_command():
+        """Recompute the overdue-compliance index from uploads and visits."""
+        count = rebuild_compliance()
+        click.echo(f'Rebuilt {count} compliance rows.')
+
+    @app.cli.command('import-csv')
+    @click.argument('kind', type=click.Choice(list(KINDS)))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--batch-size', default=1000, show_default=True)
+    @click.option('--workers', type=int, default=None,
+                  help='Password hashing processes (default: PASSWORD_HASH_WORKERS; 0 hashes inline).')
+    def import_csv_command(kind, path, batch_size, workers):
+        """Bulk import staff, parents or children from a CSV file."""
+        if workers is not None:
+            app.config['PASSWORD_HASH_WORKERS'] = workers
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            result = import_csv(kind, handle, batch_size=batch_size)
+        for line, message in result['errors']:
+            click.echo(f'line {line}: {message}', err=True)
+        click.echo(f"Imported {result['imported']} rows, {len(result['errors'])} rejected.")
+
+    @app.cli.command('migrate-attachments')
+    @click.option('--batch-size', default=500, show_default=True)
+    def migrate_attachments_command(batch_size):
+        """Move Visit.photos JSON and existing upload files into the attachments table."""
+        visits = migrate_visit_photos(batch_size)
+        uploads = migrate_upload_files(batch_size)
+        click.echo(f"Migrated {visits['files']} photos from {visits['visits']} visits "
+                   f"and {uploads['files']} upload files; filled in metadata for {uploads['described']} uploads.")
+
+    @app.cli.command('archive-audit')
+    @click.option('--keep-months', default=12, show_default=True, help='Recent months to keep in the database.')
+    def archive_audit_command(keep_months):
+        """Move old monthly audit partitions into compressed files."""
+        archived = archive_partitions(keep_months=keep_months)
+        for month, rows in archived:
+            click.echo(f'{month}: {rows} events archived')
+        click.echo(f'Archived {len(archived)} month(s).')
+
+    @app.cli.command('archive-records')
+    @click.option('--after-days', type=int, default=None, help='Age cutoff (default: ARCHIVE_AFTER_DAYS).')
+    @click.option('--batch-size', default=500, show_default=True)
+    def archive_records_command(after_days, batch_size):
+        """Move old verified uploads and completed visits into cold storage."""
+        summary = archive_records(after_days=after_days, batch_size=batch_size)
+        click.echo(
+            f"Archived {summary['uploads']} uploads and {summary['visits']} visits; "
+            f"{summary['files']} files packed ({summary['bytes']} -> {summary['packed_bytes']} bytes)."
+        )
+        for table, rows in table_sizes().items():
+            click.echo(f'  {table}: {rows} rows')
+
+    @app.cli.command('compact-deleted')
+    @click.option('--after-days', type=int, default=None, help='Retention (default: DELETED_RETENTION_DAYS).')
+    @click.option('--batch-size', default=500, show_default=True)
+    def compact_deleted_command(after_days, batch_size):
+        """Permanently remove deleted staff, parents and guidance, and their files."""
+        stats = compact_deleted(after_days=after_days, batch_size=batch_size)
+        click.echo(f"Purged {stats['parents']} parents ({stats['children']} children), {stats['staff']} staff, "
+                   f"{stats['guidance']} guidance items and {stats['files']} files.")
+
+    @app.cli.command('queue-reminders')
+    def queue_reminders_command():
+        """Queue a weekly email to every parent with reports or visits coming due."""
+        click.echo(f'Queued {queue_report_reminders()} reminder(s).')
+
+    @app.cli.command('dispatch-outbox')
+    @click.option('--once', is_flag=True, help='Drain the outbox and exit instead of running forever.')
+    @click.option('--batch-size', default=100, show_default=True)
+    @click.option('--interval', default=5.0, show_default=True, help='Seconds to sleep when idle.')
+    def dispatch_outbox_command(once, batch_size, interval):
+        """Send queued notifications through the configured transports."""
+        totals = run_dispatcher(batch_size=batch_size, interval=interval, once=once)
+        click.echo(f"Sent {totals['sent']}, deferred {totals['deferred']}, "
+                   f"retried {totals['retried']}, failed {totals['failed']}.")
+
+    @app.cli.command('workload-report')
+    @click.option('--quarters', default=8, show_default=True, help='How many recent quarters to compute.')
+    def workload_report_command(quarters):
+        """Recompute the cached staff workload figures for recent quarters."""
+        for period in recent_quarters(quarters):
+            data = period_report(period, refresh=True)
+            click.echo(f"{period}: {sum(row['reviewed'] for row in data['staff'])} reviews by "
+                       f"{len(data['staff'])} staff")
+
+    @app.cli.command('warm-templates')
+    def warm_templates_command():
+        """Compile every template into JINJA_CACHE_DIR."""
+        count, seconds = warm_templates(app)
+        click.echo(f'Compiled {count} templates in {seconds * 1000:.0f} ms.')
+
+    @app.cli.command('build-assets')
+    @click.option('--clean', is_flag=True, help='Remove the build output and serve the original files.')
+    def build_assets_command(clean):
+        """Fingerprint static files (and resize images) for far-future caching."""
+        if clean:
+            clean_assets(app)
+            click.echo('Removed fingerprinted assets.')
+            return
+        summary = build_assets(app)
+        click.echo(f"Fingerprinted {summary['files']} files ({summary['bytes_in']:,} -> {summary['bytes_out']:,} bytes), "
+                   f"{summary['variants']} image variants.")
+        if Image is None:
+            click.echo('Pillow is not installed; images were copied without resizing or recompression.')
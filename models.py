@@ -1,11 +1,49 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import UserMixin
+from services.tenancy import active_region, BIND_PREFIX
+from sqlalchemy import event, text
+from sqlalchemy.orm import with_loader_criteria
 from datetime import datetime
 
+class RegionSession(Session):
+    """Sends every query to the active region's database when REGIONS is set."""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            region = active_region()
+            if region:
+                return self._db.engines[BIND_PREFIX + region]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 # This will be initialized in app.py
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RegionSession})
+
+class SoftDelete:
+    """Rows with deleted_at set are hidden from queries until services.deletion compacts them."""
+    
+    deleted_at = db.Column(db.DateTime)
+
+@event.listens_for(RegionSession, 'do_orm_execute')
+def _hide_deleted(state):
+    # Top-level queries only: relationship loads (visit.staff, child.parent)
+    # still reach a deleted row, so history keeps its names. Pass
+    # execution_options(include_deleted=True) to see deleted rows.
+    if (state.is_select and not state.is_column_load and not state.is_relationship_load
+            and not state.execution_options.get('include_deleted', False)):
+        state.statement = state.statement.options(
+            with_loader_criteria(SoftDelete, lambda cls: cls.deleted_at.is_(None),
+                                 include_aliases=True, propagate_to_loaders=False)
+        )
+
+def _partial(condition):
+    """Index keyword arguments for a partial index (SQLite and PostgreSQL)."""
+    return {'sqlite_where': text(condition), 'postgresql_where': text(condition)}
 
-class User(UserMixin, db.Model):
+LIVE = 'deleted_at IS NULL'
+DELETED = 'deleted_at IS NOT NULL'
+
+class User(SoftDelete, UserMixin, db.Model):
     __tablename__ = 'users'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -18,18 +56,25 @@ class User(UserMixin, db.Model):
     status = db.Column(db.String(20), default='pending')  # 'pending', 'approved', 'rejected'
     parent_id = db.Column(db.String(20), unique=True, nullable=True)
   # Unique ID assigned by admin
-    staff_id = db.Column(db.Integer, db.ForeignKey('staff.id'))
+    staff_id = db.Column(db.Integer, db.ForeignKey('staff.id'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # see services.concurrency
     
     # Relationships
     children = db.relationship('Child', backref='parent', lazy=True)
     uploads = db.relationship('Upload', backref='parent', lazy=True)
     visits = db.relationship('Visit', backref='parent', lazy=True)
     
+    __table_args__ = (
+        db.Index('ix_users_live_role_status', 'role', 'status', **_partial(LIVE)),
+        db.Index('ix_users_deleted_at', 'deleted_at', **_partial(DELETED)),
+    )
+    __mapper_args__ = {'version_id_col': version}
+    
     def __repr__(self):
         return f'<User {self.email}>'
 
-class Staff(db.Model):
+class Staff(SoftDelete, db.Model):
     __tablename__ = 'staff'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -46,10 +91,14 @@ class Staff(db.Model):
     assigned_parents = db.relationship('User', backref='mentor', lazy=True)
     visits = db.relationship('Visit', backref='staff', lazy=True)
     
+    __table_args__ = (
+        db.Index('ix_staff_deleted_at', 'deleted_at', **_partial(DELETED)),
+    )
+    
     def __repr__(self):
         return f'<Staff {self.staff_id}>'
 
-class Child(db.Model):
+class Child(SoftDelete, db.Model):
     __tablename__ = 'children'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -60,10 +109,17 @@ class Child(db.Model):
     adoption_date = db.Column(db.Date, default=datetime.utcnow)
     background_info = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # see services.sync
     
     # Relationships
     uploads = db.relationship('Upload', backref='child', lazy=True)
     
+    __table_args__ = (
+        db.Index('ix_children_live_parent', 'parent_id', **_partial(LIVE)),
+        db.Index('ix_children_deleted_at', 'deleted_at', **_partial(DELETED)),
+        db.Index('ix_children_parent_updated', 'parent_id', 'updated_at'),
+    )
+    
     def __repr__(self):
         return f'<Child {self.name}>'
 
@@ -80,10 +136,59 @@ class Upload(db.Model):
     feedback = db.Column(db.Text)
     verified_by = db.Column(db.Integer, db.ForeignKey('staff.id'))
     verified_at = db.Column(db.DateTime)
+    # Captured from the file content when it is saved (services/attachments.py)
+    size_bytes = db.Column(db.Integer)
+    mime_type = db.Column(db.String(100))
+    sha256 = db.Column(db.String(64), index=True)
+    page_count = db.Column(db.Integer)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # see services.concurrency
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # see services.sync
+    
+    attachments = db.relationship(
+        'Attachment',
+        primaryjoin="and_(Attachment.owner_type == 'upload', foreign(Attachment.owner_id) == Upload.id)",
+        order_by='Attachment.id',
+        viewonly=True,
+        lazy=True
+    )
+    
+    __table_args__ = (
+        # Workload analytics: reviews per period, and the pending backlog
+        db.Index('ix_uploads_verified_at', 'verified_at', 'verified_by', 'upload_date'),
+        db.Index('ix_uploads_status_parent', 'status', 'parent_id', 'upload_date'),
+        db.Index('ix_uploads_parent_updated', 'parent_id', 'updated_at'),
+        # Archived rows keep their ids, so an id must never be handed out twice.
+        {'sqlite_autoincrement': True},
+    )
+    __mapper_args__ = {'version_id_col': version}
     
     def __repr__(self):
         return f'<Upload {self.upload_type}>'
 
+class GrowthMeasurement(db.Model):
+    __tablename__ = 'growth_measurements'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    child_id = db.Column(db.Integer, db.ForeignKey('children.id'), nullable=False)
+    upload_id = db.Column(db.Integer, db.ForeignKey('uploads.id'))  # health report it came with
+    measured_on = db.Column(db.Date, nullable=False)
+    height_cm = db.Column(db.Float)
+    weight_kg = db.Column(db.Float)
+    head_circumference_cm = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    child = db.relationship('Child', backref=db.backref('measurements', lazy=True))
+    upload = db.relationship('Upload', backref=db.backref('measurement', uselist=False))
+    
+    __table_args__ = (
+        db.Index('ix_growth_child_measured', 'child_id', 'measured_on'),
+    )
+    
+    def __repr__(self):
+        return f'<GrowthMeasurement {self.child_id} {self.measured_on}>'
+
 class Visit(db.Model):
     __tablename__ = 'visits'
     
@@ -94,13 +199,216 @@ class Visit(db.Model):
     scheduled_date = db.Column(db.Date)
     remarks = db.Column(db.Text)
     status = db.Column(db.String(20), default='scheduled')  # 'scheduled', 'completed', 'cancelled'
-    photos = db.Column(db.Text)  # JSON string of photo paths
+    photos = db.Column(db.Text)  # legacy JSON list of photo paths; see Attachment
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # see services.concurrency
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # see services.sync
+    
+    attachments = db.relationship(
+        'Attachment',
+        primaryjoin="and_(Attachment.owner_type == 'visit', foreign(Attachment.owner_id) == Visit.id)",
+        order_by='Attachment.id',
+        viewonly=True,
+        lazy=True
+    )
+    
+    __table_args__ = (
+        db.Index('ix_visits_parent_status', 'parent_id', 'status'),
+        db.Index('ix_visits_staff_date', 'staff_id', 'visit_date'),
+        db.Index('ix_visits_date_status', 'visit_date', 'status', 'staff_id'),
+        db.Index('ix_visits_parent_updated', 'parent_id', 'updated_at'),
+        {'sqlite_autoincrement': True},  # see Upload
+    )
+    __mapper_args__ = {'version_id_col': version}
     
     def __repr__(self):
         return f'<Visit {self.visit_date}>'
 
-class Guidance(db.Model):
+class Attachment(db.Model):
+    __tablename__ = 'attachments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    owner_type = db.Column(db.String(20), nullable=False)  # 'visit', 'upload', 'archived_visit', 'archived_upload'
+    owner_id = db.Column(db.Integer, nullable=False)
+    file_path = db.Column(db.String(255), nullable=False)  # relative to UPLOAD_FOLDER
+    original_name = db.Column(db.String(255))
+    size_bytes = db.Column(db.Integer)
+    mime_type = db.Column(db.String(100))
+    sha256 = db.Column(db.String(64), index=True)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    page_count = db.Column(db.Integer)  # PDFs only
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_attachments_owner', 'owner_type', 'owner_id'),
+    )
+    
+    def __repr__(self):
+        return f'<Attachment {self.file_path}>'
+
+class ArchivedUpload(db.Model):
+    __tablename__ = 'uploads_archive'
+    
+    # Same columns and ids as `uploads`; files live in `bundle`.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    child_id = db.Column(db.Integer, db.ForeignKey('children.id'), nullable=False)
+    upload_type = db.Column(db.String(50), nullable=False)
+    file_path = db.Column(db.String(255), nullable=False)
+    upload_date = db.Column(db.DateTime)
+    status = db.Column(db.String(20))
+    feedback = db.Column(db.Text)
+    verified_by = db.Column(db.Integer, db.ForeignKey('staff.id'))
+    verified_at = db.Column(db.DateTime)
+    size_bytes = db.Column(db.Integer)
+    mime_type = db.Column(db.String(100))
+    sha256 = db.Column(db.String(64))
+    page_count = db.Column(db.Integer)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    bundle = db.Column(db.String(255), nullable=False)  # zip file relative to ARCHIVE_FOLDER
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    parent = db.relationship('User')
+    child = db.relationship('Child')
+    attachments = db.relationship(
+        'Attachment',
+        primaryjoin="and_(Attachment.owner_type == 'archived_upload', foreign(Attachment.owner_id) == ArchivedUpload.id)",
+        order_by='Attachment.id',
+        viewonly=True,
+        lazy=True
+    )
+    
+    __table_args__ = (
+        db.Index('ix_uploads_archive_parent_date', 'parent_id', 'upload_date'),
+        db.Index('ix_uploads_archive_child_type', 'child_id', 'upload_type'),
+        db.Index('ix_uploads_archive_verified_at', 'verified_at', 'verified_by', 'upload_date'),
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedUpload {self.upload_type}>'
+
+class ArchivedVisit(db.Model):
+    __tablename__ = 'visits_archive'
+    
+    # Same columns and ids as `visits`; photos live in `bundle`.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    staff_id = db.Column(db.Integer, db.ForeignKey('staff.id'), nullable=False)
+    visit_date = db.Column(db.Date, nullable=False)
+    scheduled_date = db.Column(db.Date)
+    remarks = db.Column(db.Text)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    bundle = db.Column(db.String(255), nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    parent = db.relationship('User')
+    staff = db.relationship('Staff')
+    attachments = db.relationship(
+        'Attachment',
+        primaryjoin="and_(Attachment.owner_type == 'archived_visit', foreign(Attachment.owner_id) == ArchivedVisit.id)",
+        order_by='Attachment.id',
+        viewonly=True,
+        lazy=True
+    )
+    
+    __table_args__ = (
+        db.Index('ix_visits_archive_parent_date', 'parent_id', 'visit_date'),
+        db.Index('ix_visits_archive_date_status', 'visit_date', 'status', 'staff_id'),
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedVisit {self.visit_date}>'
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # 'email', 'sms'
+    recipient = db.Column(db.String(120), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)  # 'upload.rejected', 'visit.booked', 'report.reminder'
+    subject = db.Column(db.String(200))
+    body = db.Column(db.Text, nullable=False)
+    dedup_key = db.Column(db.String(200), unique=True)  # same key is only ever queued once
+    status = db.Column(db.String(20), default='pending', nullable=False)  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = db.Column(db.String(64))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_outbox_status_available', 'status', 'available_at'),
+    )
+    
+    def __repr__(self):
+        return f'<OutboxMessage {self.kind} {self.recipient}>'
+
+class VisitSchedule(db.Model):
+    __tablename__ = 'visit_schedules'
+    
+    # One row per parent, written by the quarterly scheduler so nightly runs
+    # can skip parents whose schedule inputs have not changed.
+    parent_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    next_visit_date = db.Column(db.Date)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<VisitSchedule {self.parent_id} {self.next_visit_date}>'
+
+class ComplianceStatus(db.Model):
+    __tablename__ = 'compliance_status'
+    
+    # One row per child and category ('health', 'vaccination', 'school',
+    # 'visit'), kept current by services.compliance.
+    child_id = db.Column(db.Integer, db.ForeignKey('children.id'), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    last_verified_date = db.Column(db.Date)
+    last_uploaded_at = db.Column(db.DateTime)
+    next_due_date = db.Column(db.Date, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    child = db.relationship('Child')
+    
+    def __repr__(self):
+        return f'<ComplianceStatus {self.child_id} {self.category}>'
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'
+    
+    # A CSV import started from the admin page; see services.importer.
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'staff', 'parents', 'children'
+    filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), default='running', nullable=False)  # 'running', 'done', 'failed'
+    imported = db.Column(db.Integer, default=0, nullable=False)
+    rejected = db.Column(db.Integer, default=0, nullable=False)
+    errors = db.Column(db.Text)  # JSON [[line, message], ...], the first ERRORS_KEPT
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.kind} {self.status}>'
+
+class WorkloadReport(db.Model):
+    __tablename__ = 'workload_reports'
+    
+    # Cached per-staff figures for one quarter ('2026-Q3'); see services.workload.
+    period = db.Column(db.String(7), primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # JSON
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<WorkloadReport {self.period}>'
+
+class Guidance(SoftDelete, db.Model):
     __tablename__ = 'guidance'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -110,6 +418,13 @@ class Guidance(db.Model):
     category = db.Column(db.String(50))  # 'guideline', 'faq', 'policy', 'counseling'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # see services.sync
+    
+    __table_args__ = (
+        db.Index('ix_guidance_live_created', 'created_at', **_partial(LIVE)),
+        db.Index('ix_guidance_deleted_at', 'deleted_at', **_partial(DELETED)),
+        db.Index('ix_guidance_updated', 'updated_at'),
+    )
     
     def __repr__(self):
         return f'<Guidance {self.title}>'
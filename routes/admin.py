@@ -1,8 +1,11 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, jsonify, current_app
 from flask_login import login_required, current_user
-from werkzeug.security import generate_password_hash
 from werkzeug.utils import secure_filename
-from models import User, Staff, Child, Upload, Visit, Guidance, db
+from models import User, Staff, Child, Upload, Visit, Guidance, ImportJob, db
+from services.compliance import record_child, overdue_items, CATEGORIES
+from services.passwords import hash_password
+from services import audit, deletion
+from services.concurrency import check_version
 from datetime import datetime, timedelta
 import os
 import json
@@ -61,7 +64,7 @@ def manage_staff():
         phone = request.form.get('phone')
         max_parents = int(request.form.get('max_parents', 10))
         
-        if Staff.query.filter_by(staff_id=staff_id).first():
+        if Staff.query.filter_by(staff_id=staff_id).execution_options(include_deleted=True).first():
             flash('Staff ID already exists.', 'danger')
             return redirect(url_for('admin.manage_staff'))
         
@@ -69,7 +72,7 @@ def manage_staff():
             flash('Email already registered.', 'danger')
             return redirect(url_for('admin.manage_staff'))
         
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         new_staff = Staff(
             name=name,
             email=email,
@@ -93,11 +96,50 @@ def manage_staff():
 @admin_required
 def delete_staff(staff_id):
     staff = Staff.query.get_or_404(staff_id)
-    db.session.delete(staff)
+    email = staff.email
+    result = deletion.delete_staff(staff)
     db.session.commit()
-    flash('Staff member deleted successfully.', 'success')
+    audit.record('staff.deleted', 'staff', staff_id, staff_code=staff.staff_id, email=email, **result)
+    message = f"Staff member deleted. {result['reassigned']} parent(s) reassigned"
+    if result['unassigned']:
+        flash(f"{message}; {result['unassigned']} could not be reassigned (every other staff member is full).", 'warning')
+    else:
+        flash(f'{message}.', 'success')
     return redirect(url_for('admin.manage_staff'))
 
+@admin_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def bulk_import():
+    from services.importer import start_import, KINDS
+    
+    kind = request.form.get('kind', 'staff')
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Please select a CSV file.', 'danger')
+            return redirect(url_for('admin.bulk_import'))
+        if kind not in KINDS:
+            flash('Invalid import type.', 'danger')
+            return redirect(url_for('admin.bulk_import'))
+        
+        # Large files take minutes to hash and insert; the job page shows progress.
+        job = start_import(kind, file, current_user.id)
+        return redirect(url_for('admin.import_job', job_id=job.id))
+    
+    return render_template('admin/import.html', kinds=KINDS, kind=kind, job=None)
+
+@admin_bp.route('/import/<int:job_id>')
+@login_required
+@admin_required
+def import_job(job_id):
+    from services.importer import KINDS
+    import json
+    
+    job = ImportJob.query.get_or_404(job_id)
+    errors = json.loads(job.errors) if job.errors else []
+    return render_template('admin/import.html', kinds=KINDS, kind=job.kind, job=job, errors=errors)
+
 @admin_bp.route('/parents')
 @login_required
 @admin_required
@@ -118,6 +160,7 @@ def manage_parents():
 @admin_required
 def approve_parent(parent_id):
     parent = User.query.get_or_404(parent_id)
+    check_version(parent, request.form.get('version'))
     staff_id = request.form.get('staff_id')
     
     if not staff_id:
@@ -137,7 +180,7 @@ def approve_parent(parent_id):
     import random
     import string
     parent_id_str = 'PAR' + ''.join(random.choices(string.digits, k=6))
-    while User.query.filter_by(parent_id=parent_id_str).first():
+    while User.query.filter_by(parent_id=parent_id_str).execution_options(include_deleted=True).first():
         parent_id_str = 'PAR' + ''.join(random.choices(string.digits, k=6))
     
     parent.status = 'approved'
@@ -148,6 +191,7 @@ def approve_parent(parent_id):
     staff.assigned_parent_count = getattr(staff, 'assigned_parent_count', 0) + 1
 
     db.session.commit()
+    audit.record('parent.approved', 'user', parent.id, parent_code=parent_id_str, staff_id=staff.id)
     
     flash(f'✅ Parent "{parent.name}" approved successfully and assigned to staff {staff.staff_id}. Parent ID: {parent_id_str}', 'success')
     return redirect(url_for('admin.manage_parents', status='pending'))
@@ -158,11 +202,25 @@ def approve_parent(parent_id):
 @admin_required
 def reject_parent(parent_id):
     parent = User.query.get_or_404(parent_id)
+    check_version(parent, request.form.get('version'))
     parent.status = 'rejected'
     db.session.commit()
+    audit.record('parent.rejected', 'user', parent.id)
     flash('Parent registration rejected.', 'info')
     return redirect(url_for('admin.manage_parents', status='pending'))
 
+@admin_bp.route('/parents/<int:parent_id>/delete', methods=['POST'])
+@login_required
+@admin_required
+def delete_parent(parent_id):
+    parent = User.query.filter_by(id=parent_id, role='parent').first_or_404()
+    email = parent.email
+    deletion.delete_parent(parent)
+    db.session.commit()
+    audit.record('parent.deleted', 'user', parent_id, parent_code=parent.parent_id, email=email)
+    flash('Parent deleted successfully.', 'success')
+    return redirect(url_for('admin.manage_parents', status=request.form.get('status', 'all')))
+
 @admin_bp.route('/children')
 @login_required
 @admin_required
@@ -197,6 +255,8 @@ def add_child():
     )
     
     db.session.add(child)
+    db.session.flush()
+    record_child(child)
     db.session.commit()
     
     flash('Child record added successfully.', 'success')
@@ -215,7 +275,7 @@ def manage_guidance():
         file_url = None
         if file and file.filename:
             filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'guidance', filename)
+            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'guidance', filename)
             file.save(file_path)
             file_url = f"guidance/{filename}"
         
@@ -241,12 +301,9 @@ def manage_guidance():
 @admin_required
 def delete_guidance(guidance_id):
     guidance = Guidance.query.get_or_404(guidance_id)
-    if guidance.file_url:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], guidance.file_url)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    db.session.delete(guidance)
+    deletion.delete_guidance(guidance)
     db.session.commit()
+    audit.record('guidance.deleted', 'guidance', guidance_id, title=guidance.title, file_url=guidance.file_url)
     flash('Guidance material deleted successfully.', 'success')
     return redirect(url_for('admin.manage_guidance'))
 
@@ -254,7 +311,99 @@ def delete_guidance(guidance_id):
 @login_required
 @admin_required
 def reports():
-    return render_template('admin/reports.html')
+    from services.attachments import storage_usage
+    from services.outbox import outbox_counts
+    return render_template('admin/reports.html', storage=storage_usage(), outbox=outbox_counts())
+
+@admin_bp.route('/compliance')
+@login_required
+@admin_required
+def compliance():
+    category = request.args.get('category', 'all')
+    items = overdue_items(category=None if category == 'all' else category)
+    return render_template('admin/compliance.html', items=items, category=category, categories=CATEGORIES)
+
+@admin_bp.route('/growth')
+@login_required
+@admin_required
+def growth():
+    from services.growth import cohort_summary, MEASURES
+    return render_template('admin/growth.html', summary=cohort_summary(), measures=list(MEASURES))
+
+@admin_bp.route('/workload')
+@login_required
+@admin_required
+def workload():
+    from services.workload import workload_report, recent_quarters
+    periods = recent_quarters()
+    period = request.args.get('period')
+    if period not in periods:
+        period = periods[0]
+    return render_template('admin/workload.html', report=workload_report(period), periods=periods)
+
+@admin_bp.route('/workload/export')
+@login_required
+@admin_required
+def export_workload():
+    import csv
+    from io import StringIO, BytesIO
+    from services.workload import workload_report, recent_quarters, csv_rows
+    periods = recent_quarters()
+    period = request.args.get('period')
+    if period not in periods:
+        period = periods[0]
+    
+    output = StringIO()
+    csv.writer(output).writerows(csv_rows(workload_report(period)))
+    mem = BytesIO(output.getvalue().encode('utf-8'))
+    
+    return send_file(
+        mem,
+        mimetype='text/csv',
+        as_attachment=True,
+        download_name=f'staff_workload_{period}.csv'
+    )
+
+@admin_bp.route('/regions')
+@login_required
+@admin_required
+def regions_report():
+    from services.regions import cross_region_report
+    return render_template('admin/regions.html', report=cross_region_report())
+
+@admin_bp.route('/audit')
+@login_required
+@admin_required
+def audit_log():
+    filters = {key: request.args.get(key, '').strip() for key in
+               ('actor_id', 'subject_type', 'subject_id', 'action', 'start', 'end')}
+    try:
+        events = audit.query_events(
+            actor_id=int(filters['actor_id']) if filters['actor_id'] else None,
+            subject_type=filters['subject_type'] or None,
+            subject_id=int(filters['subject_id']) if filters['subject_id'] else None,
+            action=filters['action'] or None,
+            start=datetime.strptime(filters['start'], '%Y-%m-%d') if filters['start'] else None,
+            end=datetime.strptime(filters['end'], '%Y-%m-%d') + timedelta(days=1) if filters['end'] else None,
+            include_archived=bool(request.args.get('archived')),
+        )
+    except ValueError:
+        flash('IDs must be numbers and dates YYYY-MM-DD.', 'danger')
+        events = []
+    
+    actor_ids = {event['actor_id'] for event in events if event['actor_id']}
+    actors = {user.id: user for user in User.query.filter(User.id.in_(actor_ids))} if actor_ids else {}
+    return render_template('admin/audit.html', events=events, actors=actors, filters=filters,
+                           archived=bool(request.args.get('archived')))
+
+@admin_bp.route('/visits/schedule', methods=['POST'])
+@login_required
+@admin_required
+def schedule_visits():
+    from services.scheduler import schedule_quarterly_visits
+    summary = schedule_quarterly_visits()
+    flash(f"Quarterly visits scheduled: {summary['created']} created, {summary['rescheduled']} rescheduled.", 'success')
+    return redirect(url_for('admin.reports'))
 
 @admin_bp.route('/reports/export')
 @login_required
@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash, generate_password_hash
 from models import User, Staff, db
+from services.passwords import hash_password, verify_and_upgrade
+from services.ratelimit import throttle_login, record_login_failure, clear_login_failures, throttle_password_reset
+from services.tenancy import active_region
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -24,6 +26,16 @@ def login():
         password = request.form.get('password')
         staff_id = request.form.get('staff_id')
         parent_id = request.form.get('parent_id')
+        identifier = {'admin': email, 'staff': staff_id, 'parent': parent_id}.get(role)
+        if identifier and active_region():
+            # The same ID can exist in several regions; lock out only this one.
+            identifier = f'{active_region()}/{identifier}'
+
+        # Throttle before any query or password hash runs
+        retry_after = throttle_login(request.remote_addr, role, identifier)
+        if retry_after:
+            flash(f'Too many login attempts. Please try again in {retry_after} seconds.', 'danger')
+            return render_template('auth/login.html'), 429
 
         user = None
 
@@ -39,7 +51,7 @@ def login():
         elif role == 'staff':
             if staff_id:
                 staff = Staff.query.filter_by(staff_id=staff_id).first()
-                if staff and check_password_hash(staff.password, password):
+                if staff and verify_and_upgrade(staff, password):
                     user = User.query.filter_by(email=staff.email, role='staff').first()
 
                     if not user:
@@ -54,10 +66,13 @@ def login():
                         db.session.commit()
 
                     if user:
+                        db.session.commit()
+                        clear_login_failures(role, identifier)
                         login_user(user)
                         flash('Logged in successfully as Staff.', 'success')
                         return redirect(url_for('staff.dashboard'))
                 else:
+                    record_login_failure(role, identifier)
                     flash('Invalid Staff ID or password. Please try again.', 'danger')
 
         # ----------------------------
@@ -67,6 +82,7 @@ def login():
             if parent_id:
                 user = User.query.filter_by(parent_id=parent_id, role='parent').first()
                 if not user:
+                    record_login_failure(role, identifier)
                     flash('Invalid Parent ID. Please try again.', 'danger')
 
         # ----------------------------
@@ -75,8 +91,10 @@ def login():
         if user:
             if role == 'staff':
                 pass
-            elif check_password_hash(user.password, password):
+            elif verify_and_upgrade(user, password):
                 if user.status == 'approved' or user.role == 'admin':
+                    db.session.commit()
+                    clear_login_failures(role, identifier)
                     login_user(user)
                     flash(f'Logged in successfully as {user.role.capitalize()}.', 'success')
 
@@ -87,8 +105,10 @@ def login():
                 else:
                     flash('Your account is pending approval. Please wait for admin approval.', 'warning')
             else:
+                record_login_failure(role, identifier)
                 flash('Invalid password. Please try again.', 'danger')
         elif role not in ['staff']:
+            record_login_failure(role, identifier)
             flash('Invalid credentials. Please try again.', 'danger')
 
     return render_template('auth/login.html')
@@ -118,7 +138,7 @@ def register():
             flash('Email already registered.', 'danger')
             return render_template('auth/register.html')
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         new_user = User(
             email=email,
             password=hashed_password,
@@ -152,7 +172,11 @@ def forgot_password():
         identifier = request.form.get('identifier').strip()
         new_password = request.form.get('new_password')
 
-        hashed_pw = generate_password_hash(new_password)
+        retry_after = throttle_password_reset(request.remote_addr, role, identifier)
+        if retry_after:
+            flash(f'Too many reset attempts. Please try again in {retry_after} seconds.', 'danger')
+            return render_template('auth/forgot_password.html'), 429
+
         user = None
 
         # Debug info (optional)
@@ -170,7 +194,7 @@ def forgot_password():
         elif role == 'staff':
             staff = Staff.query.filter_by(staff_id=identifier).first()
             if staff:
-                staff.password = hashed_pw
+                staff.password = hash_password(new_password)
                 db.session.commit()
                 flash(f"Password updated successfully for Staff ID: {identifier}", 'success')
                 return redirect(url_for('auth.login'))
@@ -193,7 +217,7 @@ def forgot_password():
         # UPDATE PASSWORD FOR ADMIN / PARENT
         # ----------------------------
         if user:
-            user.password = hashed_pw
+            user.password = hash_password(new_password)
             db.session.commit()
             flash('Password reset successful! You can now log in.', 'success')
             return redirect(url_for('auth.login'))
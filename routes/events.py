@@ -0,0 +1,66 @@
+from flask import Blueprint, Response, request, jsonify, url_for, current_app, abort
+from flask_login import login_required, current_user
+from models import db
+from services.events import bus, channels_for, subscribe_token, format_event, HEARTBEAT_SECONDS
+import time
+
+events_bp = Blueprint('events', __name__)
+
+# ------------------------------
+# Subscription
+# ------------------------------
+@events_bp.route('/subscribe')
+@login_required
+def subscribe():
+    """
+    Where the browser should open its EventSource. With EVENTS_SSE_URL set
+    that is the asyncio fan-out server (sse_server.py); with
+    EVENTS_IN_APP_STREAM this app's own /events/stream. Otherwise live
+    events are off.
+    """
+    sse_url = current_app.config.get('EVENTS_SSE_URL')
+    if not sse_url and not current_app.config.get('EVENTS_IN_APP_STREAM'):
+        abort(404)
+    if sse_url:
+        return jsonify(url=f'{sse_url}?token={subscribe_token(current_user)}')
+    return jsonify(url=url_for('events.stream'))
+
+# ------------------------------
+# Fallback Stream (one worker thread per open connection)
+# ------------------------------
+# Only with EVENTS_IN_APP_STREAM: every open tab holds a worker thread. Each
+# stream ends after EVENTS_STREAM_MAX_SECONDS so a thread is never held for
+# good; the EventSource reconnects with Last-Event-ID and misses nothing.
+@events_bp.route('/stream')
+@login_required
+def stream():
+    config = current_app.config
+    if config.get('EVENTS_SSE_URL') or not config.get('EVENTS_IN_APP_STREAM'):
+        abort(404)
+    deadline = time.monotonic() + config.get('EVENTS_STREAM_MAX_SECONDS', 300)
+    channels = set(channels_for(current_user))
+    events = bus()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    cursor = int(last_event_id) if last_event_id and last_event_id.isdigit() else events.last_id()
+    # The generator only needs the bus, channels and cursor. Hand the database
+    # connection back now instead of holding it for as long as the tab is open.
+    db.session.remove()
+
+    def generate(cursor):
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            head = events.last_id()
+            rows = events.since(cursor, channels)
+            for event_id, _, event, data in rows:
+                yield format_event(event_id, event, data)
+            cursor = rows[-1][0] if len(rows) == 500 else max([head] + [row[0] for row in rows])
+            events.wait(cursor, max(0, min(HEARTBEAT_SECONDS, deadline - time.monotonic())))
+            if events.last_id() <= cursor:
+                yield ': keepalive\n\n'
+        # Sets Last-Event-ID for the reconnect, so events published meanwhile are delivered.
+        yield f'id: {cursor}\n\n'
+
+    return Response(generate(cursor), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
@@ -1,11 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, send_from_directory, current_app, jsonify, session, g, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from models import User, Child, Upload, Visit, Guidance, db
+from models import User, Child, Upload, Visit, Guidance, GrowthMeasurement, ArchivedUpload, ArchivedVisit, db
+from services.archive import archived_uploads, archived_visits, archived_counts, read_archived_file
+from services.attachments import attach, save_file, upload_metadata, UploadRejected, PHOTO_TYPES, DOCUMENT_TYPES, PHOTO_UPLOAD_TYPES
+from services.compliance import record_upload
+from services.concurrency import check_version
+from services.events import publish
+from services.sync import changes_since, page_etag, PAGES
 from datetime import datetime
 from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+import io
+import math
 import os
 import json
+import uuid
 
 parent_bp = Blueprint('parent', __name__)
 
@@ -22,6 +32,34 @@ def parent_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# --------------------------
+# Conditional Page Loads (services/sync.py)
+# --------------------------
+CACHED_PAGES = {'parent.dashboard', 'parent.view_children', 'parent.manage_uploads', 'parent.view_visits',
+                'parent.view_guidance', 'parent.profile'}
+
+@parent_bp.before_request
+def unchanged_page():
+    # A pending flash message has to be rendered, so only plain page loads qualify.
+    if (request.method != 'GET' or request.endpoint not in CACHED_PAGES or session.get('_flashes')
+            or not current_user.is_authenticated or current_user.role != 'parent'):
+        return None
+    g.page_etag = page_etag(current_user, request.full_path)  # ?archived=1 is its own page
+    if request.if_none_match.contains_weak(g.page_etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(g.page_etag, weak=True)
+        return response
+    return None
+
+@parent_bp.after_request
+def page_cache_headers(response):
+    etag = g.pop('page_etag', None)
+    if etag and response.status_code == 200:
+        response.set_etag(etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
 # --------------------------
 # Dashboard
 # --------------------------
@@ -89,37 +127,102 @@ def manage_uploads():
         upload_type = request.form.get('upload_type')
         file = request.files.get('file')
         
+        # The health form covers both check-ups and vaccinations; keep the
+        # distinction so each is tracked as its own monthly report.
+        if upload_type == 'health_report' and request.form.get('report_category') == 'vaccination':
+            upload_type = 'vaccination'
+        
         if not file or not file.filename:
             flash('Please select a file.', 'danger')
             return redirect(url_for('parent.manage_uploads'))
         
-        child = Child.query.get(int(child_id))
+        child = Child.query.get(int(child_id)) if (child_id or '').isdigit() else None
         if not child or child.parent_id != current_user.id:
             flash('Invalid child.', 'danger')
             return redirect(url_for('parent.manage_uploads'))
         
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'documents', filename)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        file.save(file_path)
+        # Optional growth measurements sent with a health check-up
+        measurements = {}
+        if upload_type == 'health_report':
+            for field in ('height_cm', 'weight_kg', 'head_circumference_cm'):
+                raw = (request.form.get(field) or '').strip()
+                if raw:
+                    try:
+                        measurements[field] = float(raw)
+                    except ValueError:
+                        measurements[field] = 0
+                    # float() also accepts 'nan' and 'inf'
+                    if not (math.isfinite(measurements[field]) and measurements[field] > 0):
+                        flash('Measurements must be positive numbers.', 'danger')
+                        return redirect(url_for('parent.manage_uploads'))
+        measured_on = datetime.now().date()
+        if measurements and request.form.get('measured_on'):
+            try:
+                measured_on = datetime.strptime(request.form['measured_on'], '%Y-%m-%d').date()
+            except ValueError:
+                flash('Please enter the measurement date as YYYY-MM-DD.', 'danger')
+                return redirect(url_for('parent.manage_uploads'))
+            if measured_on > datetime.now().date():
+                flash('The measurement date cannot be in the future.', 'danger')
+                return redirect(url_for('parent.manage_uploads'))
+            if child.dob and measured_on < child.dob:
+                flash("The measurement date cannot be before the child's date of birth.", 'danger')
+                return redirect(url_for('parent.manage_uploads'))
+        
+        # Unique name so two parents' "report.pdf" never overwrite each other
+        filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+        allowed = PHOTO_TYPES if upload_type in PHOTO_UPLOAD_TYPES else DOCUMENT_TYPES
+        try:
+            meta = save_file(file, f"documents/{filename}", allowed_types=allowed)
+        except UploadRejected as error:
+            flash(str(error), 'danger')
+            return redirect(url_for('parent.manage_uploads'))
+        
+        duplicate = Upload.query.filter(
+            Upload.child_id == child.id,
+            Upload.sha256 == meta['sha256'],
+            Upload.status != 'rejected'
+        ).first()
+        if duplicate:
+            os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], meta['file_path']))
+            flash(f"This file was already uploaded on {duplicate.upload_date:%d %b %Y}.", 'warning')
+            return redirect(url_for('parent.manage_uploads'))
         
         upload = Upload(
             parent_id=current_user.id,
             child_id=child.id,
             upload_type=upload_type,
-            file_path=f"documents/{filename}",
-            status='pending'
+            file_path=meta['file_path'],
+            status='pending',
+            **upload_metadata(meta)
         )
         
         db.session.add(upload)
+        db.session.flush()
+        attach('upload', upload.id, meta)
+        if measurements:
+            db.session.add(GrowthMeasurement(
+                child_id=child.id,
+                upload=upload,
+                measured_on=measured_on,
+                **measurements
+            ))
+        record_upload(upload)
         db.session.commit()
+        if current_user.staff_id:
+            publish(f'staff:{current_user.staff_id}', 'upload.created', upload_id=upload.id,
+                    upload_type=upload_type, parent=current_user.name, child=child.name)
         
         flash('Document uploaded successfully. Waiting for staff verification.', 'success')
         return redirect(url_for('parent.manage_uploads'))
     
     children = Child.query.filter_by(parent_id=current_user.id).all()
     uploads = Upload.query.filter_by(parent_id=current_user.id).order_by(Upload.upload_date.desc()).all()
-    return render_template('parent/uploads.html', children=children, uploads=uploads)
+    show_archived = bool(request.args.get('archived'))
+    return render_template('parent/uploads.html', children=children, uploads=uploads,
+                           show_archived=show_archived,
+                           archived_uploads=archived_uploads(current_user.id) if show_archived else [],
+                           archived_count=archived_counts(current_user.id)[0])
 
 # --------------------------
 # Visits
@@ -132,8 +235,35 @@ def view_visits():
         flash('Your account is pending approval.', 'warning')
         return redirect(url_for('parent.dashboard'))
     
-    visits = Visit.query.filter_by(parent_id=current_user.id).order_by(Visit.visit_date.desc()).all()
-    return render_template('parent/visits.html', visits=visits)
+    visits = Visit.query.filter_by(parent_id=current_user.id).options(
+        selectinload(Visit.attachments)
+    ).order_by(Visit.visit_date.desc()).all()
+    show_archived = bool(request.args.get('archived'))
+    return render_template('parent/visits.html', visits=visits,
+                           show_archived=show_archived,
+                           archived_visits=archived_visits(current_user.id) if show_archived else [],
+                           archived_count=archived_counts(current_user.id)[1])
+
+@parent_bp.route('/archive/<kind>/<int:record_id>/files/<int:attachment_id>')
+@login_required
+@parent_required
+def archived_file(kind, record_id, attachment_id):
+    model = {'upload': ArchivedUpload, 'visit': ArchivedVisit}.get(kind)
+    if model is None:
+        abort(404)
+    record = model.query.get_or_404(record_id)
+    if record.parent_id != current_user.id:
+        abort(404)
+    
+    attachment = next((a for a in record.attachments if a.id == attachment_id), None)
+    data = read_archived_file(record, attachment) if attachment else None
+    if data is None:
+        abort(404)
+    return send_file(
+        io.BytesIO(data),
+        mimetype=attachment.mime_type,
+        download_name=attachment.original_name or os.path.basename(attachment.file_path)
+    )
 
 # --------------------------
 # Guidance
@@ -158,6 +288,7 @@ def profile():
 @login_required
 @parent_required
 def update_profile():
+    check_version(current_user, request.form.get('version'))
     current_user.name = request.form.get('name', current_user.name)
     current_user.address = request.form.get('address', current_user.address)
     current_user.phone = request.form.get('phone', current_user.phone)
@@ -165,3 +296,28 @@ def update_profile():
     db.session.commit()
     flash('Profile updated successfully.', 'success')
     return redirect(url_for('parent.profile'))
+
+# --------------------------
+# Offline Support
+# --------------------------
+@parent_bp.route('/api/sync')
+@login_required
+@parent_required
+def api_sync():
+    """Children, uploads, visits and guidance changed since ?since=<watermark>; see services/sync.py."""
+    if current_user.status != 'approved':
+        return jsonify(error='Your account is pending approval.'), 403
+    result = changes_since(current_user, request.args.get('since'))
+    changed = [kind for kind in PAGES if result[kind] or kind in result['removed']]
+    result['refresh'] = sorted({url_for(endpoint) for kind in changed for endpoint in PAGES[kind]})
+    response = jsonify(result)
+    response.cache_control.no_store = True
+    return response
+
+@parent_bp.route('/sw.js')
+def service_worker():
+    # Served from /parent/ (not /static/) so the worker's scope covers the portal pages.
+    response = send_from_directory(current_app.static_folder, 'js/parent-sw.js',
+                                   mimetype='text/javascript', max_age=0)
+    response.cache_control.no_cache = True
+    return response
@@ -1,10 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from models import User, Staff, Child, Upload, Visit, db
+from models import User, Staff, Child, Upload, Visit, ArchivedUpload, ArchivedVisit, db
+from sqlalchemy.orm import selectinload
+from services.attachments import attach, save_file, UploadRejected, PHOTO_TYPES
+from services.archive import archived_for_parent, archived_counts, read_archived_file
+from services import audit
+from services.events import publish
+from services.outbox import notify_parent
+from services.compliance import record_verification, record_visit_completed, overdue_items, CATEGORIES
+from services.concurrency import check_version, CONFLICTS
 from datetime import datetime
+import io
 import os
-import json
 import uuid  # for unique filenames
 
 # ------------------------------
@@ -90,14 +98,47 @@ def view_parent_detail(parent_id):
     
     children = Child.query.filter_by(parent_id=parent.id).all()
     uploads = Upload.query.filter_by(parent_id=parent.id).order_by(Upload.upload_date.desc()).all()
-    visits = Visit.query.filter_by(parent_id=parent.id).order_by(Visit.visit_date.desc()).all()
+    visits = Visit.query.filter_by(parent_id=parent.id).options(
+        selectinload(Visit.attachments)
+    ).order_by(Visit.visit_date.desc()).all()
+    
+    # Records in cold storage are only loaded when asked for.
+    show_archived = bool(request.args.get('archived'))
+    archived_uploads, archived_visits = archived_for_parent(parent.id) if show_archived else ([], [])
     
     return render_template(
         'staff/parent_detail.html',
         parent=parent,
         children=children,
         uploads=uploads,
-        visits=visits
+        visits=visits,
+        show_archived=show_archived,
+        archived_uploads=archived_uploads,
+        archived_visits=archived_visits,
+        archived_counts=archived_counts(parent.id)
+    )
+
+@staff_bp.route('/archive/<kind>/<int:record_id>/files/<int:attachment_id>')
+@login_required
+@staff_required
+def archived_file(kind, record_id, attachment_id):
+    staff = Staff.query.filter_by(email=current_user.email).first()
+    model = {'upload': ArchivedUpload, 'visit': ArchivedVisit}.get(kind)
+    if model is None:
+        abort(404)
+    record = model.query.get_or_404(record_id)
+    if record.parent.staff_id != staff.id:
+        flash('You are not assigned to this parent.', 'danger')
+        return redirect(url_for('staff.view_parents'))
+    
+    attachment = next((a for a in record.attachments if a.id == attachment_id), None)
+    data = read_archived_file(record, attachment) if attachment else None
+    if data is None:
+        abort(404)
+    return send_file(
+        io.BytesIO(data),
+        mimetype=attachment.mime_type,
+        download_name=attachment.original_name or os.path.basename(attachment.file_path)
     )
 
 # ------------------------------
@@ -130,6 +171,7 @@ def verify_upload(upload_id):
     if upload.parent.staff_id != staff.id:
         flash('You are not authorized to verify this upload.', 'danger')
         return redirect(url_for('staff.view_uploads'))
+    check_version(upload, request.form.get('version'))
     
     action = request.form.get('action')
     feedback = request.form.get('feedback', '')
@@ -145,11 +187,39 @@ def verify_upload(upload_id):
         upload.verified_by = staff.id
         upload.verified_at = datetime.utcnow()
         upload.feedback = feedback
+        notify_parent(
+            upload.parent, 'upload.rejected', 'A document needs your attention',
+            f"Your {upload.upload_type.replace('_', ' ')} for {upload.child.name} was not accepted.\n\n"
+            f"Feedback: {feedback or '-'}\n\nPlease upload a corrected document.",
+            dedup_key=f'upload.rejected:{upload.id}:{upload.verified_at:%Y%m%d%H%M%S}'
+        )
         flash('Document rejected.', 'info')
     
+    record_verification(upload)
     db.session.commit()
+    if action in ('approve', 'reject'):
+        audit.record(f'upload.{upload.status}', 'upload', upload.id,
+                     parent_id=upload.parent_id, child_id=upload.child_id, feedback=feedback)
+        publish(f'user:{upload.parent_id}', 'upload.status', upload_id=upload.id,
+                status=upload.status, upload_type=upload.upload_type, feedback=feedback)
     return redirect(url_for('staff.view_uploads'))
 
+# ------------------------------
+# Overdue Reports & Visits
+# ------------------------------
+@staff_bp.route('/compliance')
+@login_required
+@staff_required
+def view_compliance():
+    staff = Staff.query.filter_by(email=current_user.email).first()
+    if not staff:
+        flash('Staff record not found.', 'danger')
+        return redirect(url_for('auth.logout'))
+    
+    category = request.args.get('category', 'all')
+    items = overdue_items(staff_id=staff.id, category=None if category == 'all' else category)
+    return render_template('staff/compliance.html', items=items, category=category, categories=CATEGORIES)
+
 # ------------------------------
 # View Visits
 # ------------------------------
@@ -168,7 +238,9 @@ def view_visits():
     if status != 'all':
         query = query.filter(Visit.status == status)
     
-    visits = query.order_by(Visit.visit_date.desc()).all()
+    visits = query.options(
+        selectinload(Visit.attachments)
+    ).order_by(Visit.visit_date.desc()).all()
     assigned_parents = User.query.filter_by(staff_id=staff.id, role='parent', status='approved').all()
     return render_template('staff/visits.html', visits=visits, status=status, assigned_parents=assigned_parents)
 
@@ -198,7 +270,15 @@ def add_visit():
 )
     
     db.session.add(visit)
+    db.session.flush()
+    notify_parent(
+        parent, 'visit.booked', 'Home visit booked',
+        f'{staff.name} will visit on {visit.visit_date:%A %d %B %Y}.',
+        dedup_key=f'visit.booked:{visit.id}', sms=True
+    )
     db.session.commit()
+    publish(f'user:{parent.id}', 'visit.scheduled', visit_id=visit.id,
+            visit_date=visit.visit_date.isoformat(), staff=staff.name)
     
     flash('Visit scheduled successfully.', 'success')
     return redirect(url_for('staff.view_visits'))
@@ -206,6 +286,11 @@ def add_visit():
 # ------------------------------
 # Complete a Visit (File Upload Fix)
 # ------------------------------
+def _discard(saved):
+    """Remove photos saved for a visit completion that was rolled back."""
+    for relative_path in saved:
+        os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path))
+
 @staff_bp.route('/visits/<int:visit_id>/complete', methods=['POST'])
 @login_required
 @staff_required
@@ -216,25 +301,35 @@ def complete_visit(visit_id):
     if visit.staff_id != staff.id:
         flash('You are not authorized to complete this visit.', 'danger')
         return redirect(url_for('staff.view_visits'))
+    check_version(visit, request.form.get('version'))
     
     visit.status = 'completed'
     visit.remarks = request.form.get('remarks', visit.remarks)
     
-    photos = []
-    if 'photos' in request.files:
-        files = request.files.getlist('photos')
-        for file in files:
+    # Photos are added alongside any from an earlier completion.
+    saved = []
+    try:
+        for file in request.files.getlist('photos'):
             if file and file.filename:
                 # ✅ Safe unique filename
                 filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'visits', filename)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                file.save(file_path)
-                photos.append(f"visits/{filename}")
-    
-    if photos:
-        visit.photos = json.dumps(photos)
+                meta = save_file(file, f"visits/{filename}", allowed_types=PHOTO_TYPES)
+                saved.append(meta['file_path'])
+                attach('visit', visit.id, meta)
+    except UploadRejected as error:
+        db.session.rollback()
+        _discard(saved)
+        flash(f'{error} The visit was not completed.', 'danger')
+        return redirect(url_for('staff.view_visits'))
     
-    db.session.commit()
+    record_visit_completed(visit)
+    try:
+        db.session.commit()
+    except CONFLICTS:
+        db.session.rollback()
+        _discard(saved)
+        raise
+    publish(f'user:{visit.parent_id}', 'visit.completed', visit_id=visit.id,
+            visit_date=visit.visit_date.isoformat(), remarks=visit.remarks)
     flash('Visit marked as completed.', 'success')
     return redirect(url_for('staff.view_visits'))
@@ -0,0 +1,219 @@
+from flask import current_app
+from models import Upload, Visit, ArchivedUpload, ArchivedVisit, Attachment, db
+from services.attachments import migrate_visit_photos, migrate_upload_files
+from services import audit
+from services.tenancy import region_path
+from sqlalchemy import select, insert, update, delete, func, literal
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+import os
+import zipfile
+
+# ------------------------------
+# Cold Storage
+# ------------------------------
+# Verified uploads and completed visits older than ARCHIVE_AFTER_DAYS move
+# out of the hot `uploads` / `visits` tables into `uploads_archive` /
+# `visits_archive` (same ids and columns), and their files are packed into
+# one zip bundle per kind and month under ARCHIVE_FOLDER. Zip keeps each
+# file individually addressable, so an archived document can be served
+# straight from its bundle without unpacking anything else.
+#
+# Each batch writes its bundle members first, then moves the rows in one
+# transaction, and only then deletes the originals from UPLOAD_FOLDER, so a
+# crash at any point leaves every file reachable. Re-running skips members
+# that are already in a bundle.
+
+# Already-compressed formats are stored as-is; deflating them gains nothing.
+STORED_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp', 'application/zip')
+
+_UPLOAD_COLUMNS = ('id', 'parent_id', 'child_id', 'upload_type', 'file_path', 'upload_date',
+                   'status', 'feedback', 'verified_by', 'verified_at', 'size_bytes', 'mime_type',
+                   'sha256', 'page_count', 'width', 'height')
+_VISIT_COLUMNS = ('id', 'parent_id', 'staff_id', 'visit_date', 'scheduled_date', 'remarks',
+                  'status', 'created_at')
+
+ARCHIVE_KINDS = {
+    # kind: (hot model, archive model, columns, date column, hot filter)
+    'upload': (Upload, ArchivedUpload, _UPLOAD_COLUMNS, 'upload_date', Upload.status == 'verified'),
+    'visit': (Visit, ArchivedVisit, _VISIT_COLUMNS, 'visit_date', Visit.status == 'completed'),
+}
+
+
+def _folder():
+    return region_path(current_app.config.get('ARCHIVE_FOLDER', 'archive'))
+
+
+def bundle_path(bundle):
+    return os.path.join(_folder(), bundle)
+
+
+def _pack(bundle, files):
+    """Add (member, mime_type) files from UPLOAD_FOLDER to `bundle`; returns (count, compressed bytes)."""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(_folder(), exist_ok=True)
+    added = 0
+    packed = 0
+    with zipfile.ZipFile(bundle_path(bundle), 'a', compression=zipfile.ZIP_DEFLATED) as zf:
+        existing = set(zf.namelist())
+        for member, mime_type in files:
+            source = os.path.join(upload_folder, member)
+            if member in existing or not os.path.isfile(source):
+                continue
+            compression = zipfile.ZIP_STORED if mime_type in STORED_TYPES else zipfile.ZIP_DEFLATED
+            zf.write(source, member, compress_type=compression)
+            existing.add(member)
+            added += 1
+            packed += zf.getinfo(member).compress_size
+    return added, packed
+
+
+def _still_referenced(paths):
+    """Paths that a hot upload or attachment still points at (uploads may share a filename)."""
+    if not paths:
+        return set()
+    paths = list(paths)
+    return set(db.session.execute(
+        select(Upload.file_path).where(Upload.file_path.in_(paths))
+    ).scalars()) | set(db.session.execute(
+        select(Attachment.file_path).where(Attachment.owner_type.in_(('upload', 'visit')),
+                                           Attachment.file_path.in_(paths))
+    ).scalars())
+
+
+def _archive_batch(kind, rows, now):
+    hot, cold, columns, date_column, _ = ARCHIVE_KINDS[kind]
+    ids = [row.id for row in rows]
+    files = {}
+    for owner_id, file_path, mime_type, size in db.session.execute(
+        select(Attachment.owner_id, Attachment.file_path, Attachment.mime_type, Attachment.size_bytes)
+        .where(Attachment.owner_type == kind, Attachment.owner_id.in_(ids))
+    ):
+        files.setdefault(owner_id, []).append((file_path, mime_type, size or 0))
+
+    bundles = {}
+    for row in rows:
+        bundles.setdefault(f"{kind}s-{getattr(row, date_column):%Y-%m}.zip", []).append(row.id)
+
+    stats = {'files': 0, 'bytes': 0, 'packed_bytes': 0}
+    for bundle, bundle_ids in bundles.items():
+        members = [(path, mime) for owner_id in bundle_ids for path, mime, _ in files.get(owner_id, [])]
+        added, packed = _pack(bundle, members)
+        stats['files'] += added
+        stats['packed_bytes'] += packed
+        stats['bytes'] += sum(size for owner_id in bundle_ids for _, _, size in files.get(owner_id, []))
+
+    for bundle, bundle_ids in bundles.items():
+        db.session.execute(
+            insert(cold).from_select(
+                list(columns) + ['bundle', 'archived_at'],
+                select(*[getattr(hot, name) for name in columns], literal(bundle), literal(now))
+                .where(hot.id.in_(bundle_ids))
+            )
+        )
+    db.session.execute(
+        update(Attachment)
+        .where(Attachment.owner_type == kind, Attachment.owner_id.in_(ids))
+        .values(owner_type=f'archived_{kind}')
+    )
+    db.session.execute(delete(hot).where(hot.id.in_(ids)))
+    db.session.commit()
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    paths = {path for entries in files.values() for path, _, _ in entries}
+    for path in paths - _still_referenced(paths):
+        source = os.path.join(upload_folder, path)
+        if os.path.isfile(source):
+            os.remove(source)
+    return stats
+
+
+def archive_records(after_days=None, today=None, batch_size=500):
+    """
+    Move verified uploads and completed visits dated more than `after_days`
+    (default ARCHIVE_AFTER_DAYS) ago into cold storage. Returns counts.
+    """
+    if after_days is None:
+        after_days = current_app.config.get('ARCHIVE_AFTER_DAYS', 365)
+    today = today or datetime.now().date()
+    cutoff = today - timedelta(days=after_days)
+
+    # Every file must have an attachment row before its owner can move.
+    migrate_visit_photos()
+    migrate_upload_files()
+
+    now = datetime.utcnow()
+    summary = {'uploads': 0, 'visits': 0, 'files': 0, 'bytes': 0, 'packed_bytes': 0}
+    for kind, (hot, _, _, date_column, condition) in ARCHIVE_KINDS.items():
+        date_attr = getattr(hot, date_column)
+        limit = datetime.combine(cutoff, datetime.min.time()) if kind == 'upload' else cutoff
+        while True:
+            rows = db.session.execute(
+                select(hot.id, date_attr).where(condition, date_attr < limit)
+                .order_by(hot.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            stats = _archive_batch(kind, rows, now)
+            summary[f'{kind}s'] += len(rows)
+            for key, value in stats.items():
+                summary[key] += value
+    if summary['uploads'] or summary['visits']:
+        audit.record('records.archived', actor=('system', None), cutoff=cutoff, **summary)
+    return summary
+
+
+# ------------------------------
+# Retrieval
+# ------------------------------
+def archived_uploads(parent_id):
+    """Uploads in cold storage for one parent, newest first."""
+    return ArchivedUpload.query.filter_by(parent_id=parent_id).options(
+        selectinload(ArchivedUpload.attachments), selectinload(ArchivedUpload.child)
+    ).order_by(ArchivedUpload.upload_date.desc()).all()
+
+
+def archived_visits(parent_id):
+    """Visits in cold storage for one parent, newest first."""
+    return ArchivedVisit.query.filter_by(parent_id=parent_id).options(
+        selectinload(ArchivedVisit.attachments), selectinload(ArchivedVisit.staff)
+    ).order_by(ArchivedVisit.visit_date.desc()).all()
+
+
+def archived_for_parent(parent_id):
+    """(uploads, visits) in cold storage for one parent, newest first."""
+    return archived_uploads(parent_id), archived_visits(parent_id)
+
+
+def archived_counts(parent_id):
+    return (
+        db.session.execute(select(func.count()).where(ArchivedUpload.parent_id == parent_id)).scalar(),
+        db.session.execute(select(func.count()).where(ArchivedVisit.parent_id == parent_id)).scalar(),
+    )
+
+
+def read_archived_file(record, attachment):
+    """Bytes of one archived attachment from its record's bundle, or None if it was never packed."""
+    try:
+        with zipfile.ZipFile(bundle_path(record.bundle)) as zf:
+            return zf.read(attachment.file_path)
+    except (FileNotFoundError, KeyError):
+        return None
+
+
+def last_completed_visits():
+    """{parent_id: last completed visit date} across hot and archived visits."""
+    last = {}
+    for model, condition in ((Visit, Visit.status == 'completed'), (ArchivedVisit, ArchivedVisit.status == 'completed')):
+        for parent_id, visit_date in db.session.execute(
+            select(model.parent_id, func.max(model.visit_date)).where(condition).group_by(model.parent_id)
+        ):
+            if visit_date and (parent_id not in last or visit_date > last[parent_id]):
+                last[parent_id] = visit_date
+    return last
+
+
+def table_sizes():
+    """Row counts of the hot and archive tables."""
+    return {model.__tablename__: db.session.execute(select(func.count()).select_from(model)).scalar()
+            for model in (Upload, ArchivedUpload, Visit, ArchivedVisit)}
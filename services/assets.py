@@ -0,0 +1,217 @@
+from flask import current_app, request
+from markupsafe import Markup
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+
+try:
+    from PIL import Image
+except ImportError:  # optional: pip install Pillow
+    Image = None
+
+# ------------------------------
+# Static Asset Pipeline
+# ------------------------------
+# `flask build-assets` copies every CSS, JS and image file under static/ to
+# static/<ASSET_DIST_DIR>/ with a content hash in its name and writes
+# manifest.json mapping the original path to the hashed copy. While the
+# manifest exists, url_for('static', filename='css/style.css') resolves to
+# the hashed copy (no template changes), and hashed files are served with a
+# year-long `immutable` Cache-Control, so returning browsers don't request
+# them again. A changed file gets a new name, which is the cache busting.
+#
+# With Pillow installed, JPEG/PNG images are also recompressed and resized
+# to each IMAGE_WIDTHS width smaller than the original. background_image()
+# in the page styles then picks a variant by viewport width through CSS
+# custom properties that responsive_backgrounds() defines in base.html.
+# Without Pillow images are fingerprinted as-is.
+#
+# Re-run build-assets after editing anything under static/; until then the
+# old hashed copy keeps being served.
+
+ASSET_DIRS = ('css', 'js', 'images')
+IMAGE_WIDTHS = (480, 960)
+IMAGE_QUALITY = 80
+HASH_LENGTH = 12
+CSS_URL = re.compile(r'url\(\s*([\'"]?)(?!data:|https?:|//)([^\'")]+)\1\s*\)')
+
+
+def _dist(app):
+    return os.path.join(app.static_folder, app.config.get('ASSET_DIST_DIR', 'dist'))
+
+
+def _fingerprinted(relative, data):
+    stem, extension = os.path.splitext(relative)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}'
+
+
+def _write(dist, relative, data):
+    path = os.path.join(dist, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        with open(path + '.part', 'wb') as out:
+            out.write(data)
+        os.replace(path + '.part', path)
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        image.convert('RGB').save(buffer, 'JPEG', quality=IMAGE_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, fmt, optimize=True)
+    return buffer.getvalue()
+
+
+def _image_variants(relative, data):
+    """[(width, relative name, bytes)] resized copies plus the recompressed original, smallest first."""
+    with Image.open(io.BytesIO(data)) as image:
+        if image.format not in ('JPEG', 'PNG'):
+            return []
+        fmt = image.format
+        image.load()
+    stem, extension = os.path.splitext(relative)
+    variants = []
+    for width in IMAGE_WIDTHS:
+        if width < image.width:
+            height = round(image.height * width / image.width)
+            encoded = _encode(image.resize((width, height), Image.LANCZOS), fmt)
+            variants.append((width, f'{stem}-{width}w{extension}', encoded))
+    recompressed = _encode(image, fmt)
+    variants.append((image.width, relative, recompressed if len(recompressed) < len(data) else data))
+    return variants
+
+
+def _rewrite_css(relative, text, files):
+    """Point url(...) references in a stylesheet at the hashed copies."""
+    folder = os.path.dirname(relative)
+
+    def replace(match):
+        target = os.path.normpath(os.path.join(folder, match.group(2))).replace(os.sep, '/')
+        if target not in files:
+            return match.group(0)
+        return f'url("{os.path.relpath(files[target], folder)}")'.replace(os.sep, '/')
+    return CSS_URL.sub(replace, text)
+
+
+def build_assets(app):
+    """Write hashed copies (and image variants) and the manifest. Returns a summary dict."""
+    static, dist = app.static_folder, _dist(app)
+    prefix = os.path.relpath(dist, static).replace(os.sep, '/')
+    sources = []
+    for folder in ASSET_DIRS:
+        for root, _, names in os.walk(os.path.join(static, folder)):
+            sources.extend(os.path.relpath(os.path.join(root, name), static).replace(os.sep, '/')
+                           for name in sorted(names))
+    files, variants = {}, {}
+    summary = {'files': 0, 'variants': 0, 'bytes_in': 0, 'bytes_out': 0}
+    # Stylesheets last, so url() references to images and fonts can be rewritten.
+    for relative in sorted(sources, key=lambda name: name.endswith('.css')):
+        with open(os.path.join(static, relative), 'rb') as source:
+            data = source.read()
+        if relative.endswith('.css'):
+            in_dist = {name: path[len(prefix) + 1:] for name, path in files.items()}
+            data = _rewrite_css(relative, data.decode('utf-8'), in_dist).encode('utf-8')
+        summary['bytes_in'] += len(data)
+        resized = _image_variants(relative, data) if Image is not None and relative.startswith('images/') else []
+        if resized:
+            data = resized[-1][2]
+        hashed = _fingerprinted(relative, data)
+        _write(dist, hashed, data)
+        files[relative] = f'{prefix}/{hashed}'
+        if len(resized) > 1:
+            variants[relative] = []
+            for width, name, encoded in resized[:-1]:
+                variant = _fingerprinted(name, encoded)
+                _write(dist, variant, encoded)
+                variants[relative].append([width, f'{prefix}/{variant}'])
+            variants[relative].append([resized[-1][0], files[relative]])
+            summary['variants'] += len(resized) - 1
+        summary['files'] += 1
+        summary['bytes_out'] += len(data)
+    manifest = {'files': files, 'variants': variants}
+    with open(os.path.join(dist, 'manifest.json.part'), 'w') as out:
+        json.dump(manifest, out, indent=1, sort_keys=True)
+    os.replace(os.path.join(dist, 'manifest.json.part'), os.path.join(dist, 'manifest.json'))
+    app.extensions['assets'] = manifest
+    return summary
+
+
+def clean_assets(app):
+    """Remove the build output, so url_for serves the original files again."""
+    shutil.rmtree(_dist(app), ignore_errors=True)
+    app.extensions['assets'] = {'files': {}, 'variants': {}}
+
+
+def load_manifest(app):
+    try:
+        with open(os.path.join(_dist(app), 'manifest.json')) as manifest:
+            app.extensions['assets'] = json.load(manifest)
+    except (OSError, ValueError):
+        app.extensions['assets'] = {'files': {}, 'variants': {}}
+    return app.extensions['assets']
+
+
+def _manifest():
+    return current_app.extensions.get('assets') or {'files': {}, 'variants': {}}
+
+
+def _hashed_filename(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = _manifest()['files'].get(values['filename'], values['filename'])
+
+
+def _custom_property(filename):
+    return '--bg-' + re.sub(r'[^a-zA-Z0-9_-]', '-', os.path.splitext(os.path.basename(filename))[0])
+
+
+def _static_url(path):
+    return current_app.url_for('static', filename=path)
+
+
+def background_image(filename):
+    """CSS image value for a page background: the variant for the viewport when built, else the file."""
+    fallback = f'url("{_static_url(filename)}")'
+    if filename not in _manifest()['variants']:
+        return Markup(fallback)
+    return Markup(f'var({_custom_property(filename)}, {fallback})')
+
+
+def responsive_backgrounds():
+    """<style> defining the custom properties background_image() uses (one image per breakpoint)."""
+    rules = []
+    for filename, sizes in sorted(_manifest()['variants'].items()):
+        name = _custom_property(filename)
+        previous = None
+        for width, path in sizes:
+            declaration = f':root{{{name}:url("{_static_url(path)}")}}'
+            if previous is None:
+                rules.append(declaration)
+            else:
+                rules.append(f'@media (min-width:{previous + 1}px),(min-width:{previous // 2 + 1}px) and '
+                             f'(min-resolution:2dppx){{{declaration}}}')
+            previous = width
+    return Markup(f'<style>{"".join(rules)}</style>') if rules else ''
+
+
+def cache_headers(response):
+    """Hashed files never change, so let browsers and proxies keep them for ASSET_MAX_AGE."""
+    dist = current_app.config.get('ASSET_DIST_DIR', 'dist') + '/'
+    if (request.endpoint == 'static' and response.status_code == 200
+            and (request.view_args or {}).get('filename', '').startswith(dist)):
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config.get('ASSET_MAX_AGE', 365 * 24 * 3600)
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+def init_assets(app):
+    load_manifest(app)
+    app.url_defaults(_hashed_filename)
+    app.after_request(cache_headers)
+    app.jinja_env.globals.update(background_image=background_image,
+                                 responsive_backgrounds=responsive_backgrounds)
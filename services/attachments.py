@@ -0,0 +1,336 @@
+from flask import current_app
+from models import Attachment, Visit, Upload, db
+from sqlalchemy import select, insert, update, func
+from datetime import datetime
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import struct
+
+# ------------------------------
+# Attachments
+# ------------------------------
+# Every stored file (visit photos, upload documents) gets one row in
+# `attachments` keyed by (owner_type, owner_id), with its size, mime type,
+# SHA-256, PDF page count or image dimensions captured while the file is
+# written. List views load attachments for a whole page in one query
+# (selectinload on Visit.attachments / Upload.attachments), and storage
+# totals are a single grouped SUM instead of walking the upload folder.
+#
+# Files are read exactly once: each chunk is hashed, scanned and written in
+# the same pass. The real type comes from the file's magic bytes, not its
+# name, so a file of the wrong kind is refused after its first chunk, and a
+# truncated PDF or PNG is refused before it replaces anything on disk.
+
+CHUNK_SIZE = 64 * 1024
+
+IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+PHOTO_TYPES = ('image/jpeg', 'image/png')
+DOCUMENT_TYPES = ('application/pdf', 'image/jpeg', 'image/png')
+# Upload.upload_type values (parent/uploads.html) that must be photos; the rest take documents.
+PHOTO_UPLOAD_TYPES = ('monthly_photo', 'home_environment')
+
+MAGIC = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+# Page objects ('/Type /Page', not '/Pages'); /Count is the fallback for
+# PDFs whose page objects sit in compressed object streams.
+_PDF_PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_PDF_COUNT = re.compile(rb'/Type\s*/Pages\b[^>]{0,200}?/Count\s+(\d+)|/Count\s+(\d+)[^>]{0,200}?/Type\s*/Pages\b')
+_OVERLAP = 256  # longest match we expect to straddle two chunks
+_TAIL = 1024
+
+
+class UploadRejected(Exception):
+    """Raised by save_file when a file fails validation; the message is user-facing."""
+
+
+def sniff(head):
+    """Mime type from the leading bytes, or None if unrecognised."""
+    for magic, mime_type in MAGIC:
+        if head.startswith(magic):
+            return mime_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def image_dimensions(head):
+    """Return (width, height) from the first bytes of a PNG, GIF or JPEG, else (None, None)."""
+    if head[:8] == b'\x89PNG\r\n\x1a\n' and len(head) >= 24:
+        return struct.unpack('>II', head[16:24])
+    if head[:6] in (b'GIF87a', b'GIF89a') and len(head) >= 10:
+        return struct.unpack('<HH', head[6:10])
+    if head[:2] == b'\xff\xd8':
+        pos = 2
+        while pos + 9 <= len(head):
+            if head[pos] != 0xFF:
+                pos += 1
+                continue
+            marker = head[pos + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                pos += 1 if marker == 0xFF else 2
+                continue
+            length = struct.unpack('>H', head[pos + 2:pos + 4])[0]
+            # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', head[pos + 5:pos + 9])
+                return width, height
+            pos += 2 + length
+    return None, None
+
+
+class _Inspector:
+    """Single-pass hash, size, type sniffing and PDF/image metadata over a stream of chunks."""
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.tail = b''
+        self.mime_type = None
+        self.pages = 0
+        self.page_count = 0
+        self._carry = b''
+
+    def feed(self, chunk):
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        if len(self.head) < CHUNK_SIZE:
+            self.head += chunk[:CHUNK_SIZE - len(self.head)]
+            self.mime_type = sniff(self.head)
+        self.tail = (self.tail + chunk)[-_TAIL:]
+        if self.mime_type == 'application/pdf':
+            buffer = self._carry + chunk
+            self._count(buffer, len(buffer) - _OVERLAP)
+            self._carry = buffer[-_OVERLAP:]
+
+    def _count(self, buffer, limit):
+        # Only matches starting before `limit` are counted now; the rest are
+        # carried into the next chunk, so nothing is counted twice.
+        for match in _PDF_PAGE.finditer(buffer):
+            if match.start() < limit:
+                self.pages += 1
+        for match in _PDF_COUNT.finditer(buffer):
+            if match.start() < limit:
+                self.page_count = max(self.page_count, int(match.group(1) or match.group(2)))
+
+    def finish(self):
+        """Metadata dict plus a list of problems found in the content."""
+        problems = []
+        width = height = page_count = None
+        if self.mime_type == 'application/pdf':
+            self._count(self._carry, len(self._carry))
+            page_count = self.pages or self.page_count or None
+            if b'%%EOF' not in self.tail:
+                problems.append('the PDF is incomplete or damaged')
+            elif not page_count:
+                problems.append('the PDF has no pages')
+        elif self.mime_type in IMAGE_TYPES:
+            width, height = image_dimensions(self.head)
+            if self.mime_type == 'image/png' and (not width or b'IEND' not in self.tail):
+                problems.append('the image is incomplete or damaged')
+        if not self.size:
+            problems.append('the file is empty')
+        meta = {'size_bytes': self.size, 'sha256': self.digest.hexdigest(), 'width': width,
+                'height': height, 'page_count': page_count}
+        return meta, problems
+
+
+def _mime_type(filename, declared=None):
+    guessed = mimetypes.guess_type(filename)[0]
+    return guessed or declared or 'application/octet-stream'
+
+
+def _describe_types(allowed_types):
+    names = {'application/pdf': 'PDF', 'image/jpeg': 'JPEG', 'image/png': 'PNG', 'image/gif': 'GIF',
+             'image/webp': 'WebP'}
+    return ', '.join(names.get(t, t) for t in allowed_types)
+
+
+def save_file(file, relative_path, allowed_types=None):
+    """
+    Stream an uploaded FileStorage to UPLOAD_FOLDER/relative_path, computing
+    its metadata in the same pass, and return the metadata dict. With
+    `allowed_types`, anything whose content is not one of those types, or
+    that is damaged, raises UploadRejected and nothing is kept.
+    """
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.part'
+    inspector = _Inspector()
+    try:
+        with open(partial, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                inspector.feed(chunk)
+                if allowed_types and len(inspector.head) >= 16 and inspector.mime_type not in allowed_types:
+                    raise UploadRejected(f'{file.filename} is not a {_describe_types(allowed_types)} file.')
+                out.write(chunk)
+        meta, problems = inspector.finish()
+        if allowed_types:
+            if inspector.mime_type not in allowed_types:
+                raise UploadRejected(f'{file.filename} is not a {_describe_types(allowed_types)} file.')
+            if problems:
+                raise UploadRejected(f"{file.filename} was not accepted: {'; '.join(problems)}.")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    meta.update(file_path=relative_path, original_name=file.filename,
+                mime_type=inspector.mime_type or _mime_type(file.filename, file.mimetype))
+    return meta
+
+
+def describe_file(relative_path):
+    """Metadata for a file already on disk (sizes etc. are None if it is missing)."""
+    meta = {'file_path': relative_path, 'original_name': os.path.basename(relative_path),
+            'mime_type': _mime_type(relative_path), 'size_bytes': None, 'sha256': None,
+            'width': None, 'height': None, 'page_count': None}
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+    if os.path.isfile(path):
+        inspector = _Inspector()
+        with open(path, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+                inspector.feed(chunk)
+        meta.update(inspector.finish()[0])
+        meta['mime_type'] = inspector.mime_type or meta['mime_type']
+    return meta
+
+
+UPLOAD_META = ('size_bytes', 'mime_type', 'sha256', 'page_count', 'width', 'height')
+
+
+def upload_metadata(meta):
+    """The subset of save_file metadata stored on Upload itself."""
+    return {key: meta[key] for key in UPLOAD_META}
+
+
+def attach(owner_type, owner_id, meta):
+    """Add an Attachment for `meta` (from save_file/describe_file); the caller commits."""
+    attachment = Attachment(owner_type=owner_type, owner_id=owner_id, **meta)
+    db.session.add(attachment)
+    return attachment
+
+
+def storage_usage():
+    """Rows of (owner_type, files, bytes, images) plus a 'total' row."""
+    rows = db.session.execute(
+        select(Attachment.owner_type,
+               func.count(),
+               func.coalesce(func.sum(Attachment.size_bytes), 0),
+               func.count(Attachment.width))
+        .group_by(Attachment.owner_type)
+        .order_by(Attachment.owner_type)
+    ).all()
+    total = ('total', sum(r[1] for r in rows), sum(r[2] for r in rows), sum(r[3] for r in rows))
+    return [tuple(r) for r in rows] + [total]
+
+
+# ------------------------------
+# Migration from Visit.photos / Upload.file_path
+# ------------------------------
+def migrate_visit_photos(batch_size=500):
+    """
+    Move the legacy JSON list in Visit.photos into attachment rows and clear
+    the column, one batch per transaction. Safe to re-run.
+    """
+    migrated = 0
+    files = 0
+    while True:
+        rows = db.session.execute(
+            select(Visit.id, Visit.photos)
+            .where(Visit.photos.isnot(None))
+            .order_by(Visit.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        known = set(db.session.execute(
+            select(Attachment.owner_id, Attachment.file_path).where(
+                Attachment.owner_type == 'visit',
+                Attachment.owner_id.in_([visit_id for visit_id, _ in rows]))
+        ).all())
+        now = datetime.utcnow()
+        values = []
+        for visit_id, photos in rows:
+            try:
+                paths = json.loads(photos) or []
+            except ValueError:
+                paths = []
+            for relative_path in paths:
+                if (visit_id, relative_path) not in known:
+                    values.append(dict(describe_file(relative_path), owner_type='visit',
+                                       owner_id=visit_id, created_at=now))
+        if values:
+            db.session.execute(insert(Attachment), values)
+        db.session.execute(update(Visit).where(Visit.id.in_([visit_id for visit_id, _ in rows]))
+                           .values(photos=None, version=Visit.version + 1))
+        db.session.commit()
+        migrated += len(rows)
+        files += len(values)
+    return {'visits': migrated, 'files': files}
+
+
+def migrate_upload_files(batch_size=500):
+    """Create the attachment row for uploads that predate the attachments table."""
+    files = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Upload.id, Upload.file_path)
+            .outerjoin(Attachment, (Attachment.owner_type == 'upload') & (Attachment.owner_id == Upload.id))
+            .where(Attachment.id.is_(None), Upload.id > last_id)
+            .order_by(Upload.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        now = datetime.utcnow()
+        db.session.execute(insert(Attachment), [
+            dict(describe_file(file_path), owner_type='upload', owner_id=upload_id, created_at=now)
+            for upload_id, file_path in rows
+        ])
+        db.session.commit()
+        files += len(rows)
+        last_id = rows[-1][0]
+    return {'files': files, 'described': backfill_upload_metadata(batch_size)}
+
+
+def backfill_upload_metadata(batch_size=500):
+    """
+    Copy attachment metadata onto uploads saved before Upload had its own
+    columns, re-reading PDFs whose attachment predates page counts.
+    """
+    described = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Upload.id, Upload.version, Attachment.id, Attachment.file_path, Attachment.page_count,
+                   *[getattr(Attachment, key) for key in UPLOAD_META])
+            .join(Attachment, (Attachment.owner_type == 'upload') & (Attachment.owner_id == Upload.id))
+            .where(Upload.sha256.is_(None), Attachment.sha256.isnot(None), Upload.id > last_id)
+            .order_by(Upload.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        uploads = []
+        for upload_id, version, attachment_id, file_path, page_count, *values in rows:
+            meta = dict(zip(UPLOAD_META, values))
+            if meta['mime_type'] == 'application/pdf' and page_count is None:
+                meta['page_count'] = describe_file(file_path)['page_count']
+                db.session.execute(update(Attachment).where(Attachment.id == attachment_id)
+                                   .values(page_count=meta['page_count']))
+            uploads.append(dict(meta, id=upload_id, version=version))
+        db.session.execute(update(Upload), uploads)
+        db.session.commit()
+        described += len(rows)
+        last_id = rows[-1][0]
+    return described
@@ -0,0 +1,290 @@
+from flask import current_app, has_request_context
+from flask_login import current_user
+from services.tenancy import region_engine, region_path
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, Text, Index, select, inspect
+from sqlalchemy.exc import OperationalError
+from datetime import datetime
+import atexit
+import gzip
+import json
+import os
+import threading
+
+# ------------------------------
+# Audit Log
+# ------------------------------
+# Append-only record of who did what to which record. record() only appends
+# to an in-process buffer; a background thread writes the buffer with one
+# executemany per month whenever AUDIT_BATCH_SIZE events are waiting or
+# AUDIT_FLUSH_INTERVAL seconds have passed, so requests never wait on the
+# log. Events still in the buffer are written at exit; a hard crash can lose
+# at most one interval.
+#
+# Each month gets its own table (audit_events_YYYYMM). Queries only touch
+# the months in their time range, and archive_partitions() moves whole old
+# months into gzipped JSON-lines files and drops their tables. Other
+# processes create and drop month tables too, so queries and archival re-read
+# the table names (one catalog query) instead of trusting this process's list.
+#
+# With REGIONS configured, events are buffered and written per region, so
+# each office's log stays in its own database and archive folder.
+
+PARTITION_PREFIX = 'audit_events_'
+
+_metadata = MetaData()
+_buffers = {}  # engine -> events waiting to be written
+_started = False
+_known = {}  # engine -> months with a table, as last read from the database
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wake = threading.Event()
+_thread = None
+_settings = {'batch_size': 200, 'interval': 2.0}
+
+
+def _partition(month):
+    """Table for `month` ('YYYYMM')."""
+    name = PARTITION_PREFIX + month
+    table = _metadata.tables.get(name)
+    if table is None:
+        table = Table(
+            name, _metadata,
+            Column('id', Integer, primary_key=True),
+            Column('occurred_at', DateTime, nullable=False),
+            Column('actor_role', String(20)),  # admin, staff, parent, system
+            Column('actor_id', Integer),
+            Column('action', String(50), nullable=False),  # e.g. 'upload.verified'
+            Column('subject_type', String(30)),
+            Column('subject_id', Integer),
+            Column('details', Text),  # JSON
+            Index(f'ix_{name}_occurred', 'occurred_at'),
+            Index(f'ix_{name}_actor', 'actor_id', 'occurred_at'),
+            Index(f'ix_{name}_subject', 'subject_type', 'subject_id', 'occurred_at'),
+        )
+    return table
+
+
+def _months(engine, refresh=False):
+    if refresh or engine not in _known:
+        _known[engine] = {name[len(PARTITION_PREFIX):] for name in inspect(engine).get_table_names()
+                          if name.startswith(PARTITION_PREFIX)}
+    return _known[engine]
+
+
+def _month_of(moment):
+    return moment.strftime('%Y%m')
+
+
+# ------------------------------
+# Writing
+# ------------------------------
+def record(action, subject_type=None, subject_id=None, actor=None, **details):
+    """
+    Queue an event. `actor` is (role, id); it defaults to the logged-in user.
+    Extra keyword arguments are stored as JSON details.
+    """
+    global _started
+    if actor is None:
+        if has_request_context() and current_user.is_authenticated:
+            actor = (current_user.role, current_user.id)
+        else:
+            actor = ('system', None)
+    event = {
+        'occurred_at': datetime.utcnow(),
+        'actor_role': actor[0],
+        'actor_id': actor[1],
+        'action': action,
+        'subject_type': subject_type,
+        'subject_id': subject_id,
+        'details': json.dumps(details, default=str) if details else None,
+    }
+    engine = region_engine()
+    with _lock:
+        if not _started:
+            _started = True
+            _settings['batch_size'] = current_app.config.get('AUDIT_BATCH_SIZE', 200)
+            _settings['interval'] = current_app.config.get('AUDIT_FLUSH_INTERVAL', 2.0)
+            _start()
+        buffer = _buffers.setdefault(engine, [])
+        buffer.append(event)
+        if len(buffer) >= _settings['batch_size']:
+            _wake.set()
+
+
+def _start():
+    global _thread
+    if _thread is None:
+        _thread = threading.Thread(target=_run, name='audit-flush', daemon=True)
+        _thread.start()
+        atexit.register(flush)
+
+
+def _run():
+    while True:
+        _wake.wait(_settings['interval'])
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            # Keep the thread alive; the events stay buffered for the next try.
+            pass
+
+
+def flush():
+    """Write buffered events now. Returns the number written."""
+    global _buffers
+    with _flush_lock:
+        with _lock:
+            pending, _buffers = _buffers, {}
+        written = 0
+        failed = None
+        for engine, events in pending.items():
+            by_month = {}
+            for event in events:
+                by_month.setdefault(_month_of(event['occurred_at']), []).append(event)
+            try:
+                with engine.begin() as conn:
+                    for month, rows in by_month.items():
+                        table = _partition(month)
+                        if month not in _months(engine):
+                            table.create(conn, checkfirst=True)
+                        conn.execute(table.insert(), rows)
+            except Exception as error:
+                # Put them back for the next try; other regions still get written.
+                with _lock:
+                    _buffers.setdefault(engine, [])[:0] = events
+                _known.pop(engine, None)  # a month table may have been dropped elsewhere
+                failed = error
+                continue
+            _months(engine).update(by_month)
+            written += len(events)
+        if failed is not None:
+            raise failed
+        return written
+
+
+# ------------------------------
+# Querying
+# ------------------------------
+def query_events(actor_id=None, subject_type=None, subject_id=None, action=None,
+                 start=None, end=None, limit=200, include_archived=False):
+    """
+    Events matching every given filter, newest first. Only the monthly
+    tables overlapping [start, end] are read; archived months are scanned
+    from their files when include_archived is set.
+    """
+    if _started:
+        flush()
+    engine = region_engine()
+    end = end or datetime.utcnow()
+    low = _month_of(start) if start else '000000'
+    high = _month_of(end)
+    live = sorted((m for m in _months(engine, refresh=True) if low <= m <= high), reverse=True)
+    archived = []
+    if include_archived:
+        archived = [m for m in archived_months() if low <= m <= high and m not in live]
+    events = []
+    with engine.connect() as conn:
+        for month in sorted(live + archived, reverse=True):
+            remaining = limit - len(events)
+            if remaining <= 0:
+                break
+            if month in live:
+                table = _partition(month)
+                query = select(table).where(table.c.occurred_at <= end)
+                if start:
+                    query = query.where(table.c.occurred_at >= start)
+                if actor_id is not None:
+                    query = query.where(table.c.actor_id == actor_id)
+                if subject_type:
+                    query = query.where(table.c.subject_type == subject_type)
+                if subject_id is not None:
+                    query = query.where(table.c.subject_id == subject_id)
+                if action:
+                    query = query.where(table.c.action == action)
+                try:
+                    rows = conn.execute(
+                        query.order_by(table.c.occurred_at.desc(), table.c.id.desc()).limit(remaining)
+                    ).mappings().all()
+                except OperationalError:
+                    # Archived by another process since the names were read.
+                    _months(engine).discard(month)
+                    continue
+                events.extend(_decode(dict(row)) for row in rows)
+            else:
+                matches = [
+                    event for event in _read_archive(month)
+                    if (not start or event['occurred_at'] >= start) and event['occurred_at'] <= end
+                    and (actor_id is None or event['actor_id'] == actor_id)
+                    and (not subject_type or event['subject_type'] == subject_type)
+                    and (subject_id is None or event['subject_id'] == subject_id)
+                    and (not action or event['action'] == action)
+                ]
+                matches.sort(key=lambda event: (event['occurred_at'], event['id']), reverse=True)
+                events.extend(matches[:remaining])
+    return events
+
+
+def _decode(event):
+    event['details'] = json.loads(event['details']) if event['details'] else {}
+    return event
+
+
+# ------------------------------
+# Archival
+# ------------------------------
+def _archive_dir():
+    return region_path(current_app.config.get('AUDIT_ARCHIVE_DIR', 'audit_archive'))
+
+
+def _archive_path(month):
+    return os.path.join(_archive_dir(), f'{PARTITION_PREFIX}{month}.jsonl.gz')
+
+
+def archived_months():
+    directory = _archive_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[len(PARTITION_PREFIX):-len('.jsonl.gz')] for name in os.listdir(directory)
+                  if name.startswith(PARTITION_PREFIX) and name.endswith('.jsonl.gz'))
+
+
+def _read_archive(month):
+    with gzip.open(_archive_path(month), 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            event = json.loads(line)
+            event['occurred_at'] = datetime.fromisoformat(event['occurred_at'])
+            yield _decode(event)
+
+
+def archive_partitions(keep_months=12, today=None, batch_size=5000):
+    """
+    Move every month older than the last `keep_months` into a gzipped file
+    under AUDIT_ARCHIVE_DIR and drop its table. Returns [(month, rows), ...].
+    """
+    if _started:
+        flush()
+    today = today or datetime.utcnow()
+    index = today.year * 12 + today.month - 1 - keep_months
+    cutoff = f'{index // 12:04d}{index % 12 + 1:02d}'
+    engine = region_engine()
+    os.makedirs(_archive_dir(), exist_ok=True)
+    archived = []
+    for month in sorted(m for m in _months(engine, refresh=True) if m <= cutoff):
+        table = _partition(month)
+        path = _archive_path(month)
+        if os.path.exists(path):
+            raise RuntimeError(f'{path} already exists; refusing to overwrite an archive.')
+        count = 0
+        with engine.connect() as conn, gzip.open(path + '.part', 'wt', encoding='utf-8') as out:
+            result = conn.execution_options(yield_per=batch_size).execute(select(table).order_by(table.c.id))
+            for row in result.mappings():
+                out.write(json.dumps(dict(row), default=datetime.isoformat) + '\n')
+                count += 1
+        os.replace(path + '.part', path)
+        with engine.begin() as conn:
+            table.drop(conn)
+        _metadata.remove(table)
+        _months(engine).discard(month)
+        archived.append((month, count))
+    return archived
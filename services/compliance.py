@@ -0,0 +1,198 @@
+from models import User, Child, Upload, ArchivedUpload, ComplianceStatus, db
+from services.scheduler import VISIT_INTERVAL_DAYS
+from services.archive import last_completed_visits
+from sqlalchemy import select, insert, delete, func, literal
+from datetime import datetime, date, timedelta
+
+# ------------------------------
+# Compliance Index
+# ------------------------------
+# compliance_status holds, per child and category, the last verified report
+# and the date the next one falls due, so "who is overdue" is an indexed
+# range query instead of a scan over every upload. Rows are kept current by
+# the record_* hooks (called inside the triggering request's transaction)
+# and can be recomputed from scratch with rebuild_compliance().
+
+REPORT_CATEGORIES = ('health', 'vaccination', 'school')
+VISIT_CATEGORY = 'visit'
+CATEGORIES = REPORT_CATEGORIES + (VISIT_CATEGORY,)
+
+# Upload.upload_type values (as posted by parent/uploads.html) that count
+# towards each monthly category.
+UPLOAD_TYPE_CATEGORY = {
+    'health': 'health',
+    'health_report': 'health',
+    'vaccination': 'vaccination',
+    'school': 'school',
+    'education_report': 'school',
+}
+
+
+def _to_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _start_date(adoption_date, created_at):
+    return _to_date(adoption_date) or _to_date(created_at) or datetime.now().date()
+
+
+def next_due(category, last_date, start_date):
+    """
+    Monthly reports are due from the first day of the month after the last
+    verified one; home visits one quarter after the last completed visit.
+    Without any history the child is due from their adoption date.
+    """
+    if last_date is None:
+        return start_date
+    if category == VISIT_CATEGORY:
+        return last_date + timedelta(days=VISIT_INTERVAL_DAYS)
+    if last_date.month == 12:
+        return date(last_date.year + 1, 1, 1)
+    return date(last_date.year, last_date.month + 1, 1)
+
+
+def _get_row(child, category):
+    row = db.session.get(ComplianceStatus, (child.id, category))
+    if row is None:
+        row = ComplianceStatus(
+            child_id=child.id,
+            category=category,
+            parent_id=child.parent_id,
+            next_due_date=next_due(category, None, _start_date(child.adoption_date, child.created_at))
+        )
+        db.session.add(row)
+    return row
+
+
+# ------------------------------
+# Incremental Hooks
+# ------------------------------
+def record_child(child):
+    """A child was added; start tracking every category (child must be flushed)."""
+    for category in CATEGORIES:
+        _get_row(child, category)
+
+
+def record_upload(upload):
+    """A new report was submitted (still pending verification)."""
+    category = UPLOAD_TYPE_CATEGORY.get(upload.upload_type)
+    if category is None:
+        return
+    row = _get_row(db.session.get(Child, upload.child_id), category)
+    row.last_uploaded_at = upload.upload_date or datetime.utcnow()
+
+
+def record_verification(upload):
+    """An upload was verified or rejected; only verified ones move the due date."""
+    category = UPLOAD_TYPE_CATEGORY.get(upload.upload_type)
+    if category is None or upload.status != 'verified':
+        return
+    child = upload.child
+    row = _get_row(child, category)
+    report_date = _to_date(upload.upload_date) or datetime.now().date()
+    if row.last_verified_date is None or report_date > row.last_verified_date:
+        row.last_verified_date = report_date
+        row.next_due_date = next_due(category, report_date,
+                                     _start_date(child.adoption_date, child.created_at))
+
+
+def record_visit_completed(visit):
+    """A home visit was completed; it counts for every child in the family."""
+    for child in Child.query.filter_by(parent_id=visit.parent_id).all():
+        row = _get_row(child, VISIT_CATEGORY)
+        if row.last_verified_date is None or visit.visit_date > row.last_verified_date:
+            row.last_verified_date = visit.visit_date
+            row.next_due_date = next_due(VISIT_CATEGORY, visit.visit_date,
+                                         _start_date(child.adoption_date, child.created_at))
+
+
+def seed_children(*criteria):
+    """
+    Start tracking every category for the children matching `criteria`
+    (bulk counterpart of record_child), with INSERT ... SELECT so no rows
+    pass through Python.
+    """
+    today = datetime.now().date()
+    for category in CATEGORIES:
+        db.session.execute(
+            insert(ComplianceStatus).from_select(
+                ['child_id', 'category', 'parent_id', 'next_due_date', 'updated_at'],
+                select(Child.id, literal(category), Child.parent_id,
+                       func.coalesce(Child.adoption_date, today), literal(datetime.utcnow()))
+                .where(*criteria)
+            )
+        )
+
+
+# ------------------------------
+# Full Rebuild
+# ------------------------------
+def rebuild_compliance(batch_size=5000):
+    """Recompute every row from uploads and visits (hot and archived) using grouped queries."""
+    verified = {}
+    uploaded = {}
+    for model in (Upload, ArchivedUpload):
+        for child_id, upload_type, status, last in db.session.execute(
+            select(model.child_id, model.upload_type, model.status, func.max(model.upload_date))
+            .where(model.upload_type.in_(UPLOAD_TYPE_CATEGORY))
+            .group_by(model.child_id, model.upload_type, model.status)
+        ):
+            key = (child_id, UPLOAD_TYPE_CATEGORY[upload_type])
+            uploaded[key] = max(uploaded.get(key, last), last)
+            if status == 'verified':
+                last = _to_date(last)
+                verified[key] = max(verified.get(key, last), last)
+
+    visited = last_completed_visits()
+
+    now = datetime.utcnow()
+    rows = []
+    for child_id, parent_id, adoption_date, created_at in db.session.execute(
+        select(Child.id, Child.parent_id, Child.adoption_date, Child.created_at)
+    ):
+        start = _start_date(adoption_date, created_at)
+        for category in REPORT_CATEGORIES:
+            last = verified.get((child_id, category))
+            rows.append({
+                'child_id': child_id,
+                'category': category,
+                'parent_id': parent_id,
+                'last_verified_date': last,
+                'last_uploaded_at': uploaded.get((child_id, category)),
+                'next_due_date': next_due(category, last, start),
+                'updated_at': now
+            })
+        last = visited.get(parent_id)
+        rows.append({
+            'child_id': child_id,
+            'category': VISIT_CATEGORY,
+            'parent_id': parent_id,
+            'last_verified_date': last,
+            'last_uploaded_at': None,
+            'next_due_date': next_due(VISIT_CATEGORY, last, start),
+            'updated_at': now
+        })
+
+    db.session.execute(delete(ComplianceStatus))
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(ComplianceStatus), rows[start:start + batch_size])
+    db.session.commit()
+    return len(rows)
+
+
+# ------------------------------
+# Overdue View
+# ------------------------------
+def overdue_items(staff_id=None, category=None, today=None):
+    """
+    Compliance rows whose next due date has passed, oldest first. Pass a
+    staff id to restrict to one mentor's parents.
+    """
+    today = today or datetime.now().date()
+    query = ComplianceStatus.query.filter(ComplianceStatus.next_due_date <= today)
+    if staff_id is not None:
+        query = query.join(User, User.id == ComplianceStatus.parent_id).filter(User.staff_id == staff_id)
+    if category:
+        query = query.filter(ComplianceStatus.category == category)
+    return query.options(db.joinedload(ComplianceStatus.child).joinedload(Child.parent).joinedload(User.mentor)) \
+        .order_by(ComplianceStatus.next_due_date.asc()).all()
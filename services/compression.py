@@ -0,0 +1,93 @@
+from flask import current_app, request
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# ------------------------------
+# Response Compression
+# ------------------------------
+# HTML, JSON, CSS, JS and CSV responses of at least COMPRESS_MIN_SIZE bytes
+# are compressed with brotli (when the module is installed and the browser
+# accepts it) or gzip. The long unpaginated list pages shrink by roughly
+# an order of magnitude.
+#
+# Streamed responses are compressed as they are produced, with a sync flush
+# every STREAM_FLUSH_BYTES of input, so the browser still receives a long
+# page progressively without every tiny chunk costing a flush.
+# Responses sent from files (send_file) pass through untouched.
+# Server-Sent Events are excluded by mimetype.
+
+COMPRESS_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+                      'application/javascript', 'application/json', 'image/svg+xml')
+STREAM_FLUSH_BYTES = 8 * 1024
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding, config):
+    """(compress(chunk) -> bytes, flush() -> bytes, finish() -> bytes) for `encoding`."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config.get('COMPRESS_BROTLI_QUALITY', 4))
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(config.get('COMPRESS_LEVEL', 6), zlib.DEFLATED, 31)  # 31: gzip container
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _stream(chunks, encoding, config):
+    compress, flush, finish = _compressor(encoding, config)
+    pending = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            output = compress(chunk)
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_BYTES:
+                output += flush()
+                pending = 0
+            if output:
+                yield output
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    config = current_app.config
+    if (not config.get('COMPRESS_RESPONSES', True)
+            or response.direct_passthrough
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, encoding, config)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config.get('COMPRESS_MIN_SIZE', 500):
+            return response
+        compress, _, finish = _compressor(encoding, config)
+        response.set_data(compress(data) + finish())
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
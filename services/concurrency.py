@@ -0,0 +1,43 @@
+from sqlalchemy.orm.exc import StaleDataError
+
+# ------------------------------
+# Optimistic Concurrency
+# ------------------------------
+# Upload, Visit and User carry a `version` counter (the mapper's
+# version_id_col), so every ORM update is a compare-and-swap:
+# UPDATE ... SET version = version + 1 WHERE id = :id AND version = :seen.
+# If someone else committed first no row matches and SQLAlchemy raises
+# StaleDataError instead of overwriting their change.
+#
+# That covers two requests racing on the server. Edit forms also post back
+# the version they were rendered with, and check_version() rejects a
+# submission made against an older one, which catches the common case of
+# two people having the same record open. Nothing is locked while a form is
+# open or a request runs; the loser gets an error at once (see the handler
+# in app.py) and the winner pays nothing extra.
+#
+# Bulk UPDATEs with a WHERE clause bypass the mapper, so they bump
+# `version` themselves; bulk updates by primary key pass the version they
+# read, like any other ORM update.
+
+CONFLICT_MESSAGE = ('Someone else changed this record while you had it open, so your changes were not saved. '
+                    'Please review the latest version and try again.')
+
+
+class ConflictError(Exception):
+    """The record changed after the submitted form was rendered."""
+
+
+def check_version(record, submitted):
+    """Raise ConflictError unless `submitted` (a form value) matches `record.version`."""
+    if submitted is None:
+        return  # forms rendered before versions existed
+    try:
+        current = int(submitted) == record.version
+    except ValueError:
+        current = False
+    if not current:
+        raise ConflictError(CONFLICT_MESSAGE)
+
+
+CONFLICTS = (ConflictError, StaleDataError)
@@ -0,0 +1,238 @@
+from flask import current_app
+from models import (User, Staff, Child, Upload, Visit, Guidance, Attachment, ArchivedUpload, ArchivedVisit,
+                    GrowthMeasurement, ComplianceStatus, VisitSchedule, OutboxMessage, db)
+from services.archive import _still_referenced
+from sqlalchemy import select, update, delete, case, func, or_, and_, false
+from datetime import datetime, timedelta
+import heapq
+import os
+
+# ------------------------------
+# Deletion
+# ------------------------------
+# Deleting a staff member, parent or guidance item only sets deleted_at.
+# models.SoftDelete hides the row from every query from then on (partial
+# indexes cover the "deleted_at IS NULL" lists), so the admin action is a
+# few UPDATEs and returns at once. Emails are released so the address can
+# register again; staff and parent IDs are never reused.
+#
+# delete_staff() hands the staff member's parents to the least-loaded
+# colleagues with room under max_parents in one bulk update and moves their
+# scheduled visits along. Parents nobody can take are left unassigned and
+# their scheduled visits cancelled. delete_parent() also hides the
+# children, cancels scheduled visits and pending notifications, and drops
+# the family's compliance and visit schedule rows.
+#
+# compact_deleted() (`flask compact-deleted`, nightly) hard-deletes what was
+# deleted more than DELETED_RETENTION_DAYS ago, in batches: a parent with
+# their children, uploads, visits and measurements, then their files; a
+# guidance item, then its file. A staff member stays as a tombstone while
+# any visit or review still points at them, so history keeps their name.
+# Files already packed into archive bundles stay in the bundle.
+
+HIDDEN = {'include_deleted': True}
+
+
+def _bury(row, now):
+    row.deleted_at = now
+    row.email = f'{row.email} (deleted {row.id})'
+
+
+def _rebalance(parent_ids, exclude):
+    """[{'id': parent, 'staff_id': staff}] giving each parent to the least-loaded staff member with room."""
+    load = dict(db.session.execute(
+        select(User.staff_id, func.count())
+        .where(User.role == 'parent', User.staff_id.isnot(None))
+        .group_by(User.staff_id)
+    ).all())
+    heap = [(load.get(pk, 0), pk, limit or 10) for pk, limit in db.session.execute(
+        select(Staff.id, Staff.max_parents).where(Staff.id != exclude)
+    )]
+    heap = [entry for entry in heap if entry[0] < entry[2]]
+    heapq.heapify(heap)
+    moves = []
+    for parent_id in parent_ids:
+        if not heap:
+            break
+        count, staff_id, limit = heapq.heappop(heap)
+        moves.append({'id': parent_id, 'staff_id': staff_id})
+        if count + 1 < limit:
+            heapq.heappush(heap, (count + 1, staff_id, limit))
+    return moves
+
+
+def delete_staff(staff, now=None):
+    """Soft-delete `staff` and reassign their parents and scheduled visits. The caller commits."""
+    now = now or datetime.utcnow()
+    versions = dict(db.session.execute(
+        select(User.id, User.version).where(User.role == 'parent', User.staff_id == staff.id).order_by(User.id)
+    ).all())
+    parent_ids = list(versions)
+    moves = _rebalance(parent_ids, staff.id)
+    unassigned = parent_ids[len(moves):]
+
+    if moves:
+        # By primary key with the version read above, so a parent edited meanwhile raises StaleDataError.
+        db.session.execute(update(User), [dict(move, version=versions[move['id']]) for move in moves])
+    if unassigned:
+        db.session.execute(update(User).where(User.id.in_(unassigned))
+                           .values(staff_id=None, version=User.version + 1))
+        db.session.execute(
+            update(Visit)
+            .where(Visit.staff_id == staff.id, Visit.status == 'scheduled', Visit.parent_id.in_(unassigned))
+            .values(status='cancelled', version=Visit.version + 1)
+        )
+    moved_visits = db.session.execute(
+        update(Visit)
+        .where(Visit.staff_id == staff.id, Visit.status == 'scheduled')
+        .values(staff_id=select(User.staff_id).where(User.id == Visit.parent_id).scalar_subquery(),
+                version=Visit.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    received = {move['staff_id'] for move in moves}
+    if received:
+        db.session.execute(
+            update(Staff)
+            .where(Staff.id.in_(received))
+            .values(assigned_parent_count=select(func.count()).where(
+                User.role == 'parent', User.staff_id == Staff.id).scalar_subquery())
+            .execution_options(synchronize_session=False)
+        )
+
+    # Staff sign in through a matching 'staff' user row; hide it too.
+    login = User.query.filter_by(email=staff.email, role='staff').first()
+    if login:
+        _bury(login, now)
+    _bury(staff, now)
+    staff.assigned_parent_count = 0
+    return {'reassigned': len(moves), 'unassigned': len(unassigned), 'visits_moved': moved_visits}
+
+
+def delete_parent(parent, now=None):
+    """Soft-delete `parent` and their children; cancel what was scheduled for them. The caller commits."""
+    now = now or datetime.utcnow()
+    db.session.execute(
+        update(Child).where(Child.parent_id == parent.id, Child.deleted_at.is_(None)).values(deleted_at=now)
+    )
+    db.session.execute(
+        update(Visit).where(Visit.parent_id == parent.id, Visit.status == 'scheduled')
+        .values(status='cancelled', version=Visit.version + 1)
+    )
+    # Not soft-deleted themselves: the overdue list would keep showing the children.
+    for model in (ComplianceStatus, VisitSchedule):
+        db.session.execute(delete(model).where(model.parent_id == parent.id))
+    recipients = [value for value in (parent.email, parent.phone) if value]
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.status == 'pending', OutboxMessage.recipient.in_(recipients))
+        .values(status='failed', last_error='Recipient deleted')
+    )
+    if parent.staff_id:
+        db.session.execute(
+            update(Staff).where(Staff.id == parent.staff_id).values(assigned_parent_count=case(
+                (Staff.assigned_parent_count > 0, Staff.assigned_parent_count - 1), else_=0))
+        )
+        parent.staff_id = None
+    _bury(parent, now)
+
+
+def delete_guidance(guidance, now=None):
+    """Soft-delete `guidance`; its file goes at the next compaction. The caller commits."""
+    guidance.deleted_at = now or datetime.utcnow()
+
+
+def _remove_files(paths):
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    removed = 0
+    for path in paths:
+        source = os.path.join(upload_folder, path)
+        if os.path.isfile(source):
+            os.remove(source)
+            removed += 1
+    return removed
+
+
+def _purge_parents(parent_ids):
+    """Hard-delete parents and everything of theirs; returns (children, files removed)."""
+    child_ids = db.session.execute(
+        select(Child.id).where(Child.parent_id.in_(parent_ids)).execution_options(**HIDDEN)
+    ).scalars().all()
+    uploads = db.session.execute(
+        select(Upload.id, Upload.file_path).where(Upload.parent_id.in_(parent_ids))
+    ).all()
+    upload_ids = [row.id for row in uploads]
+    visit_ids = db.session.execute(select(Visit.id).where(Visit.parent_id.in_(parent_ids))).scalars().all()
+    archived_upload_ids = db.session.execute(
+        select(ArchivedUpload.id).where(ArchivedUpload.parent_id.in_(parent_ids))).scalars().all()
+    archived_visit_ids = db.session.execute(
+        select(ArchivedVisit.id).where(ArchivedVisit.parent_id.in_(parent_ids))).scalars().all()
+
+    owned = or_(false(), *[
+        and_(Attachment.owner_type == kind, Attachment.owner_id.in_(ids))
+        for kind, ids in (('upload', upload_ids), ('visit', visit_ids), ('archived_upload', archived_upload_ids),
+                          ('archived_visit', archived_visit_ids)) if ids
+    ])
+    paths = {row.file_path for row in uploads} | set(db.session.execute(
+        select(Attachment.file_path).where(owned, Attachment.owner_type.in_(('upload', 'visit')))
+    ).scalars())
+
+    db.session.execute(delete(Attachment).where(owned))
+    db.session.execute(delete(GrowthMeasurement).where(GrowthMeasurement.child_id.in_(child_ids)))
+    for model in (ComplianceStatus, VisitSchedule, Upload, ArchivedUpload, Visit, ArchivedVisit, Child):
+        db.session.execute(delete(model).where(model.parent_id.in_(parent_ids)))
+    db.session.execute(delete(User).where(User.id.in_(parent_ids)))
+    db.session.commit()
+    return len(child_ids), _remove_files(paths - _still_referenced(paths))
+
+
+def compact_deleted(after_days=None, batch_size=500, now=None):
+    """
+    Hard-delete guidance, parents and staff soft-deleted more than `after_days`
+    (default DELETED_RETENTION_DAYS) ago, and remove their files. Returns counts.
+    """
+    if after_days is None:
+        after_days = current_app.config.get('DELETED_RETENTION_DAYS', 30)
+    cutoff = (now or datetime.utcnow()) - timedelta(days=after_days)
+    stats = {'guidance': 0, 'parents': 0, 'children': 0, 'staff': 0, 'files': 0}
+
+    while True:
+        rows = db.session.execute(
+            select(Guidance.id, Guidance.file_url).where(Guidance.deleted_at < cutoff)
+            .limit(batch_size).execution_options(**HIDDEN)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(delete(Guidance).where(Guidance.id.in_([row.id for row in rows])))
+        db.session.commit()
+        paths = {row.file_url for row in rows if row.file_url}
+        shared = set(db.session.execute(
+            select(Guidance.file_url).where(Guidance.file_url.in_(paths)).execution_options(**HIDDEN)
+        ).scalars())
+        stats['guidance'] += len(rows)
+        stats['files'] += _remove_files(paths - shared)
+
+    while True:
+        parent_ids = db.session.execute(
+            select(User.id).where(User.role == 'parent', User.deleted_at < cutoff)
+            .limit(batch_size).execution_options(**HIDDEN)
+        ).scalars().all()
+        if not parent_ids:
+            break
+        children, files = _purge_parents(parent_ids)
+        stats['parents'] += len(parent_ids)
+        stats['children'] += children
+        stats['files'] += files
+
+    # Staff login rows own nothing; staff records go once nothing refers to them.
+    db.session.execute(delete(User).where(User.role == 'staff', User.deleted_at < cutoff))
+    referenced = select(Visit.staff_id).union(
+        select(ArchivedVisit.staff_id),
+        select(Upload.verified_by).where(Upload.verified_by.isnot(None)),
+        select(ArchivedUpload.verified_by).where(ArchivedUpload.verified_by.isnot(None)),
+        select(User.staff_id).where(User.staff_id.isnot(None)),
+    )
+    stats['staff'] = db.session.execute(
+        delete(Staff).where(Staff.deleted_at < cutoff, Staff.id.not_in(referenced))
+    ).rowcount
+    db.session.commit()
+    return stats
@@ -0,0 +1,178 @@
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from services.tenancy import active_region
+from collections import deque
+import json
+import sqlite3
+import threading
+import time
+
+# ------------------------------
+# Live Events
+# ------------------------------
+# Routes publish small events to a channel after their commit, e.g. 'user:12'
+# (one person) or 'staff:3' (a mentor). Browsers subscribe over Server-Sent
+# Events with a signed token naming their channels, so each user only ever
+# receives their own events.
+#
+# EVENTS_BUS selects the bus, like RATELIMIT_STORAGE does for counters:
+# 'memory' (single process; fine for the dev server) or
+# 'sqlite:///path/to/events.db', a shared append-only log every process can
+# publish to and sse_server.py fans out from. The SQLite bus is the local
+# stand-in for a pub/sub broker when running several workers.
+#
+# Every event has an increasing id, so a reconnecting EventSource resumes
+# from Last-Event-ID without missing anything still in the log.
+
+HEARTBEAT_SECONDS = 15
+
+
+class MemoryBus:
+    """In-process ring buffer of recent events."""
+
+    def __init__(self, history=1000):
+        self._events = deque(maxlen=history)
+        self._last_id = 0
+        self._changed = threading.Condition()
+
+    def publish(self, channel, event, data):
+        with self._changed:
+            self._last_id += 1
+            self._events.append((self._last_id, channel, event, json.dumps(data, default=str)))
+            self._changed.notify_all()
+            return self._last_id
+
+    def last_id(self):
+        return self._last_id
+
+    def since(self, last_id, channels=None, limit=500):
+        with self._changed:
+            events = [e for e in self._events if e[0] > last_id and (channels is None or e[1] in channels)]
+        return events[:limit]
+
+    def wait(self, last_id, timeout):
+        with self._changed:
+            self._changed.wait_for(lambda: self._last_id > last_id, timeout)
+
+
+class SQLiteBus:
+    """Append-only event log in a SQLite file shared by every process."""
+
+    def __init__(self, path, retention=3600, poll_interval=0.25):
+        self.path = path
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._published = 0
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS events ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, event TEXT, data TEXT, created REAL)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def publish(self, channel, event, data):
+        conn = self._connect()
+        cursor = conn.execute(
+            'INSERT INTO events (channel, event, data, created) VALUES (?, ?, ?, ?)',
+            (channel, event, json.dumps(data, default=str), time.time())
+        )
+        self._published += 1
+        if self._published % 500 == 0:
+            conn.execute('DELETE FROM events WHERE created < ?', (time.time() - self.retention,))
+        return cursor.lastrowid
+
+    def last_id(self):
+        return self._connect().execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def since(self, last_id, channels=None, limit=500):
+        conn = self._connect()
+        if channels is None:
+            return conn.execute(
+                'SELECT id, channel, event, data FROM events WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, limit)
+            ).fetchall()
+        channels = list(channels)
+        return conn.execute(
+            f"SELECT id, channel, event, data FROM events WHERE id > ? "
+            f"AND channel IN ({', '.join('?' * len(channels))}) ORDER BY id LIMIT ?",
+            (last_id, *channels, limit)
+        ).fetchall()
+
+    def wait(self, last_id, timeout):
+        deadline = time.monotonic() + timeout
+        while self.last_id() <= last_id and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+
+
+def make_bus(setting, **options):
+    if setting.startswith('sqlite:///'):
+        return SQLiteBus(setting[len('sqlite:///'):], **options)
+    return MemoryBus()
+
+
+def bus():
+    instance = current_app.extensions.get('events')
+    if instance is None:
+        instance = make_bus(current_app.config.get('EVENTS_BUS', 'memory'))
+        current_app.extensions['events'] = instance
+    return instance
+
+
+def publish(channel, event, **data):
+    """Send `event` to everyone subscribed to `channel`. Call after commit."""
+    if not current_app.config.get('EVENTS_ENABLED', True):
+        return None
+    try:
+        return bus().publish(_regional(channel), event, data)
+    except sqlite3.Error:
+        # A missed live update must never fail the request that caused it.
+        current_app.logger.exception('Could not publish %s to %s', event, channel)
+        return None
+
+
+def format_event(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {data}\n\n'
+
+
+# ------------------------------
+# Subscriptions
+# ------------------------------
+def _regional(channel):
+    # Ids repeat across regional databases, so channels carry the region.
+    region = active_region()
+    return f'{region}/{channel}' if region else channel
+
+
+def channels_for(user):
+    """Channels a logged-in user may listen to."""
+    channels = [f'user:{user.id}']
+    if user.role == 'staff':
+        from models import Staff
+        staff = Staff.query.filter_by(email=user.email).first()
+        if staff:
+            channels.append(f'staff:{staff.id}')
+    return [_regional(channel) for channel in channels]
+
+
+def _serializer(secret_key):
+    return URLSafeTimedSerializer(secret_key, salt='events-subscribe')
+
+
+def subscribe_token(user):
+    return _serializer(current_app.config['SECRET_KEY']).dumps(channels_for(user))
+
+
+def channels_from_token(token, secret_key, max_age):
+    """Channels in a valid token, or None."""
+    try:
+        return _serializer(secret_key).loads(token, max_age=max_age)
+    except BadSignature:
+        return None
@@ -0,0 +1,192 @@
+from models import Child, GrowthMeasurement, db
+from sqlalchemy import select, func
+from functools import lru_cache
+import csv
+import os
+import numpy as np
+
+# ------------------------------
+# Growth Analytics
+# ------------------------------
+# Age-adjusted z-scores and percentiles using the LMS method:
+#   z = ((value / M) ** L - 1) / (L * S)     (L != 0)
+#   z = ln(value / M) / S                    (L == 0)
+# with L, M, S linearly interpolated by age from data/growth_reference.csv.
+# Everything works on whole NumPy arrays so a cohort of tens of thousands of
+# children is scored in a handful of array operations.
+#
+# The bundled table is a coarse approximation of the WHO child growth
+# standards (height to 18y, weight to 10y, head circumference to 5y); ages
+# outside a table's range score as NaN rather than being extrapolated.
+
+REFERENCE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'data', 'growth_reference.csv')
+MEASURES = {
+    'height': 'height_cm',
+    'weight': 'weight_kg',
+    'head': 'head_circumference_cm',
+}
+SEXES = {'male': 1, 'female': 2}
+AGE_BANDS = [(0, 12, '0-1 years'), (12, 24, '1-2 years'), (24, 60, '2-5 years'),
+             (60, 120, '5-10 years'), (120, 216, '10-18 years')]
+DAYS_PER_MONTH = 30.4375
+
+
+@lru_cache(maxsize=None)
+def load_reference():
+    """Return {(measure, sex_code): (ages, L, M, S)} as sorted float arrays."""
+    rows = {}
+    with open(REFERENCE_FILE, newline='') as handle:
+        for row in csv.DictReader(handle):
+            key = (row['measure'], SEXES[row['sex']])
+            rows.setdefault(key, []).append(
+                (float(row['age_months']), float(row['L']), float(row['M']), float(row['S']))
+            )
+    return {key: tuple(np.array(col) for col in zip(*sorted(values))) for key, values in rows.items()}
+
+
+def sex_codes(genders):
+    """Map Child.gender strings to 1 (male), 2 (female) or 0 (unscored)."""
+    return np.array([SEXES.get((g or '').lower(), 0) for g in genders], dtype=np.int8)
+
+
+def zscores(measure, sex, age_months, values):
+    """
+    Vectorised LMS z-scores for one measure. `sex`, `age_months` and
+    `values` are equal-length arrays; missing inputs give NaN.
+    """
+    sex = np.asarray(sex)
+    age_months = np.asarray(age_months, dtype=float)
+    values = np.asarray(values, dtype=float)
+    L = np.full(values.shape, np.nan)
+    M = np.full(values.shape, np.nan)
+    S = np.full(values.shape, np.nan)
+
+    for (ref_measure, ref_sex), (ages, ref_l, ref_m, ref_s) in load_reference().items():
+        if ref_measure != measure:
+            continue
+        mask = (sex == ref_sex) & (age_months >= ages[0]) & (age_months <= ages[-1])
+        L[mask] = np.interp(age_months[mask], ages, ref_l)
+        M[mask] = np.interp(age_months[mask], ages, ref_m)
+        S[mask] = np.interp(age_months[mask], ages, ref_s)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = values / M
+        box_cox = np.abs(L) > 1e-6
+        return np.where(box_cox,
+                        (np.power(ratio, L) - 1) / (L * S),
+                        np.log(ratio) / S)
+
+
+def percentiles(z):
+    """Standard normal CDF of z-scores, as percentiles (0-100)."""
+    # Abramowitz & Stegun 7.1.26 erf approximation (|error| < 1.5e-7).
+    x = np.asarray(z, dtype=float) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * np.abs(x))
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = np.sign(x) * (1.0 - poly * np.exp(-x * x))
+    return 50.0 * (1.0 + erf)
+
+
+def _age_in_months(measured_on, dob):
+    measured = np.array(measured_on, dtype='datetime64[D]')
+    born = np.array(dob, dtype='datetime64[D]')
+    return (measured - born).astype(float) / DAYS_PER_MONTH
+
+
+def latest_measurements():
+    """
+    Latest measurement per child as a dict of NumPy arrays. One grouped
+    query finds each child's latest date (served from the child/date index)
+    and is joined back for the values; dates come back as ISO strings so
+    NumPy can parse them in bulk.
+    """
+    latest = select(
+        GrowthMeasurement.child_id,
+        func.max(GrowthMeasurement.measured_on).label('measured_on')
+    ).group_by(GrowthMeasurement.child_id).subquery()
+    rows = db.session.execute(
+        select(GrowthMeasurement.child_id,
+               db.cast(GrowthMeasurement.measured_on, db.String),
+               GrowthMeasurement.height_cm,
+               GrowthMeasurement.weight_kg,
+               GrowthMeasurement.head_circumference_cm,
+               db.cast(Child.dob, db.String),
+               Child.gender)
+        .join(latest, (latest.c.child_id == GrowthMeasurement.child_id)
+              & (latest.c.measured_on == GrowthMeasurement.measured_on))
+        .join(Child, Child.id == GrowthMeasurement.child_id)
+        .where(Child.dob.isnot(None))
+        .order_by(GrowthMeasurement.child_id, GrowthMeasurement.id.desc())
+    ).all()
+
+    columns = list(zip(*rows)) if rows else [()] * 7
+    child_id = np.array(columns[0], dtype=np.int64)
+    # Two measurements on the same latest day: keep the newest row.
+    keep = np.ones(len(child_id), dtype=bool)
+    keep[1:] = child_id[1:] != child_id[:-1]
+    data = {
+        'child_id': child_id,
+        'age_months': _age_in_months(columns[1], columns[5]),
+        'sex': sex_codes(columns[6]),
+        'height': np.array(columns[2], dtype=float),
+        'weight': np.array(columns[3], dtype=float),
+        'head': np.array(columns[4], dtype=float),
+    }
+    return {key: values[keep] for key, values in data.items()}
+
+
+def score_latest():
+    """Latest measurement per child plus '<measure>_z' and '<measure>_pct' arrays."""
+    data = latest_measurements()
+    for measure in MEASURES:
+        z = zscores(measure, data['sex'], data['age_months'], data[measure])
+        data[f'{measure}_z'] = z
+        data[f'{measure}_pct'] = percentiles(z)
+    return data
+
+
+def cohort_summary():
+    """
+    Per sex and age band: number of children, mean z-score and the share
+    below -2 SD / above +2 SD for each measure.
+    """
+    data = score_latest()
+    edges = np.array([band[0] for band in AGE_BANDS] + [AGE_BANDS[-1][1]], dtype=float)
+    band = np.digitize(data['age_months'], edges) - 1
+    in_range = (band >= 0) & (band < len(AGE_BANDS)) & (data['sex'] > 0)
+    # One flat group index per (sex, band) so bincount can aggregate in a pass.
+    group = np.where(in_range, (data['sex'].astype(np.int64) - 1) * len(AGE_BANDS) + band, -1)
+    groups = 2 * len(AGE_BANDS)
+    keep = group >= 0
+    children = np.bincount(group[keep], minlength=groups)
+
+    stats = {}
+    for measure in MEASURES:
+        z = data[f'{measure}_z']
+        scored = keep & ~np.isnan(z)
+        idx = group[scored]
+        values = z[scored]
+        count = np.bincount(idx, minlength=groups)
+        total = np.bincount(idx, weights=values, minlength=groups)
+        low = np.bincount(idx, weights=(values < -2), minlength=groups)
+        high = np.bincount(idx, weights=(values > 2), minlength=groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats[measure] = (count, total / count, 100 * low / count, 100 * high / count)
+
+    summary = []
+    for sex_name, sex_code in SEXES.items():
+        for band_index, (_, _, label) in enumerate(AGE_BANDS):
+            g = (sex_code - 1) * len(AGE_BANDS) + band_index
+            if not children[g]:
+                continue
+            row = {'sex': sex_name, 'age_band': label, 'children': int(children[g])}
+            for measure, (count, mean, low, high) in stats.items():
+                row[measure] = {
+                    'count': int(count[g]),
+                    'mean_z': None if not count[g] else round(float(mean[g]), 2),
+                    'pct_below_2sd': None if not count[g] else round(float(low[g]), 1),
+                    'pct_above_2sd': None if not count[g] else round(float(high[g]), 1),
+                }
+            summary.append(row)
+    return summary
@@ -0,0 +1,272 @@
+from flask import current_app
+from models import User, Staff, Child, ImportJob, db
+from services.passwords import hash_many
+from services.compliance import seed_children
+from services.tenancy import active_region, use_region
+from sqlalchemy import select, insert, update, func
+from datetime import date, datetime
+import csv
+import json
+import os
+import random
+import string
+import tempfile
+import threading
+
+# ------------------------------
+# Bulk CSV Import
+# ------------------------------
+# Streams a CSV of staff, parents or children, validates each row against
+# in-memory indexes of existing emails / IDs (loaded once up front), hashes
+# passwords in the shared pool from services.passwords (no pool start-up
+# per import) and inserts each batch with a single executemany. Bad rows
+# are reported with their line number and skipped; good rows in the same
+# batch are still imported.
+#
+# The admin page doesn't wait for the import: start_import() saves the
+# upload and runs it on a background thread, recording progress and the
+# result in an ImportJob row the page polls.
+
+KINDS = {
+    'staff': ('staff_id', 'name', 'email', 'password', 'phone', 'max_parents'),
+    'parents': ('name', 'email', 'password', 'address', 'phone', 'staff_id'),
+    'children': ('parent', 'name', 'dob', 'gender', 'adoption_date', 'background_info'),
+}
+REQUIRED = {
+    'staff': ('staff_id', 'name', 'email', 'password'),
+    'parents': ('name', 'email', 'password'),
+    'children': ('parent', 'name'),
+}
+GENDERS = ('Male', 'Female', 'Other')
+ERRORS_KEPT = 500  # rejected rows stored with a background import
+
+
+def _hash_passwords(passwords):
+    return hash_many(passwords, current_app.config.get('IMPORT_PASSWORD_METHOD'))
+
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+class _Importer:
+    def __init__(self, kind):
+        self.kind = kind
+        self.emails = set()
+        self.staff_codes = {}
+        self.staff_load = {}
+        self.parent_codes = set()
+        self.parents = {}
+        if kind == 'staff':
+            self.emails = {e.lower() for e in db.session.execute(select(Staff.email)).scalars()}
+            self.staff_codes = dict.fromkeys(db.session.execute(
+                select(Staff.staff_id).execution_options(include_deleted=True)).scalars())
+        elif kind == 'parents':
+            self.emails = {e.lower() for e in db.session.execute(select(User.email)).scalars()}
+            for pk, code, count, limit in db.session.execute(
+                select(Staff.id, Staff.staff_id, Staff.assigned_parent_count, Staff.max_parents)
+            ):
+                self.staff_codes[code] = pk
+                self.staff_load[pk] = [count or 0, limit or 10, count or 0]
+            self.parent_codes = set(db.session.execute(
+                select(User.parent_id).where(User.parent_id.isnot(None))
+                .execution_options(include_deleted=True)).scalars())
+        else:
+            for pk, email, code in db.session.execute(
+                select(User.id, User.email, User.parent_id).where(User.role == 'parent')
+            ):
+                self.parents[email.lower()] = pk
+                if code:
+                    self.parents[code] = pk
+
+    def validate(self, row):
+        """Return (values, None) for a good row or (None, error message)."""
+        missing = [field for field in REQUIRED[self.kind] if not row.get(field)]
+        if missing:
+            return None, f"missing {', '.join(missing)}"
+        return getattr(self, f'_validate_{self.kind}')(row)
+
+    def _validate_staff(self, row):
+        email = row['email']
+        if '@' not in email:
+            return None, 'invalid email'
+        if email.lower() in self.emails:
+            return None, f'duplicate email {email}'
+        if row['staff_id'] in self.staff_codes:
+            return None, f"duplicate staff ID {row['staff_id']}"
+        try:
+            max_parents = int(row.get('max_parents') or 10)
+        except ValueError:
+            return None, 'max_parents must be a number'
+        self.emails.add(email.lower())
+        self.staff_codes[row['staff_id']] = None
+        return {
+            'staff_id': row['staff_id'],
+            'name': row['name'],
+            'email': email,
+            'password': row['password'],
+            'phone': row.get('phone') or None,
+            'max_parents': max_parents,
+            'assigned_parent_count': 0,
+        }, None
+
+    def _validate_parents(self, row):
+        email = row['email']
+        if '@' not in email:
+            return None, 'invalid email'
+        if email.lower() in self.emails:
+            return None, f'duplicate email {email}'
+        values = {
+            'name': row['name'],
+            'email': email,
+            'password': row['password'],
+            'address': row.get('address') or None,
+            'phone': row.get('phone') or None,
+            'role': 'parent',
+            'status': 'pending',
+        }
+        code = row.get('staff_id')
+        if code:
+            staff_pk = self.staff_codes.get(code)
+            if staff_pk is None:
+                return None, f'unknown staff ID {code}'
+            load = self.staff_load[staff_pk]
+            if load[0] >= load[1]:
+                return None, f'staff {code} has reached maximum parent limit ({load[1]})'
+            load[0] += 1
+            # Same rule as admin.approve_parent: assigned parents are approved.
+            parent_code = 'PAR' + ''.join(random.choices(string.digits, k=6))
+            while parent_code in self.parent_codes:
+                parent_code = 'PAR' + ''.join(random.choices(string.digits, k=6))
+            self.parent_codes.add(parent_code)
+            values.update(status='approved', staff_id=staff_pk, parent_id=parent_code)
+        self.emails.add(email.lower())
+        return values, None
+
+    def _validate_children(self, row):
+        ref = row['parent'].strip()
+        parent_pk = self.parents.get(ref) or self.parents.get(ref.lower())
+        if parent_pk is None:
+            return None, f'unknown parent {ref}'
+        gender = row.get('gender') or None
+        if gender and gender not in GENDERS:
+            return None, f'gender must be one of {", ".join(GENDERS)}'
+        try:
+            dob = _parse_date(row.get('dob'))
+            adoption_date = _parse_date(row.get('adoption_date'))
+        except ValueError:
+            return None, 'dates must be YYYY-MM-DD'
+        return {
+            'parent_id': parent_pk,
+            'name': row['name'],
+            'dob': dob,
+            'gender': gender,
+            'adoption_date': adoption_date,
+            'background_info': row.get('background_info') or None,
+        }, None
+
+    def write(self, batch):
+        if self.kind in ('staff', 'parents'):
+            hashes = _hash_passwords([values['password'] for values in batch])
+            for values, hashed in zip(batch, hashes):
+                values['password'] = hashed
+        if self.kind == 'staff':
+            db.session.execute(insert(Staff), batch)
+        elif self.kind == 'parents':
+            db.session.execute(insert(User), batch)
+            changed = [{'id': pk, 'assigned_parent_count': load[0]}
+                       for pk, load in self.staff_load.items() if load[0] != load[2]]
+            if changed:
+                db.session.execute(update(Staff), changed)
+                for row in changed:
+                    self.staff_load[row['id']][2] = row['assigned_parent_count']
+        else:
+            # Core insert skips per-row ORM bookkeeping; the batch's shared
+            # created_at stamp then identifies its rows for the compliance seed.
+            created_at = datetime.utcnow()
+            for values in batch:
+                values['created_at'] = created_at
+            last_id = db.session.execute(select(func.max(Child.id))).scalar() or 0
+            db.session.execute(Child.__table__.insert(), batch)
+            seed_children(Child.id > last_id, Child.created_at == created_at)
+        db.session.commit()
+
+
+def import_csv(kind, stream, batch_size=1000, progress=None):
+    """
+    Import rows of `kind` ('staff', 'parents' or 'children') from a text
+    stream. Returns {'imported': n, 'errors': [(line, message), ...]}.
+    `progress(imported, errors)` is called after every batch.
+    """
+    if kind not in KINDS:
+        raise ValueError(f'Unknown import type {kind!r}.')
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        return {'imported': 0, 'errors': [(1, 'file is empty')]}
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = [field for field in REQUIRED[kind] if field not in reader.fieldnames]
+    if missing:
+        return {'imported': 0, 'errors': [(1, f"missing column(s): {', '.join(missing)}")]}
+
+    importer = _Importer(kind)
+    imported = 0
+    errors = []
+    batch = []
+    for row in reader:
+        row = {key: (value or '').strip() for key, value in row.items() if key}
+        values, error = importer.validate(row)
+        if error:
+            errors.append((reader.line_num, error))
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            importer.write(batch)
+            imported += len(batch)
+            batch = []
+            if progress:
+                progress(imported, errors)
+    if batch:
+        importer.write(batch)
+        imported += len(batch)
+    return {'imported': imported, 'errors': errors}
+
+
+# ------------------------------
+# Background Imports (admin page)
+# ------------------------------
+def start_import(kind, file, user_id, batch_size=200):
+    """Save the uploaded CSV and import it on a background thread. Returns the ImportJob."""
+    job = ImportJob(kind=kind, filename=file.filename, created_by=user_id, status='running')
+    db.session.add(job)
+    db.session.commit()
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(handle, 'wb') as out:
+        file.save(out)
+    threading.Thread(
+        target=_run_import, name=f'import-{job.id}', daemon=True,
+        args=(current_app._get_current_object(), active_region(), job.id, path, batch_size),
+    ).start()
+    return job
+
+
+def _run_import(app, region, job_id, path, batch_size):
+    with app.app_context(), use_region(region):
+        job = db.session.get(ImportJob, job_id)
+
+        def progress(imported, errors):
+            job.imported, job.rejected = imported, len(errors)
+            db.session.commit()
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as handle:
+                result = import_csv(job.kind, handle, batch_size=batch_size, progress=progress)
+            job.imported, job.rejected = result['imported'], len(result['errors'])
+            job.errors = json.dumps(result['errors'][:ERRORS_KEPT])
+            job.status = 'done'
+        except Exception as error:
+            db.session.rollback()
+            job.status, job.errors = 'failed', json.dumps([(None, str(error))])
+        finally:
+            os.remove(path)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
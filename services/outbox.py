@@ -0,0 +1,307 @@
+from flask import current_app
+from models import OutboxMessage, ComplianceStatus, Child, User, db
+from services import ratelimit
+from sqlalchemy import select, insert, update, func, or_, and_
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+import fcntl
+import importlib
+import json
+import os
+import smtplib
+import socket
+import time
+import uuid
+
+# ------------------------------
+# Notification Outbox
+# ------------------------------
+# Routes never talk to a mail or SMS gateway. enqueue() adds an outbox row
+# to the caller's session, so the message is committed in the same
+# transaction as the change it describes (or not at all). A separate
+# dispatcher (flask dispatch-outbox) claims due rows in batches under a
+# lease, sends them through the transport configured for their channel and
+# marks them sent.
+#
+# Delivery is exactly-once as long as the transport is idempotent. A worker
+# that dies mid-batch leaves rows in 'sending' until their lease expires,
+# then another worker re-claims them, so a message can be handed to a
+# transport twice. FileTransport records the ids it has delivered and
+# drops repeats. SMTPTransport stamps a stable Message-ID so the receiving
+# side can do the same. dedup_key stops the same notification being queued
+# twice in the first place.
+
+LEASE_SECONDS = 60
+BACKOFF_SECONDS = 30
+
+
+def enqueue(channel, recipient, kind, body, subject=None, dedup_key=None):
+    """Queue a message in the current session; the caller commits. Returns it, or None if skipped."""
+    if not recipient:
+        return None
+    if dedup_key:
+        pending = any(isinstance(obj, OutboxMessage) and obj.dedup_key == dedup_key for obj in db.session.new)
+        if pending or db.session.execute(
+            select(OutboxMessage.id).where(OutboxMessage.dedup_key == dedup_key)
+        ).first():
+            return None
+    message = OutboxMessage(channel=channel, recipient=recipient, kind=kind, subject=subject,
+                            body=body, dedup_key=dedup_key, available_at=datetime.utcnow())
+    db.session.add(message)
+    return message
+
+
+def notify_parent(parent, kind, subject, body, dedup_key, sms=False):
+    """Email a parent (and text them too when `sms` is set and a phone number is on file)."""
+    enqueue('email', parent.email, kind, body, subject=subject, dedup_key=f'email:{dedup_key}')
+    if sms:
+        enqueue('sms', parent.phone, kind, f'{subject}: {body}', dedup_key=f'sms:{dedup_key}')
+
+
+# ------------------------------
+# Scheduled Reminders
+# ------------------------------
+def queue_report_reminders(today=None, days_ahead=None):
+    """
+    One email per parent listing every report or visit due within
+    `days_ahead` days (OUTBOX_REMINDER_DAYS), at most once per ISO week.
+    Returns the number of messages queued.
+    """
+    today = today or datetime.now().date()
+    days_ahead = days_ahead if days_ahead is not None else current_app.config.get('OUTBOX_REMINDER_DAYS', 3)
+    year, week, _ = today.isocalendar()
+
+    due = {}
+    for parent_id, email, name, child, category, next_due_date in db.session.execute(
+        select(User.id, User.email, User.name, Child.name, ComplianceStatus.category, ComplianceStatus.next_due_date)
+        .join(Child, Child.id == ComplianceStatus.child_id)
+        .join(User, User.id == ComplianceStatus.parent_id)
+        .where(ComplianceStatus.next_due_date <= today + timedelta(days=days_ahead), User.status == 'approved')
+        .order_by(User.id, ComplianceStatus.next_due_date)
+    ):
+        due.setdefault((parent_id, email, name), []).append((child, category, next_due_date))
+
+    keys = {parent: f'email:report.reminder:{parent[0]}:{year}-W{week:02d}' for parent in due}
+    existing = set()
+    key_list = list(keys.values())
+    for start in range(0, len(key_list), 500):
+        existing.update(db.session.execute(
+            select(OutboxMessage.dedup_key).where(OutboxMessage.dedup_key.in_(key_list[start:start + 500]))
+        ).scalars())
+
+    now = datetime.utcnow()
+    rows = []
+    for (parent_id, email, name), items in due.items():
+        if keys[(parent_id, email, name)] in existing:
+            continue
+        lines = [f"- {child}: {'home visit' if category == 'visit' else category + ' report'} "
+                 f"{'overdue since' if due_date < today else 'due'} {due_date:%d %b %Y}"
+                 for child, category, due_date in items]
+        rows.append({
+            'channel': 'email', 'recipient': email, 'kind': 'report.reminder',
+            'subject': 'Reports due for your children',
+            'body': f'Dear {name},\n\nThe following are due:\n' + '\n'.join(lines),
+            'dedup_key': keys[(parent_id, email, name)], 'status': 'pending', 'attempts': 0,
+            'available_at': now, 'created_at': now,
+        })
+    for start in range(0, len(rows), 1000):
+        db.session.execute(insert(OutboxMessage), rows[start:start + 1000])
+    db.session.commit()
+    return len(rows)
+
+
+# ------------------------------
+# Transports
+# ------------------------------
+class FileTransport:
+    """
+    Local stand-in for a gateway: appends each message as a JSON line to
+    OUTBOX_FILE_DIR/<channel>.jsonl. Ids already in the file are skipped,
+    and the file is locked while a batch is written, so several dispatchers
+    can share it.
+    """
+
+    def __init__(self, config, channel):
+        directory = config.get('OUTBOX_FILE_DIR', 'outbox')
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'{channel}.jsonl')
+        self._delivered = set()
+        self._offset = 0
+
+    def send_batch(self, messages):
+        with open(self.path, 'a+') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                # Pick up anything other processes appended since we last looked.
+                handle.seek(self._offset)
+                for line in handle.read().splitlines():
+                    self._delivered.add(json.loads(line)['id'])
+                for message in messages:
+                    if message.id in self._delivered:
+                        continue
+                    handle.write(json.dumps({
+                        'id': message.id, 'to': message.recipient, 'kind': message.kind,
+                        'subject': message.subject, 'body': message.body,
+                        'sent_at': datetime.utcnow().isoformat(),
+                    }) + '\n')
+                    self._delivered.add(message.id)
+                handle.flush()
+                os.fsync(handle.fileno())
+                self._offset = handle.tell()
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        return {}
+
+
+class SMTPTransport:
+    """
+    Sends email over one SMTP connection per batch. Point OUTBOX_SMTP_HOST /
+    OUTBOX_SMTP_PORT at a debugging server (e.g. `python -m aiosmtpd -n`)
+    for local testing.
+    """
+
+    def __init__(self, config, channel):
+        self.host = config.get('OUTBOX_SMTP_HOST', 'localhost')
+        self.port = config.get('OUTBOX_SMTP_PORT', 25)
+        self.sender = config.get('OUTBOX_SENDER', 'noreply@localhost')
+
+    def send_batch(self, messages):
+        errors = {}
+        domain = self.sender.rpartition('@')[2] or 'localhost'
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            for message in messages:
+                email = EmailMessage()
+                email['From'] = self.sender
+                email['To'] = message.recipient
+                email['Subject'] = message.subject or ''
+                email['Message-ID'] = f'<outbox-{message.id}@{domain}>'
+                email.set_content(message.body)
+                try:
+                    smtp.send_message(email)
+                except smtplib.SMTPRecipientsRefused as error:
+                    errors[message.id] = str(error)
+        return errors
+
+
+TRANSPORTS = {'file': FileTransport, 'smtp': SMTPTransport}
+
+
+def _transport(channel):
+    cache = current_app.extensions.setdefault('outbox_transports', {})
+    transport = cache.get(channel)
+    if transport is None:
+        name = current_app.config.get('OUTBOX_TRANSPORTS', {}).get(channel, 'file')
+        if name in TRANSPORTS:
+            cls = TRANSPORTS[name]
+        else:
+            # Custom transports: 'package.module:ClassName'
+            module, _, attr = name.partition(':')
+            cls = getattr(importlib.import_module(module), attr)
+        transport = cache[channel] = cls(current_app.config, channel)
+    return transport
+
+
+# ------------------------------
+# Dispatcher
+# ------------------------------
+def _claim(token, batch_size, now):
+    due = or_(
+        and_(OutboxMessage.status == 'pending', OutboxMessage.available_at <= now),
+        and_(OutboxMessage.status == 'sending', OutboxMessage.locked_until < now),
+    )
+    ids = select(OutboxMessage.id).where(due).order_by(OutboxMessage.id).limit(batch_size).scalar_subquery()
+    # The claim re-checks `due`, so two workers can never hold the same row.
+    db.session.execute(
+        update(OutboxMessage).where(OutboxMessage.id.in_(ids), due).values(
+            status='sending', locked_by=token, locked_until=now + timedelta(seconds=LEASE_SECONDS),
+            attempts=OutboxMessage.attempts + 1),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return OutboxMessage.query.filter_by(locked_by=token, status='sending').order_by(OutboxMessage.id).all()
+
+
+def _finish(token, ids, **values):
+    if ids:
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids), OutboxMessage.locked_by == token)
+            .values(locked_by=None, locked_until=None, **values),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def dispatch(batch_size=100, worker=None):
+    """Claim and send one batch. Returns {'sent', 'deferred', 'retried', 'failed'}."""
+    config = current_app.config
+    token = f"{worker or socket.gethostname() + ':' + str(os.getpid())}:{uuid.uuid4().hex[:8]}"
+    now = datetime.utcnow()
+    claimed = _claim(token, batch_size, now)
+    summary = {'sent': 0, 'deferred': 0, 'retried': 0, 'failed': 0}
+    if not claimed:
+        return summary
+
+    by_channel = {}
+    for message in claimed:
+        by_channel.setdefault(message.channel, []).append(message)
+
+    max_attempts = config.get('OUTBOX_MAX_ATTEMPTS', 5)
+    limits = config.get('OUTBOX_RATE_LIMITS', {})
+    for channel, messages in by_channel.items():
+        # Per-channel gateway limits: whatever is over the limit waits.
+        allowed = messages
+        if channel in limits:
+            allowed = []
+            for position, message in enumerate(messages):
+                ok, retry_after = ratelimit.hit(f'outbox:{channel}', *limits[channel])
+                if not ok:
+                    deferred = messages[position:]
+                    _finish(token, [m.id for m in deferred], status='pending',
+                            attempts=OutboxMessage.attempts - 1,
+                            available_at=now + timedelta(seconds=retry_after))
+                    summary['deferred'] += len(deferred)
+                    break
+                allowed.append(message)
+        if not allowed:
+            continue
+
+        try:
+            errors = _transport(channel).send_batch(allowed)
+        except Exception as error:
+            errors = {message.id: repr(error) for message in allowed}
+
+        _finish(token, [m.id for m in allowed if m.id not in errors], status='sent', sent_at=datetime.utcnow())
+        summary['sent'] += len(allowed) - len(errors)
+        for message in allowed:
+            if message.id not in errors:
+                continue
+            if message.attempts >= max_attempts:
+                _finish(token, [message.id], status='failed', last_error=errors[message.id])
+                summary['failed'] += 1
+            else:
+                _finish(token, [message.id], status='pending', last_error=errors[message.id],
+                        available_at=now + timedelta(seconds=BACKOFF_SECONDS * 2 ** (message.attempts - 1)))
+                summary['retried'] += 1
+        db.session.commit()
+    db.session.commit()
+    return summary
+
+
+def run_dispatcher(batch_size=100, interval=5.0, once=False):
+    """Dispatch batches forever, or until a batch makes no progress (once)."""
+    totals = {'sent': 0, 'deferred': 0, 'retried': 0, 'failed': 0}
+    while True:
+        summary = dispatch(batch_size)
+        for key, value in summary.items():
+            totals[key] += value
+        if not (summary['sent'] or summary['retried'] or summary['failed']):
+            # Empty, or everything is waiting on a rate limit.
+            if once:
+                return totals
+            time.sleep(interval)
+
+
+def outbox_counts():
+    return dict(db.session.execute(
+        select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+    ).all())
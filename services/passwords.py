@@ -0,0 +1,134 @@
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import os
+import threading
+
+# ------------------------------
+# Password Hashing Service
+# ------------------------------
+# Hashes are CPU-bound (scrypt/pbkdf2 by design), so they run in a shared,
+# bounded process pool instead of on the request worker. At most
+# PASSWORD_HASH_MAX_PENDING jobs may be queued; beyond that callers wait up
+# to PASSWORD_HASH_QUEUE_TIMEOUT seconds and then get PasswordHasherBusy,
+# which routes turn into a "try again" message rather than piling up work.
+#
+# PASSWORD_HASH_METHOD is the current policy; hashes made with any other
+# method are upgraded on the next successful login (see verify_and_upgrade).
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+_pool = None
+_slots = None
+_lock = threading.Lock()
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+def _config(key, default):
+    return current_app.config.get(key, default)
+
+
+def hash_method():
+    return _config('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+
+def _executor():
+    global _pool, _slots
+    workers = _config('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+    if not workers:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _slots = threading.BoundedSemaphore(_config('PASSWORD_HASH_MAX_PENDING', workers * 8))
+    return _pool
+
+
+def shutdown():
+    """Stop the pool (tests, benchmarks and config changes)."""
+    global _pool, _slots
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+        _slots = None
+
+
+def _run(fn, *args):
+    pool = _executor()
+    if pool is None:
+        return fn(*args)
+    if not _slots.acquire(timeout=_config('PASSWORD_HASH_QUEUE_TIMEOUT', 5)):
+        raise PasswordHasherBusy()
+    try:
+        future = pool.submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+
+def hash_password(password):
+    """Hash with the current policy."""
+    return _run(generate_password_hash, password, hash_method())
+
+
+def _hash_chunk(passwords, method):
+    return [generate_password_hash(password, method=method) for password in passwords]
+
+
+def hash_many(passwords, method=None, chunk_size=16):
+    """
+    Hash a batch (bulk imports) with `method` (default: the current policy)
+    in the shared pool. Each chunk takes one queue slot, and a full queue
+    makes the batch wait instead of failing, so logins still get their turn.
+    """
+    method = method or hash_method()
+    pool, slots = _executor(), _slots
+    if pool is None or len(passwords) <= chunk_size:
+        return _hash_chunk(passwords, method)
+    futures = []
+    for start in range(0, len(passwords), chunk_size):
+        slots.acquire()
+        try:
+            future = pool.submit(_hash_chunk, passwords[start:start + chunk_size], method)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+    return [hashed for future in futures for hashed in future.result()]
+
+
+def verify_password(pwhash, password):
+    if not pwhash or password is None:
+        return False
+    return _run(check_password_hash, pwhash, password)
+
+
+@lru_cache(maxsize=8)
+def _canonical(method):
+    # Werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1');
+    # hashing an empty password once tells us the exact stored prefix.
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(pwhash):
+    return pwhash.split('$', 1)[0] != _canonical(hash_method())
+
+
+def verify_and_upgrade(record, password):
+    """
+    Check `password` against `record.password` (a User or Staff). On success,
+    a hash made under an older policy is replaced; the caller commits.
+    """
+    if not verify_password(record.password, password):
+        return False
+    if needs_rehash(record.password):
+        record.password = hash_password(password)
+    return True
@@ -0,0 +1,199 @@
+from flask import current_app
+from collections import OrderedDict
+import sqlite3
+import threading
+import time
+
+# ------------------------------
+# Rate Limiting
+# ------------------------------
+# Sliding-window counters: each key keeps only the current and previous
+# fixed-window counts, and the previous count is weighted by how much of it
+# still overlaps the sliding window. That is a close approximation of a true
+# sliding log at a few integers per key.
+#
+# RATELIMIT_STORAGE selects the backend: 'memory' (per process) or
+# 'sqlite:///path/to/file.db' so several workers share the same counters.
+
+
+def _estimate(entry, window):
+    """Return (current count, previous count) for `window` given a stored entry."""
+    if entry is None or entry[0] < window - 1:
+        return 0, 0
+    if entry[0] == window - 1:
+        return 0, entry[1]
+    return entry[1], entry[2]
+
+
+def _decide(current, previous, limit, period, now):
+    fraction = (now % period) / period
+    if previous * (1 - fraction) + current < limit:
+        return True, 0
+    if current >= limit or not previous:
+        return False, int(period - now % period) + 1
+    # Wait until enough of the previous window has slid out.
+    needed = 1 - (limit - current) / previous
+    return False, int((needed - fraction) * period) + 1
+
+
+class MemoryBackend:
+    """Per-process counters: {key: (window, current, previous, expires)}, least recently counted first."""
+
+    max_keys = 100000
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # The entries counted longest ago, so most expired ones, come first.
+        # If that isn't enough, drop the least recently counted tenth in one
+        # go, so a flood of new keys costs O(1) per insert, never a full scan.
+        while self._entries and next(iter(self._entries.values()))[3] < now:
+            self._entries.popitem(last=False)
+        if len(self._entries) >= self.max_keys:
+            for _ in range(len(self._entries) - self.max_keys + max(1, self.max_keys // 10)):
+                self._entries.popitem(last=False)
+
+    def check(self, key, limit, period, now, count):
+        window = int(now // period)
+        with self._lock:
+            current, previous = _estimate(self._entries.get(key), window)
+            allowed, retry_after = _decide(current, previous, limit, period, now)
+            if allowed and count:
+                if key not in self._entries and len(self._entries) >= self.max_keys:
+                    self._evict(now)
+                self._entries[key] = (window, current + 1, previous, (window + 2) * period)
+                self._entries.move_to_end(key)
+            return allowed, retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteBackend:
+    """Counters in a small SQLite file shared by every worker process."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                'key TEXT PRIMARY KEY, window INTEGER, current INTEGER, previous INTEGER, expires REAL)'
+            )
+        self.purge_expired()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def check(self, key, limit, period, now, count):
+        window = int(now // period)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            entry = conn.execute(
+                'SELECT window, current, previous FROM rate_limits WHERE key = ?', (key,)
+            ).fetchone()
+            current, previous = _estimate(entry, window)
+            allowed, retry_after = _decide(current, previous, limit, period, now)
+            if allowed and count:
+                conn.execute(
+                    'INSERT OR REPLACE INTO rate_limits (key, window, current, previous, expires) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, window, current + 1, previous, (window + 2) * period)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def reset(self, key):
+        self._connect().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+    def purge_expired(self, now=None):
+        self._connect().execute('DELETE FROM rate_limits WHERE expires < ?', (now or time.time(),))
+
+
+def _backend():
+    backend = current_app.extensions.get('ratelimit')
+    if backend is None:
+        storage = current_app.config.get('RATELIMIT_STORAGE', 'memory')
+        if storage.startswith('sqlite:///'):
+            backend = SQLiteBackend(storage[len('sqlite:///'):])
+        else:
+            backend = MemoryBackend()
+        current_app.extensions['ratelimit'] = backend
+    return backend
+
+
+def hit(key, limit, period):
+    """Count one event for `key`. Returns (allowed, retry_after_seconds)."""
+    if not current_app.config.get('RATELIMIT_ENABLED', True):
+        return True, 0
+    return _backend().check(key, limit, period, time.time(), count=True)
+
+
+def peek(key, limit, period):
+    """Like hit() but without counting (e.g. to check a lockout)."""
+    if not current_app.config.get('RATELIMIT_ENABLED', True):
+        return True, 0
+    return _backend().check(key, limit, period, time.time(), count=False)
+
+
+def reset(key):
+    if current_app.config.get('RATELIMIT_ENABLED', True):
+        _backend().reset(key)
+
+
+# ------------------------------
+# Login / Password Reset Policies
+# ------------------------------
+def _identifier_key(scope, role, identifier):
+    return f'{scope}:id:{role}:{(identifier or "").strip().lower()}'
+
+
+def throttle_login(ip, role, identifier):
+    """
+    Call before any lookup or hash. Counts the attempt against the client IP
+    and checks the identifier's failure lockout. Returns seconds to wait, or
+    0 if the attempt may proceed.
+    """
+    config = current_app.config
+    allowed, retry_after = hit(f'login:ip:{ip}', *config.get('LOGIN_RATE_LIMIT_IP', (30, 300)))
+    if not allowed:
+        return retry_after
+    if identifier:
+        allowed, retry_after = peek(_identifier_key('login', role, identifier),
+                                    *config.get('LOGIN_LOCKOUT', (5, 900)))
+        if not allowed:
+            return retry_after
+    return 0
+
+
+def record_login_failure(role, identifier):
+    if identifier:
+        hit(_identifier_key('login', role, identifier), *current_app.config.get('LOGIN_LOCKOUT', (5, 900)))
+
+
+def clear_login_failures(role, identifier):
+    if identifier:
+        reset(_identifier_key('login', role, identifier))
+
+
+def throttle_password_reset(ip, role, identifier):
+    """Counts every reset request per IP and per identifier; returns seconds to wait or 0."""
+    config = current_app.config
+    allowed, retry_after = hit(f'reset:ip:{ip}', *config.get('RESET_RATE_LIMIT_IP', (10, 3600)))
+    if allowed and identifier:
+        allowed, retry_after = hit(_identifier_key('reset', role, identifier),
+                                   *config.get('RESET_RATE_LIMIT_ID', (3, 3600)))
+    return 0 if allowed else retry_after
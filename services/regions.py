@@ -0,0 +1,70 @@
+from models import User, Staff, Child, Upload, ArchivedUpload, ComplianceStatus, db
+from services.tenancy import for_each_region
+from services.workload import period_report, quarter_of
+from sqlalchemy import select, func
+from datetime import datetime
+import time
+
+# ------------------------------
+# Cross-Region Report
+# ------------------------------
+# region_summary() computes one office's headline figures from indexed
+# counts and the cached workload report. cross_region_report() runs it in
+# every region through services.tenancy.for_each_region. With SQLite files
+# that is one region after another (a few ms each). With database servers
+# the regions are queried at once, so the network waits overlap. A region
+# whose database can't be read is reported, not fatal.
+
+SUMMARY_FIELDS = ('staff', 'parents', 'pending_parents', 'children', 'uploads', 'pending_uploads',
+                  'overdue', 'reviewed', 'visits_completed')
+
+
+def region_summary(today=None):
+    """Headline figures for the active region."""
+    today = today or datetime.now().date()
+    quarter = period_report(quarter_of(today))
+    parents = dict(db.session.execute(
+        select(User.status, func.count()).where(User.role == 'parent').group_by(User.status)
+    ).all())
+    reviewed = sum(row['reviewed'] for row in quarter['staff'])
+    within = sum(row['reviewed'] * row['within_sla_pct'] / 100 for row in quarter['staff'] if row['reviewed'])
+    return {
+        'staff': db.session.execute(select(func.count()).select_from(Staff)).scalar(),
+        'parents': parents.get('approved', 0),
+        'pending_parents': parents.get('pending', 0),
+        'children': db.session.execute(select(func.count()).select_from(Child)).scalar(),
+        'uploads': sum(db.session.execute(select(func.count()).select_from(model)).scalar()
+                       for model in (Upload, ArchivedUpload)),
+        'pending_uploads': db.session.execute(
+            select(func.count()).where(Upload.status == 'pending')).scalar(),
+        'overdue': db.session.execute(
+            select(func.count()).where(ComplianceStatus.next_due_date < today)).scalar(),
+        'reviewed': reviewed,
+        'within_sla': within,
+        'visits_completed': sum(row['visits'][-1] for row in quarter['staff']),
+    }
+
+
+def _safe_summary():
+    started = time.perf_counter()
+    try:
+        summary = region_summary()
+    except Exception as error:
+        summary = {'error': str(error)}
+    summary['elapsed_ms'] = (time.perf_counter() - started) * 1000
+    return summary
+
+
+def cross_region_report():
+    """{'regions': {name: summary}, 'totals': summary, 'elapsed_ms': wall time}."""
+    started = time.perf_counter()
+    results = for_each_region(_safe_summary)
+    totals = {field: 0 for field in SUMMARY_FIELDS + ('within_sla',)}
+    for summary in results.values():
+        if 'error' not in summary:
+            for field in totals:
+                totals[field] += summary[field]
+    for summary in list(results.values()) + [totals]:
+        if 'error' not in summary:
+            summary['within_sla_pct'] = 100.0 * summary['within_sla'] / summary['reviewed'] if summary['reviewed'] else None
+    return {'regions': results, 'totals': totals, 'elapsed_ms': (time.perf_counter() - started) * 1000}
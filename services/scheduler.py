@@ -0,0 +1,189 @@
+from flask import current_app
+from models import User, Visit, VisitSchedule, db
+from services.archive import last_completed_visits
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.orm.exc import StaleDataError
+from datetime import datetime, timedelta
+import hashlib
+
+# ------------------------------
+# Quarterly Visit Scheduler
+# ------------------------------
+# Keeps exactly one upcoming 'scheduled' visit per approved parent, due one
+# quarter after their last completed visit. Visits are spread over each
+# mentor's weekdays under a daily capacity, overdue ones are moved forward,
+# and a per-parent fingerprint (visit_schedules) lets nightly runs skip
+# parents whose inputs have not changed since the last run.
+
+VISIT_INTERVAL_DAYS = 91
+AUTO_VISIT_REMARKS = 'Quarterly home visit (auto-scheduled)'
+
+
+def _fingerprint(staff_id, last_completed, next_date, next_staff_id):
+    raw = f'{staff_id}|{last_completed}|{next_date}|{next_staff_id}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _pick_slot(day_load, due, capacity, spread_days):
+    """
+    Return the least-loaded weekday in [due, due + spread_days] that is under
+    capacity, taking the earliest on ties. If the whole window is full, the
+    first free weekday after it is used instead.
+    """
+    window_end = due + timedelta(days=spread_days)
+    best = None
+    day = due
+    while best is None or day <= window_end:
+        if day.weekday() < 5:
+            count = day_load.get(day, 0)
+            if count < capacity and (best is None or count < day_load.get(best, 0)):
+                best = day
+                if count == 0:
+                    break
+        day += timedelta(days=1)
+    day_load[best] = day_load.get(best, 0) + 1
+    return best
+
+
+def schedule_quarterly_visits(full=False, today=None, capacity=None, spread_days=None, batch_size=None):
+    """
+    Generate, rebalance and reschedule quarterly visits in bulk.
+
+    Safe to run repeatedly: a parent that already has an upcoming visit with
+    their current mentor is left alone. Unless `full` is set, parents whose
+    fingerprint matches the stored one (and whose visit is not overdue) are
+    skipped without any further work.
+    """
+    config = current_app.config
+    today = today or datetime.now().date()
+    capacity = capacity or config.get('VISIT_DAILY_CAPACITY', 4)
+    spread_days = spread_days if spread_days is not None else config.get('VISIT_SPREAD_DAYS', 14)
+    batch_size = batch_size or config.get('SCHEDULER_BATCH_SIZE', 1000)
+    if capacity < 1:
+        raise ValueError('VISIT_DAILY_CAPACITY must be at least 1.')
+
+    parents = db.session.execute(
+        select(User.id, User.staff_id).where(
+            User.role == 'parent',
+            User.status == 'approved',
+            User.staff_id.isnot(None)
+        )
+    ).all()
+
+    last_completed = last_completed_visits()
+
+    # A single pass over scheduled visits gives both each parent's earliest
+    # upcoming visit and every mentor's per-day load.
+    next_visit = {}
+    staff_load = {}
+    for visit_id, parent_id, staff_id, visit_date, version in db.session.execute(
+        select(Visit.id, Visit.parent_id, Visit.staff_id, Visit.visit_date, Visit.version)
+        .where(Visit.status == 'scheduled')
+        .order_by(Visit.visit_date)
+    ):
+        next_visit.setdefault(parent_id, (visit_id, visit_date, staff_id, version))
+        if visit_date >= today:
+            day_load = staff_load.setdefault(staff_id, {})
+            day_load[visit_date] = day_load.get(visit_date, 0) + 1
+
+    stored = dict(db.session.execute(select(VisitSchedule.parent_id, VisitSchedule.fingerprint)).all())
+
+    new_visits = []
+    moved_visits = []
+    moved_parents = {}
+    new_states = []
+    changed_states = []
+    unchanged = 0
+
+    for parent_id, staff_id in parents:
+        last = last_completed.get(parent_id)
+        visit_id, visit_date, visit_staff_id, version = next_visit.get(parent_id, (None, None, None, None))
+        fingerprint = _fingerprint(staff_id, last, visit_date, visit_staff_id)
+
+        overdue = visit_date is not None and visit_date < today
+        if not full and not overdue and stored.get(parent_id) == fingerprint:
+            unchanged += 1
+            continue
+
+        if visit_id is not None and not overdue and visit_staff_id == staff_id:
+            # Already booked with the right mentor; just record the state.
+            slot = visit_date
+        else:
+            due = last + timedelta(days=VISIT_INTERVAL_DAYS) if last else today
+            due = max(due, today)
+            if visit_id is not None and not overdue:
+                old_load = staff_load.get(visit_staff_id, {})
+                old_load[visit_date] = old_load.get(visit_date, 1) - 1
+            slot = _pick_slot(staff_load.setdefault(staff_id, {}), due, capacity, spread_days)
+            if visit_id is None:
+                new_visits.append({
+                    'parent_id': parent_id,
+                    'staff_id': staff_id,
+                    'visit_date': slot,
+                    'scheduled_date': due,
+                    'remarks': AUTO_VISIT_REMARKS,
+                    'status': 'scheduled'
+                })
+            else:
+                moved_visits.append({
+                    'id': visit_id,
+                    'staff_id': staff_id,
+                    'visit_date': slot,
+                    'scheduled_date': due,
+                    'version': version
+                })
+                moved_parents[visit_id] = parent_id
+
+        state = {
+            'parent_id': parent_id,
+            'fingerprint': _fingerprint(staff_id, last, slot, staff_id),
+            'next_visit_date': slot,
+            'updated_at': datetime.utcnow()
+        }
+        if parent_id in stored:
+            changed_states.append(state)
+        else:
+            new_states.append(state)
+
+    eligible = {parent_id for parent_id, _ in parents}
+    stale = [parent_id for parent_id in stored if parent_id not in eligible]
+
+    for chunk in _chunks(new_visits, batch_size):
+        db.session.execute(insert(Visit), chunk)
+        db.session.commit()
+    # Moves are compare-and-swap on Visit.version: a batch that hits a visit
+    # staff changed meanwhile is dropped, and those parents' states aren't
+    # recorded, so the next run looks at them again.
+    conflicted = set()
+    for chunk in _chunks(moved_visits, batch_size):
+        try:
+            db.session.execute(update(Visit), chunk)
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            conflicted.update(moved_parents[row['id']] for row in chunk)
+    if conflicted:
+        new_states = [state for state in new_states if state['parent_id'] not in conflicted]
+        changed_states = [state for state in changed_states if state['parent_id'] not in conflicted]
+    for chunk in _chunks(new_states, batch_size):
+        db.session.execute(insert(VisitSchedule), chunk)
+        db.session.commit()
+    for chunk in _chunks(changed_states, batch_size):
+        db.session.execute(update(VisitSchedule), chunk)
+        db.session.commit()
+    for chunk in _chunks(stale, batch_size):
+        db.session.execute(delete(VisitSchedule).where(VisitSchedule.parent_id.in_(chunk)))
+        db.session.commit()
+
+    return {
+        'checked': len(parents),
+        'unchanged': unchanged,
+        'created': len(new_visits),
+        'rescheduled': len(moved_visits) - len(conflicted),
+        'conflicts': len(conflicted)
+    }
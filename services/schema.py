@@ -0,0 +1,90 @@
+from sqlalchemy import inspect, text
+from models import db
+from services.tenancy import regions, region_engine
+
+# ------------------------------
+# Schema Upgrades
+# ------------------------------
+# db.create_all() only creates missing tables, so an existing
+# adoption_system.db never picks up new columns or indexes. This fills
+# those gaps in place without a separate migration tool.
+
+def _column_ddl(column, engine):
+    ddl = f'{column.name} {column.type.compile(engine.dialect)}'
+    if column.server_default is not None:
+        default = column.server_default.arg
+        ddl += f" DEFAULT '{default}'" if isinstance(default, str) else f' DEFAULT {default.text}'
+    return ddl
+
+# Hot tables whose rows move to an archive table keeping their ids
+# (services/archive.py): archive table, Attachment.owner_type, and the other
+# columns that hold those ids.
+ARCHIVED_IDS = {
+    'uploads': ('uploads_archive', 'upload', (('growth_measurements', 'upload_id'),)),
+    'visits': ('visits_archive', 'visit', ()),
+}
+
+def _rebuild_autoincrement(conn, table):
+    """Recreate a SQLite table made before it was declared AUTOINCREMENT, keeping its rows."""
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                       {'name': table.name}).scalar()
+    if 'AUTOINCREMENT' in ddl.upper():
+        return
+    old = f'{table.name}_rebuild'
+    columns = ', '.join(column.name for column in table.columns)
+    # Legacy mode leaves other tables' foreign keys pointing at the original name.
+    conn.execute(text('PRAGMA legacy_alter_table = ON'))
+    conn.execute(text(f'ALTER TABLE {table.name} RENAME TO {old}'))
+    for index in inspect(conn).get_indexes(old):
+        conn.execute(text(f'DROP INDEX {index["name"]}'))
+    table.create(conn)
+    conn.execute(text(f'INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old}'))
+    conn.execute(text(f'DROP TABLE {old}'))
+    conn.execute(text('PRAGMA legacy_alter_table = OFF'))
+
+def _reclaim_ids(conn, hot, archive, owner_type, references):
+    """
+    Give hot rows that reused an archived id a fresh one, and start the id
+    sequence past every id either table has used.
+    """
+    top = conn.execute(text(f'SELECT max(coalesce((SELECT max(id) FROM {hot}), 0), '
+                            f'coalesce((SELECT max(id) FROM {archive}), 0))')).scalar()
+    clashes = conn.execute(text(f'SELECT id FROM {hot} WHERE id IN (SELECT id FROM {archive}) ORDER BY id')).scalars().all()
+    for old in clashes:
+        top += 1
+        conn.execute(text(f'UPDATE {hot} SET id = :new WHERE id = :old'), {'new': top, 'old': old})
+        conn.execute(text('UPDATE attachments SET owner_id = :new WHERE owner_type = :type AND owner_id = :old'),
+                     {'new': top, 'old': old, 'type': owner_type})
+        for table, column in references:
+            conn.execute(text(f'UPDATE {table} SET {column} = :new WHERE {column} = :old'), {'new': top, 'old': old})
+    seq = conn.execute(text('SELECT seq FROM sqlite_sequence WHERE name = :name'), {'name': hot}).scalar()
+    if seq is None:
+        conn.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'), {'name': hot, 'seq': top})
+    elif seq < top:
+        conn.execute(text('UPDATE sqlite_sequence SET seq = :seq WHERE name = :name'), {'name': hot, 'seq': top})
+
+def _upgrade(engine):
+    db.metadata.create_all(engine)
+    inspector = inspect(engine)
+    
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, engine)}'))
+            
+            existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+        
+        if engine.dialect.name == 'sqlite':
+            for name, (archive, owner_type, references) in ARCHIVED_IDS.items():
+                _rebuild_autoincrement(conn, db.metadata.tables[name])
+                _reclaim_ids(conn, name, archive, owner_type, references)
+
+def upgrade_schema():
+    """Create missing tables, then add missing columns and indexes (in every region's database)."""
+    for name in regions() or [None]:
+        _upgrade(region_engine(name))
@@ -0,0 +1,159 @@
+from flask import current_app, url_for
+from models import Child, Upload, Visit, Guidance, ArchivedUpload, ArchivedVisit, db
+from sqlalchemy import select, func
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+import hashlib
+import os
+
+# ------------------------------
+# Offline Sync (parent portal)
+# ------------------------------
+# Child, Upload, Visit and Guidance stamp `updated_at` on every insert and
+# update, including bulk UPDATEs (it is the column's onupdate). GET
+# /parent/api/sync?since=<watermark> returns only the rows of the signed-in
+# parent stamped at or after the watermark, plus the ids that left the
+# portal since then: soft-deleted children and guidance, uploads and visits
+# moved to cold storage. Each response carries the next watermark. It is
+# SYNC_OVERLAP_SECONDS behind the server clock, so a transaction that
+# stamped its rows just before the query but committed just after is picked
+# up on the next call. Clients apply rows by id, so the overlap only costs a
+# few repeated rows.
+#
+# No watermark, or one older than DELETED_RETENTION_DAYS (compaction may
+# have purged the tombstones since), gets a full snapshot marked
+# 'full': true, and the client replaces what it holds.
+#
+# static/js/parent-sw.js keeps the portal pages and shows them again until
+# a sync names them in 'refresh', keeps the synced rows, and queues uploads
+# made while offline. Pages it does fetch are conditional GETs: page_etag()
+# is one query over the newest stamp per table, so an unchanged page
+# answers 304 without running its own queries or rendering.
+
+SYNCED = {
+    # name: (model, hot filter column, archive model)
+    'children': (Child, Child.parent_id, None),
+    'uploads': (Upload, Upload.parent_id, ArchivedUpload),
+    'visits': (Visit, Visit.parent_id, ArchivedVisit),
+    'guidance': (Guidance, None, None),
+}
+
+# Which portal pages show each kind of row; the service worker refreshes
+# these pages when a sync brings changes.
+PAGES = {
+    'children': ('parent.dashboard', 'parent.view_children', 'parent.manage_uploads'),
+    'uploads': ('parent.dashboard', 'parent.manage_uploads'),
+    'visits': ('parent.dashboard', 'parent.view_visits'),
+    'guidance': ('parent.view_guidance',),
+}
+
+WATERMARK_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _child(child):
+    return {'id': child.id, 'name': child.name, 'dob': _iso(child.dob), 'gender': child.gender,
+            'adoption_date': _iso(child.adoption_date), 'background_info': child.background_info}
+
+
+def _upload(upload):
+    return {'id': upload.id, 'child_id': upload.child_id, 'upload_type': upload.upload_type,
+            'status': upload.status, 'feedback': upload.feedback, 'upload_date': _iso(upload.upload_date),
+            'verified_at': _iso(upload.verified_at), 'version': upload.version,
+            'url': url_for('uploaded_files', filename=upload.file_path)}
+
+
+def _visit(visit):
+    return {'id': visit.id, 'visit_date': _iso(visit.visit_date), 'status': visit.status,
+            'remarks': visit.remarks, 'staff': visit.staff.name if visit.staff else None,
+            'photos': [url_for('uploaded_files', filename=photo.file_path) for photo in visit.attachments]}
+
+
+def _guidance(item):
+    return {'id': item.id, 'title': item.title, 'description': item.description, 'category': item.category,
+            'url': url_for('uploaded_files', filename=item.file_url) if item.file_url else None,
+            'created_at': _iso(item.created_at)}
+
+
+SERIALIZERS = {'children': _child, 'uploads': _upload, 'visits': _visit, 'guidance': _guidance}
+
+
+def parse_watermark(value):
+    """The datetime in a client watermark, or None if missing or unreadable."""
+    try:
+        return datetime.strptime(value, WATERMARK_FORMAT) if value else None
+    except ValueError:
+        return None
+
+
+def changes_since(parent, since=None, now=None):
+    """
+    Rows of `parent` changed at or after `since` (a watermark string) as
+    {'watermark', 'full', 'parent', 'version', 'today', <kind>: [row dicts], 'removed': {<kind>: [ids]}}.
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    since = parse_watermark(since)
+    if since and since < now - timedelta(days=config.get('DELETED_RETENTION_DAYS', 30)):
+        since = None
+    result = {
+        'watermark': (now - timedelta(seconds=config.get('SYNC_OVERLAP_SECONDS', 5))).strftime(WATERMARK_FORMAT),
+        'full': since is None,
+        'parent': parent.id,
+        'version': parent.version,  # the user row: profile, approval, assigned mentor
+        'today': datetime.now().date().isoformat(),
+        'removed': {},
+    }
+    for kind, (model, owner, archive) in SYNCED.items():
+        query = select(model).order_by(model.id)
+        if owner is not None:
+            query = query.where(owner == parent.id)
+        if since:
+            # Deleted rows come through as tombstones; a full snapshot leaves them out.
+            query = query.where(model.updated_at >= since).execution_options(include_deleted=True)
+        if model is Visit:
+            query = query.options(selectinload(Visit.staff), selectinload(Visit.attachments))
+        rows = db.session.execute(query).scalars().all()
+        removed = [row.id for row in rows if getattr(row, 'deleted_at', None)]
+        result[kind] = [SERIALIZERS[kind](row) for row in rows if not getattr(row, 'deleted_at', None)]
+        if since and archive is not None:
+            removed += db.session.execute(
+                select(archive.id).where(archive.parent_id == parent.id, archive.archived_at >= since)
+            ).scalars().all()
+        if removed:
+            result['removed'][kind] = removed
+    return result
+
+
+def _deploy_stamp():
+    """Changes when templates or built assets do, so cached pages aren't reused across a deploy."""
+    app = current_app._get_current_object()
+    stamp = app.extensions.get('sync_stamp')
+    if stamp is None:
+        digest = hashlib.sha1(repr(sorted((app.extensions.get('assets') or {}).get('files', {}).items())).encode())
+        for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+            for name in sorted(files):
+                digest.update(f'{name}:{os.path.getmtime(os.path.join(root, name))}'.encode())
+        stamp = app.extensions['sync_stamp'] = digest.hexdigest()[:12]
+    return stamp
+
+
+def page_etag(parent, page, today=None):
+    """ETag for portal `page` (its path and query string): the newest stamp on anything the portal shows this parent."""
+    newest = [
+        select(func.max(Guidance.updated_at)).scalar_subquery(),
+    ] + [
+        select(func.max(column)).where(owner == parent.id).scalar_subquery()
+        for column, owner in ((Child.updated_at, Child.parent_id),
+                              (Upload.updated_at, Upload.parent_id), (Visit.updated_at, Visit.parent_id),
+                              (ArchivedUpload.archived_at, ArchivedUpload.parent_id),
+                              (ArchivedVisit.archived_at, ArchivedVisit.parent_id))
+    ]
+    # include_deleted: a child or guidance item being deleted changes the page too.
+    stamps = db.session.execute(select(*newest).execution_options(include_deleted=True)).one()
+    # The dashboard's "upcoming" list depends on the date; the profile on the user row.
+    parts = [page, parent.id, parent.version, today or datetime.now().date(), _deploy_stamp()] + list(stamps)
+    return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()[:20]
@@ -0,0 +1,142 @@
+from flask import current_app, request, session
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+
+# ------------------------------
+# Regional Databases
+# ------------------------------
+# Each regional office keeps its staff, parents, children, uploads and visits
+# in its own database, listed in REGIONS ({'north': 'sqlite:///north.db'}).
+# Every region is registered as a Flask-SQLAlchemy bind ('region:<name>'),
+# and db.session sends every query to the engine of the active region (see
+# RegionSession in models.py). Each office therefore only ever touches its
+# own, smaller tables.
+#
+# The active region is a context variable:
+#   - requests: chosen on the login / register form, then kept in the
+#     signed session cookie
+#   - CLI commands: the REGION environment variable (default: the first region)
+#   - code that needs another region: use_region(name)
+# for_each_region() runs a function in every region, each in its own app
+# context and session, for cross-region reports. Regions are visited one
+# after another unless REGIONS_PARALLEL says otherwise: local SQLite work is
+# CPU-bound and threads only add overhead under the GIL, while database
+# servers spend most of each query on the network, which threads overlap.
+# By default regions run in parallel only when one of them is not SQLite.
+#
+# With REGIONS empty (the default) everything uses SQLALCHEMY_DATABASE_URI
+# exactly as before.
+
+BIND_PREFIX = 'region:'
+
+current_region = ContextVar('current_region', default=None)
+
+
+def parse_regions(value):
+    """'north=sqlite:///north.db,south=sqlite:///south.db' -> {'north': ..., 'south': ...}"""
+    regions = {}
+    for item in (value or '').split(','):
+        name, _, url = item.strip().partition('=')
+        if name and url:
+            regions[name.strip()] = url.strip()
+    return regions
+
+
+def regions():
+    """Configured region names, in order."""
+    return list(current_app.config.get('REGIONS') or {})
+
+
+def active_region():
+    """The region queries go to now, or None when regions are not configured."""
+    names = regions()
+    if not names:
+        return None
+    region = current_region.get() or current_app.config.get('DEFAULT_REGION')
+    return region if region in names else names[0]
+
+
+@contextmanager
+def use_region(name):
+    """Run the enclosed block against `name`'s database. Don't switch inside an open session."""
+    token = current_region.set(name)
+    try:
+        yield name
+    finally:
+        current_region.reset(token)
+
+
+def region_engine(name=None):
+    """Engine for `name` (default: the active region)."""
+    engines = current_app.extensions['sqlalchemy'].engines
+    name = name or active_region()
+    return engines[BIND_PREFIX + name] if name else engines[None]
+
+
+def region_path(base):
+    """Per-region subdirectory of a storage folder (e.g. ARCHIVE_FOLDER)."""
+    region = active_region()
+    return os.path.join(base, region) if region else base
+
+
+def _parallel():
+    setting = current_app.config.get('REGIONS_PARALLEL')
+    if setting is None:
+        return any(not url.startswith('sqlite') for url in current_app.config['REGIONS'].values())
+    return setting
+
+
+def for_each_region(fn, *args, parallel=None, max_workers=None, **kwargs):
+    """
+    Call fn(*args, **kwargs) once per region and return {region: result}.
+    `parallel` defaults to REGIONS_PARALLEL. Without regions, runs once
+    under the key None.
+    """
+    names = regions()
+    if not names:
+        return {None: fn(*args, **kwargs)}
+    app = current_app._get_current_object()
+
+    def run(name):
+        # A fresh app context gives each region its own db.session.
+        with app.app_context(), use_region(name):
+            return fn(*args, **kwargs)
+
+    if not (_parallel() if parallel is None else parallel) or len(names) == 1:
+        return {name: run(name) for name in names}
+    with ThreadPoolExecutor(max_workers=max_workers or len(names)) as pool:
+        return dict(zip(names, pool.map(run, names)))
+
+
+# ------------------------------
+# Request Hooks
+# ------------------------------
+def _select_region():
+    names = regions()
+    if not names:
+        return
+    region = session.get('region')
+    chosen = request.form.get('region') if request.method == 'POST' else None
+    # Only switch before login, so a signed-in user id is never read from another region.
+    if chosen in names and '_user_id' not in session:
+        region = session['region'] = chosen
+    if region not in names:
+        region = names[0]
+    request.region_token = current_region.set(region)
+
+
+def _reset_region(exc):
+    token = getattr(request, 'region_token', None)
+    if token is not None:
+        current_region.reset(token)
+
+
+def init_tenancy(app):
+    app.before_request(_select_region)
+    app.teardown_request(_reset_region)
+
+    @app.context_processor
+    def region_context():
+        return {'regions': regions(), 'active_region': active_region()}
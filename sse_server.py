@@ -0,0 +1,173 @@
+"""
+Live-events fan-out server (Server-Sent Events on asyncio).
+
+Every open EventSource is one coroutine and a small queue rather than a
+Flask worker thread, so thousands of idle browsers cost a few megabytes.
+A single poller reads new events from the shared SQLite bus and hands each
+one to the connections subscribed to its channel.
+
+    EVENTS_BUS=sqlite:///events.db python sse_server.py --port 8001
+    EVENTS_BUS=sqlite:///events.db EVENTS_SSE_URL=http://localhost:8001/stream python app.py
+"""
+import argparse
+import asyncio
+import logging
+from urllib.parse import urlsplit, parse_qs
+
+from services.events import make_bus, SQLiteBus, channels_from_token, format_event, HEARTBEAT_SECONDS
+
+log = logging.getLogger('sse_server')
+
+
+class Hub:
+    """Channel -> subscriber queues, fed by one poller over the bus."""
+
+    def __init__(self, bus, queue_size=100):
+        self.bus = bus
+        self.queue_size = queue_size
+        self.subscribers = {}
+        self.connections = 0
+
+    def subscribe(self, channels):
+        queue = asyncio.Queue(self.queue_size)
+        for channel in channels:
+            self.subscribers.setdefault(channel, set()).add(queue)
+        self.connections += 1
+        return queue
+
+    def unsubscribe(self, channels, queue):
+        for channel in channels:
+            queue_set = self.subscribers.get(channel)
+            if queue_set is not None:
+                queue_set.discard(queue)
+                if not queue_set:
+                    del self.subscribers[channel]
+        self.connections -= 1
+
+    async def poll(self, interval):
+        loop = asyncio.get_running_loop()
+        cursor = await loop.run_in_executor(None, self.bus.last_id)
+        while True:
+            rows = await loop.run_in_executor(None, self.bus.since, cursor, None, 1000)
+            for row in rows:
+                cursor = row[0]
+                for queue in list(self.subscribers.get(row[1], ())):
+                    try:
+                        queue.put_nowait(row)
+                    except asyncio.QueueFull:
+                        # A client this far behind is dropped; it reconnects
+                        # with Last-Event-ID and catches up from the bus.
+                        while not queue.empty():
+                            queue.get_nowait()
+                        queue.put_nowait(None)
+            if len(rows) < 1000:
+                await asyncio.sleep(interval)
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    parts = request_line.decode('latin-1').split()
+    return (parts[0], parts[1], headers) if len(parts) == 3 else (None, None, headers)
+
+
+def _reply(writer, status, body=b''):
+    writer.write(f'HTTP/1.1 {status}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+
+
+def make_handler(hub, secret_key, max_age, allow_origin):
+    async def handle(reader, writer):
+        queue = channels = None
+        try:
+            method, target, headers = await asyncio.wait_for(_read_request(reader), 10)
+            url = urlsplit(target or '')
+            if method != 'GET' or url.path != '/stream':
+                _reply(writer, '404 Not Found')
+                return
+            query = parse_qs(url.query)
+            channels = channels_from_token((query.get('token') or [''])[0], secret_key, max_age)
+            if not channels:
+                _reply(writer, '403 Forbidden')
+                return
+
+            writer.write((
+                'HTTP/1.1 200 OK\r\n'
+                'Content-Type: text/event-stream\r\n'
+                'Cache-Control: no-cache\r\n'
+                'Connection: keep-alive\r\n'
+                f'Access-Control-Allow-Origin: {allow_origin}\r\n'
+                '\r\n'
+                'retry: 3000\n\n'
+            ).encode())
+            queue = hub.subscribe(channels)
+
+            last_event_id = headers.get('last-event-id') or (query.get('last_event_id') or [''])[0]
+            if last_event_id.isdigit():
+                loop = asyncio.get_running_loop()
+                missed = await loop.run_in_executor(None, hub.bus.since, int(last_event_id), channels)
+                for event_id, _, event, data in missed:
+                    writer.write(format_event(event_id, event, data).encode())
+                replayed = missed[-1][0] if missed else 0
+            else:
+                replayed = 0
+            await writer.drain()
+
+            while True:
+                try:
+                    row = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b': keepalive\n\n')
+                else:
+                    if row is None:
+                        break
+                    if row[0] <= replayed:
+                        continue
+                    writer.write(format_event(row[0], row[2], row[3]).encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if queue is not None:
+                hub.unsubscribe(channels, queue)
+            writer.close()
+    return handle
+
+
+async def serve(host, port, bus, secret_key, max_age, allow_origin='*', poll_interval=0.1):
+    hub = Hub(bus)
+    server = await asyncio.start_server(make_handler(hub, secret_key, max_age, allow_origin),
+                                        host, port, backlog=4096)
+    poller = asyncio.create_task(hub.poll(poll_interval))
+    log.info('Serving live events on %s:%s', host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        poller.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--allow-origin', default='*', help='CORS origin of the Flask app.')
+    parser.add_argument('--poll-interval', type=float, default=0.1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from app import app
+    bus = make_bus(app.config['EVENTS_BUS'])
+    if not isinstance(bus, SQLiteBus):
+        parser.error('Set EVENTS_BUS=sqlite:///path so this server and the app share events.')
+    asyncio.run(serve(args.host, args.port, bus, app.config['SECRET_KEY'],
+                      app.config['EVENTS_TOKEN_MAX_AGE'], args.allow_origin, args.poll_interval))
+
+
+if __name__ == '__main__':
+    main()
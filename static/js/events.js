@@ -0,0 +1,72 @@
+// Live updates over Server-Sent Events (see services/events.py)
+(function() {
+    const script = document.currentScript;
+    if (!window.EventSource || !script) {
+        return;
+    }
+
+    const statusClasses = {verified: 'bg-success', rejected: 'bg-danger', pending: 'bg-warning'};
+
+    function notify(message, category) {
+        const container = document.querySelector('.container-fluid.mt-4');
+        if (!container) {
+            return;
+        }
+        const alert = document.createElement('div');
+        alert.className = 'alert alert-' + category + ' alert-dismissible fade show';
+        alert.setAttribute('role', 'alert');
+        alert.textContent = message;
+        const close = document.createElement('button');
+        close.type = 'button';
+        close.className = 'btn-close';
+        close.setAttribute('data-bs-dismiss', 'alert');
+        alert.appendChild(close);
+        container.prepend(alert);
+        setTimeout(function() {
+            bootstrap.Alert.getOrCreateInstance(alert).close();
+        }, 8000);
+    }
+
+    function label(value) {
+        return (value || '').replace(/_/g, ' ');
+    }
+
+    const handlers = {
+        'upload.status': function(data) {
+            document.querySelectorAll('[data-upload-status="' + data.upload_id + '"]').forEach(function(badge) {
+                badge.textContent = data.status;
+                badge.classList.remove('bg-success', 'bg-danger', 'bg-warning');
+                badge.classList.add(statusClasses[data.status] || 'bg-secondary');
+            });
+            notify('Your ' + label(data.upload_type) + ' was ' + data.status + '.',
+                   data.status === 'verified' ? 'success' : 'danger');
+        },
+        'upload.created': function(data) {
+            const counter = document.querySelector('[data-pending-uploads]');
+            if (counter) {
+                counter.textContent = parseInt(counter.textContent, 10) + 1;
+            }
+            notify(data.parent + ' uploaded a ' + label(data.upload_type) + ' for ' + data.child + '.', 'info');
+        },
+        'visit.scheduled': function(data) {
+            notify('Home visit scheduled for ' + data.visit_date + ' with ' + data.staff + '.', 'info');
+        },
+        'visit.completed': function(data) {
+            notify('Home visit on ' + data.visit_date + ' was completed.', 'success');
+        }
+    };
+
+    fetch(script.dataset.subscribeUrl, {credentials: 'same-origin'})
+        .then(function(response) { return response.ok ? response.json() : null; })
+        .then(function(subscription) {
+            if (!subscription) {
+                return;
+            }
+            const source = new EventSource(subscription.url);
+            Object.keys(handlers).forEach(function(name) {
+                source.addEventListener(name, function(event) {
+                    handlers[name](JSON.parse(event.data));
+                });
+            });
+        });
+})();
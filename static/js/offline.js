@@ -0,0 +1,73 @@
+// Offline support for the parent portal (see static/js/parent-sw.js)
+(function() {
+    const script = document.currentScript;
+    if (!('serviceWorker' in navigator) || !script) {
+        return;
+    }
+
+    function banner(id, message, category) {
+        let alert = document.getElementById(id);
+        if (!message) {
+            if (alert) {
+                alert.remove();
+            }
+            return;
+        }
+        const container = document.querySelector('.container-fluid.mt-4');
+        if (!container) {
+            return;
+        }
+        if (!alert) {
+            alert = document.createElement('div');
+            alert.id = id;
+            alert.setAttribute('role', 'status');
+            container.prepend(alert);
+        }
+        alert.className = 'alert alert-' + category;
+        alert.textContent = message;
+    }
+
+    function showConnection() {
+        banner('offline-status', navigator.onLine ? null
+            : 'You are offline. You are seeing the last saved copy of this page; uploads will be sent when you reconnect.',
+            'secondary');
+    }
+
+    function tell(type) {
+        if (navigator.serviceWorker.controller) {
+            navigator.serviceWorker.controller.postMessage({type: type});
+        }
+    }
+
+    navigator.serviceWorker.addEventListener('message', function(event) {
+        const data = event.data || {};
+        if (data.type === 'queued') {
+            banner('offline-queue', data.count ? data.count + ' upload' + (data.count === 1 ? ' is' : 's are') +
+                   ' waiting to be sent.' : null, 'warning');
+        } else if (data.type === 'replayed') {
+            // The server has flashed the outcome of each upload; show it.
+            window.location.reload();
+        }
+    });
+
+    navigator.serviceWorker.register(script.dataset.workerUrl).then(function() {
+        return navigator.serviceWorker.ready;
+    }).then(function() {
+        tell('status');
+        if (navigator.onLine) {
+            tell('online');
+        }
+    });
+
+    // The cached pages are this parent's; a shared phone must not show them to the next person.
+    document.querySelectorAll('a[href="' + script.dataset.logoutUrl + '"]').forEach(function(link) {
+        link.addEventListener('click', function() { tell('signout'); });
+    });
+
+    window.addEventListener('online', function() {
+        showConnection();
+        tell('online');
+    });
+    window.addEventListener('offline', showConnection);
+    showConnection();
+})();
@@ -0,0 +1,319 @@
+// Parent portal service worker (served as /parent/sw.js; see services/sync.py)
+//
+// - Moving between portal pages: the cached copy is shown as long as a
+//   /parent/api/sync pull (at most one per PULL_INTERVAL_MS) says nothing
+//   on it changed; the pull drops and refetches the pages it names. So an
+//   unchanged visit costs one small JSON request instead of a render per
+//   page. Arriving from outside the portal (sign-in, a link, a typed URL)
+//   and anything after a form post goes to the network, with the cached
+//   copy as the fallback while offline.
+// - Static files: served from the cache and refreshed in the background
+//   (fingerprinted ones come straight back from the browser's HTTP cache).
+// - Uploads posted while offline are queued in IndexedDB and replayed when
+//   the connection comes back (Background Sync where the browser has it,
+//   otherwise when a page reports it is online).
+// - Synced rows are kept in IndexedDB ('records') with the watermark.
+const PAGES_CACHE = 'parent-pages-v1';
+const STATIC_CACHE = 'parent-static-v1';
+const SCOPE = new URL(self.registration.scope).pathname;  // '/parent/'
+const UPLOADS_URL = SCOPE + 'uploads';
+const SYNC_URL = SCOPE + 'api/sync';
+const LOGIN_PATH = '/auth/login';
+const PULL_INTERVAL_MS = 60 * 1000;  // cached pages may be this far behind while online
+
+// ----- IndexedDB -----
+function openDb() {
+    return new Promise(function(resolve, reject) {
+        const request = indexedDB.open('parent-portal', 1);
+        request.onupgradeneeded = function() {
+            const db = request.result;
+            db.createObjectStore('queue', {autoIncrement: true});
+            db.createObjectStore('records');  // key: '<kind>:<id>'
+            db.createObjectStore('meta');
+        };
+        request.onsuccess = function() { resolve(request.result); };
+        request.onerror = function() { reject(request.error); };
+    });
+}
+
+function transaction(stores, mode, work) {
+    return openDb().then(function(db) {
+        return new Promise(function(resolve, reject) {
+            const tx = db.transaction(stores, mode);
+            work(tx);
+            tx.oncomplete = function() { resolve(); };
+            tx.onerror = function() { reject(tx.error); };
+        });
+    });
+}
+
+function queuedUploads() {
+    return openDb().then(function(db) {
+        return new Promise(function(resolve, reject) {
+            const items = [];
+            const cursor = db.transaction('queue').objectStore('queue').openCursor();
+            cursor.onsuccess = function() {
+                if (!cursor.result) {
+                    return resolve(items);
+                }
+                items.push({key: cursor.result.key, fields: cursor.result.value});
+                cursor.result.continue();
+            };
+            cursor.onerror = function() { reject(cursor.error); };
+        });
+    });
+}
+
+function broadcast(message) {
+    return self.clients.matchAll({type: 'window'}).then(function(windows) {
+        windows.forEach(function(client) { client.postMessage(message); });
+    });
+}
+
+function reportQueue() {
+    return queuedUploads().then(function(items) {
+        return broadcast({type: 'queued', count: items.length});
+    });
+}
+
+// ----- Cached pages -----
+let lastPull = 0;
+
+function keepPage(cache, path, response) {
+    // Pages showing a flash message are sent without an ETag; they are never reused.
+    if (response.ok && !response.redirected && response.headers.has('ETag')) {
+        return cache.put(path, response.clone()).then(function() { return response; });
+    }
+    return Promise.resolve(response);
+}
+
+function forgetPages() {
+    lastPull = 0;
+    return caches.delete(PAGES_CACHE);
+}
+
+function forgetEverything() {
+    return forgetPages().then(function() {
+        return transaction(['records', 'meta'], 'readwrite', function(tx) {
+            tx.objectStore('records').clear();
+            tx.objectStore('meta').clear();
+        });
+    });
+}
+
+function fromNetwork(request, path) {
+    return caches.open(PAGES_CACHE).then(function(cache) {
+        return fetch(request).then(function(response) {
+            return keepPage(cache, path, response);
+        }).catch(function() {
+            return cache.match(path).then(function(cached) {
+                return cached || new Response(
+                    '<h1>You are offline</h1><p>This page has not been opened on this device yet.</p>',
+                    {status: 503, headers: {'Content-Type': 'text/html; charset=utf-8'}});
+            });
+        });
+    });
+}
+
+function fromCache(request, path) {
+    return pullChanges().then(function() {
+        return caches.open(PAGES_CACHE);
+    }).then(function(cache) {
+        return cache.match(path);
+    }).then(function(cached) {
+        return cached || fromNetwork(request, path);
+    }, function() {
+        return fromNetwork(request, path);
+    });
+}
+
+// ----- Offline uploads -----
+function queueUpload(request) {
+    return request.formData().then(function(form) {
+        // Files are Blobs, which IndexedDB stores as they are.
+        const fields = [];
+        form.forEach(function(value, name) { fields.push([name, value]); });
+        return transaction('queue', 'readwrite', function(tx) { tx.objectStore('queue').add(fields); });
+    }).then(function() {
+        if (self.registration.sync) {
+            self.registration.sync.register('replay-uploads').catch(function() {});
+        }
+        reportQueue();
+        return Response.redirect(UPLOADS_URL, 303);
+    });
+}
+
+let replaying = null;
+
+function replayUploads() {
+    // One replay at a time, so an upload is never sent twice concurrently.
+    replaying = replaying || queuedUploads().then(function(items) {
+        let sent = 0;
+        return items.reduce(function(previous, item) {
+            return previous.then(function() {
+                const form = new FormData();
+                item.fields.forEach(function(field) { form.append(field[0], field[1]); });
+                return fetch(UPLOADS_URL, {method: 'POST', body: form, credentials: 'same-origin'})
+                    .then(function(response) {
+                        // Signed out while offline: keep it until they sign in again.
+                        if (new URL(response.url).pathname === LOGIN_PATH) {
+                            throw new Error('signed out');
+                        }
+                        // Saved, or refused with a flash message the next page shows (the
+                        // server drops a file it already has, so a repeat is harmless).
+                        sent += 1;
+                        return transaction('queue', 'readwrite', function(tx) {
+                            tx.objectStore('queue').delete(item.key);
+                        });
+                    });
+            });
+        }, Promise.resolve()).then(function() { return sent; }, function() { return sent; });
+    }).then(function(sent) {
+        replaying = null;
+        if (sent) {
+            forgetPages();
+            broadcast({type: 'replayed', count: sent});
+        }
+        return reportQueue();
+    }, function(error) {
+        replaying = null;
+        throw error;
+    });
+    return replaying;
+}
+
+// ----- Delta sync -----
+function pullChanges() {
+    if (Date.now() - lastPull < PULL_INTERVAL_MS) {
+        return Promise.resolve();
+    }
+    const meta = {};
+    return transaction('meta', 'readonly', function(tx) {
+        const store = tx.objectStore('meta');
+        ['watermark', 'parent', 'version', 'today'].forEach(function(key) {
+            store.get(key).onsuccess = function(event) { meta[key] = event.target.result; };
+        });
+    }).then(function() {
+        const url = SYNC_URL + (meta.watermark ? '?since=' + encodeURIComponent(meta.watermark) : '');
+        return fetch(url, {credentials: 'same-origin'});
+    }).then(function(response) {
+        if (!response.ok || response.redirected) {
+            // Signed out (or not approved): nothing cached may be shown any more.
+            return forgetEverything().then(function() { throw new Error('not signed in'); });
+        }
+        return response.json();
+    }).then(function(delta) {
+        // Another parent signed in on this device, their own record changed, or a new day
+        // (the dashboard's upcoming visits): every page may differ.
+        const restart = delta.parent !== meta.parent || delta.version !== meta.version || delta.today !== meta.today;
+        return (restart ? forgetPages() : Promise.resolve()).then(function() {
+            return transaction(['records', 'meta'], 'readwrite', function(tx) {
+                const records = tx.objectStore('records');
+                if (delta.full || delta.parent !== meta.parent) {
+                    records.clear();
+                }
+                ['children', 'uploads', 'visits', 'guidance'].forEach(function(kind) {
+                    delta[kind].forEach(function(row) { records.put(row, kind + ':' + row.id); });
+                    (delta.removed[kind] || []).forEach(function(id) { records.delete(kind + ':' + id); });
+                });
+                const store = tx.objectStore('meta');
+                store.put(delta.watermark, 'watermark');
+                store.put(delta.parent, 'parent');
+                store.put(delta.version, 'version');
+                store.put(delta.today, 'today');
+            });
+        }).then(function() {
+            lastPull = Date.now();
+            return caches.open(PAGES_CACHE);
+        }).then(function(cache) {
+            return Promise.all(delta.refresh.map(function(path) {
+                return cache.match(path).then(function(cached) {
+                    // Drop the old copy now; fetch the new one so it is there offline.
+                    return cached && cache.delete(path).then(function() {
+                        return fetch(path, {credentials: 'same-origin'});
+                    }).then(function(response) {
+                        return keepPage(cache, path, response);
+                    }).catch(function() {});
+                });
+            }));
+        });
+    });
+}
+
+// ----- Events -----
+self.addEventListener('install', function() {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(caches.keys().then(function(names) {
+        return Promise.all(names.filter(function(name) {
+            return name.startsWith('parent-') && name !== PAGES_CACHE && name !== STATIC_CACHE;
+        }).map(function(name) { return caches.delete(name); }));
+    }).then(function() { return self.clients.claim(); }));
+});
+
+self.addEventListener('fetch', function(event) {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== location.origin) {
+        return;
+    }
+    if (request.method === 'POST' && url.pathname.startsWith(SCOPE)) {
+        // Whatever the form changed, the next page comes from the server.
+        const copy = url.pathname === UPLOADS_URL ? request.clone() : null;
+        event.respondWith(fetch(request).then(function(response) {
+            return forgetPages().then(function() { return response; });
+        }, function(error) {
+            if (copy) {
+                return queueUpload(copy);
+            }
+            throw error;
+        }));
+        return;
+    }
+    if (request.method !== 'GET') {
+        return;
+    }
+    if (url.pathname.startsWith('/static/')) {
+        event.respondWith(caches.open(STATIC_CACHE).then(function(cache) {
+            return cache.match(request).then(function(cached) {
+                const fresh = fetch(request).then(function(response) {
+                    if (response.ok) {
+                        cache.put(request, response.clone());
+                    }
+                    return response;
+                });
+                if (cached) {
+                    event.waitUntil(fresh.catch(function() {}));
+                    return cached;
+                }
+                return fresh;
+            });
+        }));
+        return;
+    }
+    if (request.mode === 'navigate' && url.pathname.startsWith(SCOPE)) {
+        const referrer = request.referrer ? new URL(request.referrer) : null;
+        const withinPortal = referrer && referrer.origin === url.origin && referrer.pathname.startsWith(SCOPE);
+        event.respondWith(withinPortal && !url.search ? fromCache(request, url.pathname)
+                                                      : fromNetwork(request, url.pathname));
+    }
+});
+
+self.addEventListener('sync', function(event) {
+    if (event.tag === 'replay-uploads') {
+        event.waitUntil(replayUploads());
+    }
+});
+
+self.addEventListener('message', function(event) {
+    const type = event.data && event.data.type;
+    if (type === 'online') {
+        event.waitUntil(replayUploads().then(pullChanges).catch(function() {}));
+    } else if (type === 'status') {
+        event.waitUntil(reportQueue());
+    } else if (type === 'signout') {
+        event.waitUntil(forgetEverything());
+    }
+});